@@ -9,30 +9,41 @@ record. This visualisation restores the 10 year baseline.
 https://www.actuaries.org.uk/learn-and-develop/continuous-mortality-investigation/other-cmi-outputs/mortality-monitor
 """
 
-from pycovid.data_utils.cmi import (
-    read_CMI_mortality_monitor_spreadsheet,
-    read_CMI_cumulative_SMR,
-)
 import matplotlib.pyplot as plt
-
-DATA_FILE = "Mortality-monitor-spreadsheet-Q1-2021-v01-2021-04-13.xlsx"
-
-
-def plot_smr_cum():
-    df = read_CMI_cumulative_SMR(filename=DATA_FILE)
-    df.plot()
-
-
-def plot_smr():
-    df = read_CMI_mortality_monitor_spreadsheet(
-        filename=DATA_FILE, smrset="weekly", gender="U", age_range="0to64"
-    )
-    df_2021 = df.loc["2021-01-01":]
-
-    df_2021["cum"] = df_2021["U_0to64"].cumsum()
+from pycovid.catalog import catalog
+from pycovid.excess import Baseline, cumulative_smr, excess_smr
+
+GENDER = "Unisex"
+AGE_RANGE = "20to100"
+BASELINES = {
+    "10 year average (2010-2019)": Baseline("mean", years=10, end=2019),
+    "2019": Baseline("year", end=2019),
+}
+
+
+def plot_smr_cum(df):
+    """Plot cumulative excess mortality in 2020 and 2021 relative to each baseline."""
+    fig, ax = plt.subplots(1, 1)
+    for label, baseline in BASELINES.items():
+        df_cum = cumulative_smr(df, baseline).loc[(GENDER, AGE_RANGE)].T
+        for year in [2020, 2021]:
+            ax.plot(df_cum.index, df_cum[year] * 100, label=f"{year} vs. {label}")
+    ax.set_xlabel("ISO day")
+    ax.set_ylabel("Cumulative excess mortality (% of baseline year)")
+    ax.legend()
+
+
+def plot_smr(df):
+    """Plot weekly and cumulative excess SMR in 2021 against the 10 year baseline."""
+    baseline = BASELINES["10 year average (2010-2019)"]
+    df_2021 = excess_smr(df, baseline).loc[(GENDER, AGE_RANGE, 2021)].to_frame("excess")
+
+    df_2021["cum"] = df_2021["excess"].cumsum()
     df_2021.plot()
 
 
 if __name__ == "__main__":
-    plot_smr_cum()
+    df = catalog.get("cmi-smr", version="2021-Q1", smr_set="weekly")
+    plot_smr_cum(df)
+    plot_smr(df)
     plt.show()
@@ -1,82 +1,71 @@
 """
 decline_comparison.py
 
-Prepare a plot that compares the 2020 and 2021 post-peak declines to analyse decline rates and assess the impact of
+Prepare a plot that compares the post-peak declines of every wave to analyse decline rates and assess the impact of
 vaccine (if any).
 """
+from typing import List
+
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from pycovid import OUTPUT_DIR
-from pycovid.data_utils.nhs import read_vaccination_data
-from pycovid.data_utils.ons import prepare_fatal_infection_data, XLMeta
-
-
-def isolate_declines():
-    global df
-    """Isolate declines, normalise, and timeshift to overlay them."""
+from pycovid.catalog import catalog
+from pycovid.panel import Panel
+from pycovid.waves import align_declines, find_waves, fit_declines
 
-    # make room
-    idx = pd.date_range("1 Jan 2020", "31 Jul 2021")
-    df = df.reindex(idx)
+FIT_DAYS = 80
+COLOURS = ["tab:red", "tab:green", "tab:blue", "tab:orange", "tab:purple"]
 
-    df_2020 = df["infections"].loc["20 Mar 2020":"31 Jul 2020"]
-    df_2020 = df_2020 / df_2020.max()
-    df_2020.reset_index(drop=True, inplace=True)
 
-    df_2021 = df["infections"].loc["15 Jan 2021":"31 Jul 2021"]
-    df_2021 = df_2021 / df_2021.max()
-    df_2021.reset_index(drop=True, inplace=True)
+def isolate_declines(df: Panel, region: str) -> pd.DataFrame:
+    """Find every wave, then normalise and timeshift the post-peak declines and their fits to overlay them."""
 
-    df_vaccination = df["Vaccinations"]["11 jan 2021":]
-    df_vaccination = df_vaccination.shift(periods=4)  # align with day 0 of peak
-    df_vaccination.reset_index(drop=True, inplace=True)
+    infections = df[["infections"]].set_axis([region], axis=1)
+    waves = find_waves(infections)
+    declines = align_declines(infections, waves)
+    fits = fit_declines(declines, days=FIT_DAYS)
 
-    data = {
-        "2020": df_2020,
-        "2020 (log)": np.log10(df_2020),
-        "2021": df_2021,
-        "2021 (log)": np.log10(df_2021),
-        "vaccinations": df_vaccination,
-    }
-    df = pd.concat(data, axis=1)
+    days = np.arange(declines.shape[1])
+    log_fits = fits["intercept"].values[:, None] + fits["slope"].values[:, None] * days
+    log_fits[:, FIT_DAYS:] = np.nan
 
-    return df
+    data = {}
+    for i, peak in enumerate(waves["peak"]):
+        label = peak.strftime("%b %Y")
+        data[label] = declines[i]
+        data[f"{label} (log)"] = np.log10(declines[i])
+        data[f"{label} (log fit)"] = log_fits[i]
+        data[f"{label} (fit)"] = 10 ** log_fits[i]
 
+    # align vaccinations with day 0 of the latest peak
+    if "Vaccinations" in df:
+        vaccination_dates = pd.date_range(waves["peak"].iloc[-1], periods=len(days))
+        data["vaccinations"] = df["Vaccinations"].reindex(vaccination_dates).values
 
-def fit_lines(df_sample):
+    return pd.DataFrame(data, index=pd.Index(days, name="Days from peak"))
 
-    model = np.polyfit(df_sample.index, df_sample, 1)
-    predict = np.poly1d(model)
-    log_fit = pd.DataFrame(predict(df_sample.index), index=df_sample.index)
-    fit = 10 ** log_fit
 
-    return log_fit, fit
+def wave_labels(df: pd.DataFrame) -> List[str]:
+    """Return the labels of the waves in a dataframe from isolate_declines."""
+    return [col[: -len(" (fit)")] for col in df.columns if col.endswith(" (fit)")]
 
 
 if __name__ == "__main__":
 
     PLOT_VACCINATION = False
 
-    meta = XLMeta(
-        workbook="publishedweek282021.xlsx",
-        region="UK",
-        start_row=4,
-        end_row=506,
+    data = catalog.prefetch(
+        {
+            "deaths": ("ons-fatal-infections", dict(version="2021-w28", region="UK")),
+            "vaccinations": ("nhs-vaccinations", dict(version="2021-05-13")),
+        }
     )
-    df = prepare_fatal_infection_data(meta)
 
-    df["Vaccinations"] = read_vaccination_data(
-        workbook="COVID-19-monthly-announced-vaccinations-13-May-2021.xlsx"
-    )
-
-    df = isolate_declines()
+    df = Panel.from_frame(data["deaths"].result())
+    df["Vaccinations"] = data["vaccinations"].result()
 
-    samples = [(2020, df["2020 (log)"][:80]), (2021, df["2021 (log)"][:80])]
-    for year, sample in samples:
-        log_fit, fit = fit_lines(sample)
-        df[f"{year} (log fit)"] = log_fit
-        df[f"{year} (fit)"] = fit
+    df = isolate_declines(df, "UK")
 
     # plot ########################################
 
@@ -97,19 +86,15 @@ if __name__ == "__main__":
         color="lightgrey",
     )
 
-    # plot fatal infections (left panel)
+    # plot fatal infections (left panel) and log(fatal infections) (right panel)
     alpha = 0.2
-    ax1.plot(df.index, df["2020"], color="tab:red", alpha=alpha)
-    ax1.plot(df.index, df["2020 (fit)"], label="2020", color="tab:red")
-    ax1.plot(df.index, df["2021"], color="tab:green", alpha=alpha)
-    ax1.plot(df.index, df["2021 (fit)"], label="2021", color="tab:green")
+    for label, colour in zip(wave_labels(df), COLOURS):
+        ax1.plot(df.index, df[label], color=colour, alpha=alpha)
+        ax1.plot(df.index, df[f"{label} (fit)"], label=label, color=colour)
+        ax2.semilogy(df.index, df[label], color=colour, alpha=alpha)
+        ax2.semilogy(df.index, df[f"{label} (fit)"], label=label, color=colour)
     ax1.set_ylabel("fatal infections (normalised)")
     ax1.set_xlabel("Days from peak")
-
-    ax2.semilogy(df.index, df["2020"], color="tab:red", alpha=alpha)
-    ax2.semilogy(df.index, df["2020 (fit)"], label="2020", color="tab:red")
-    ax2.semilogy(df.index, df["2021"], color="tab:green", alpha=alpha)
-    ax2.semilogy(df.index, df["2021 (fit)"], label="2021", color="tab:green")
     ax2.set_ylabel("fatal infections (logarithmic scale)")
     ax2.set_xlabel("Days from peak")
 
@@ -0,0 +1,60 @@
+"""
+export_data.py
+
+Publish the data behind the figures: fatal infections in every ONS region, the NPI effectiveness fits, CMI weekly
+excess mortality and OxCGRT policy events. Datasets unchanged since the last export are skipped.
+"""
+
+import pandas as pd
+from pycovid import OUTPUT_DIR
+from pycovid.catalog import catalog
+from pycovid.data_utils import polyfit
+from pycovid.data_utils.ons import FatalInfectionPipeline
+from pycovid.excess import Baseline, excess_smr
+from pycovid.export import ExportItem, export_all
+
+ONS_VERSION = "2021-w28"
+FORMAT = "csv"
+FITS = [("1 Aug 2020", "10 Oct 2020"), ("12 Jan 2021", "8 Mar 2021")]
+BASELINE = Baseline("mean", years=10, end=2019)
+
+
+def fatal_infections() -> pd.DataFrame:
+    """Fatal infections in every region of the ONS registrations, one column per region."""
+    registrations = catalog.get("ons-registrations", version=ONS_VERSION)
+    infections = {}
+    for region in registrations.columns:
+        pipeline = FatalInfectionPipeline(region)
+        pipeline.append(registrations[region])
+        infections[region] = pipeline.to_frame()["infections"]
+
+    return pd.DataFrame(infections)
+
+
+def npi_fits() -> pd.DataFrame:
+    """The fitted fatal infections of England, one column per fit window."""
+    df = catalog.get("ons-fatal-infections", version=ONS_VERSION, region="England")
+    fits = {}
+    for start, end in FITS:
+        _, infection = polyfit(df["infections (log)"], start, end)
+        fits[f"{start} to {end}"] = infection[0]
+
+    return pd.DataFrame(fits)
+
+
+if __name__ == "__main__":
+    results = export_all(
+        [
+            ExportItem("fatal-infections", fatal_infections),
+            ExportItem("npi-fits", npi_fits),
+            ExportItem(
+                "cmi-excess", lambda: excess_smr(catalog.get("cmi-smr"), BASELINE)
+            ),
+            ExportItem("oxcgrt-events", lambda: catalog.get("oxcgrt-policy-events")),
+        ],
+        OUTPUT_DIR / "data",
+        fmt=FORMAT,
+    )
+    for result in results:
+        status = "unchanged" if result.skipped else "written"
+        print(f"{result.file}: {result.rows} rows, {status}")
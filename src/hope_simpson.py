@@ -3,53 +3,37 @@ Import ONS COVID-19 deaths and compare with Hope-Simpson fig.2
 Hope-Simpson, R.E. (1981) The role of season in the epidemiology of influenza. Epidemiology & Infect
 """
 
-from datetime import datetime
-
 import matplotlib.pyplot as plt
 import pandas as pd
 from matplotlib.dates import MonthLocator, DateFormatter
-from pycovid import DATA_DIR, OUTPUT_DIR
-from pycovid.data_utils.ons import read_ONS_daily_registrations
-
-
-def winter_monthly(df: pd.DataFrame) -> pd.DataFrame:
-    """Compute winter monthly deaths as a %age of all winter deaths."""
-    df = df.query(("Date >= '1 Jul 2020' and Date <= '30 Jun 2021'"))
-    df = df.resample("M").sum()
-    assert df["UK"].sum() == 95234  # quality check
-
-    # convert to monthly percentage of total
-    df = df.div(df.sum()) * 100
-
-    # data is to mid April 2021: pad remaining months to end of winter period with None
-    idx = pd.to_datetime(
-        [datetime(2021, 5, 31, 0, 0, 0), datetime(2021, 6, 30, 0, 0, 0)]
-    )
-    null_data = pd.DataFrame(columns=["UK"], data=[None, None], index=idx)
-    df = df.append(null_data)
+from pycovid import OUTPUT_DIR
+from pycovid.catalog import catalog
+from pycovid.seasonal import (
+    HOPE_SIMPSON,
+    METRICS,
+    profile_distance,
+    reference_profile,
+    season_profiles,
+)
+
+
+def winter_monthly(df: pd.DataFrame, season: int = 2020) -> pd.DataFrame:
+    """Compute winter monthly deaths as a %age of all winter deaths, indexed on month end (missing months are NaN)."""
+    df = season_profiles(df, freq="M").loc[season]
+    df.index = pd.date_range(start=f"1 Jul {season}", periods=12, freq="M")
 
     return df
 
 
-def hope_simpson() -> pd.DataFrame:
-    """Construct the Hope-Simpson dataframe from monthly percentages."""
-    date_index = pd.date_range(start="1 Jul 2020", end="30 Jun 2021")
-    hope_simpson = {
-        7: 0,
-        8: 0,
-        9: 4.1,
-        10: 2.2,
-        11: 4.2,
-        12: 13.8,
-        1: 35.6,
-        2: 19.1,
-        3: 16.8,
-        4: 4.2,
-        5: 0,
-        6: 0,
-    }
-    data = [hope_simpson[date.month] for date in date_index]
-    df = pd.DataFrame(data, index=date_index, columns=["Hope-Simpson"])
+def hope_simpson(season: int = 2020) -> pd.DataFrame:
+    """Construct the daily Hope-Simpson dataframe from monthly percentages."""
+    date_index = pd.date_range(start=f"1 Jul {season}", end=f"30 Jun {season + 1}")
+    monthly = pd.Series(HOPE_SIMPSON)
+    df = pd.DataFrame(
+        monthly.reindex(date_index.month).values,
+        index=date_index,
+        columns=["Hope-Simpson"],
+    )
     return df
 
 
@@ -88,12 +72,15 @@ def create_plot(df: pd.DataFrame, df_hs: pd.DataFrame):
 
 
 if __name__ == "__main__":
-    filename = DATA_DIR / "publishedweek142021.xlsx"
-    skiprows = list(range(3)) + list(range(408, 425))
-
-    df = read_ONS_daily_registrations(workbook=filename, skiprows=skiprows)
+    df = catalog.get("ons-registrations", version="2021-w14")
     assert df["UK"].sum() == 150540
 
-    df = winter_monthly(df)
+    reference = reference_profile(HOPE_SIMPSON)
+    profiles = season_profiles(df, freq="M")
+    for metric in METRICS:
+        print(f"Distance from Hope-Simpson ({metric}):")
+        print(profile_distance(profiles, reference, metric).T)
+
+    df = winter_monthly(df[["UK"]])
     df_hs = hope_simpson()
     create_plot(df, df_hs)
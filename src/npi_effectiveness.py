@@ -8,6 +8,7 @@ Pharmaceutical Interventions, and vaccination doses.
 import matplotlib.pyplot as plt
 import pandas as pd
 from pycovid import OUTPUT_DIR
+from pycovid.animation import animate_figure, frame_writer
 from pycovid.chart_utils import (
     create_figure,
     FitItem,
@@ -16,13 +17,20 @@ from pycovid.chart_utils import (
     LabelOrigin,
 )
 from pycovid.data_utils import polyfit
-from pycovid.data_utils.nhs import read_vaccination_data
-from pycovid.data_utils.ons import prepare_fatal_infection_data, XLMeta
+from pycovid.downsample import export_csv
+from pycovid.expr import collect, fatal_infections, ons
+from pycovid.monte_carlo import monte_carlo_fatal_infections
+from pycovid.panel import Panel
+from pycovid.seir import fit_seir, seir_fatal_infections
 
 SERIES_NAME = "NPI Effectiveness"
+TARGET_POINTS = 500  # per series, for charts and Datawrapper CSVs
+ANIMATE = False  # also write videos of Figs 2 and 3 revealing the curves day by day (needs ffmpeg)
+# also draw the simulated Figs 5 (Monte Carlo delay uncertainty) and 6 (SEIR counterfactual): slow
+SIMULATE = False
 
 
-def plot_overview(df: pd.DataFrame):
+def plot_overview(df: Panel):
 
     # fitted lines ######################################################################
 
@@ -57,12 +65,13 @@ def plot_overview(df: pd.DataFrame):
         regions=regions,
         show_deaths=True,
         show_vaccinations=False,
+        target_points=TARGET_POINTS,
     )
 
     plt.savefig(OUTPUT_DIR / f"{SERIES_NAME} - Fig 1 Overview.png")
 
 
-def plot_2020(df: pd.DataFrame):
+def plot_2020(df: Panel, animate: bool = False):
 
     df = df.loc["1 Jan 2020":"31 Jul 2020"]
 
@@ -96,18 +105,22 @@ def plot_2020(df: pd.DataFrame):
     events.append(EventItem("2020-07-04", "Pubs, restaurants, bars reopen"))
 
     # OK. Go! ######################################################################
-    create_figure(
+    fig, _ = create_figure(
         "Fatal COVID-19 Infections England 2020 vs. key Non Pharmaceutical Interventions",
         df,
         fits=fits,
         regions=regions,
         events=events,
+        target_points=TARGET_POINTS,
     )
 
     plt.savefig(OUTPUT_DIR / f"{SERIES_NAME} - Fig 2 2020.png")
+    if animate:
+        with frame_writer(OUTPUT_DIR / f"{SERIES_NAME} - Fig 2 2020.mp4") as writer:
+            animate_figure(fig, writer)
 
 
-def plot_2020_2021(df: pd.DataFrame):
+def plot_2020_2021(df: Panel, animate: bool = False):
 
     df = df.loc["1 Jul 2020":"10 Mar 2021"]
 
@@ -152,7 +165,7 @@ def plot_2020_2021(df: pd.DataFrame):
 
     # OK. Go! ######################################################################
 
-    create_figure(
+    fig, _ = create_figure(
         "Fatal COVID-19 Infections England 2020/21 vs. key Non Pharmaceutical Interventions",
         df,
         fits=fits,
@@ -160,12 +173,17 @@ def plot_2020_2021(df: pd.DataFrame):
         events=events,
         show_vaccinations=False,
         label_origin=LabelOrigin(50, 320),
+        target_points=TARGET_POINTS,
     )
 
     plt.savefig(OUTPUT_DIR / f"{SERIES_NAME} - Fig 3 2020_2021.png")
+    if animate:
+        file_name = f"{SERIES_NAME} - Fig 3 2020_2021.mp4"
+        with frame_writer(OUTPUT_DIR / file_name) as writer:
+            animate_figure(fig, writer)
 
 
-def plot_vaccination_detail(df: pd.DataFrame):
+def plot_vaccination_detail(df: Panel):
 
     file_name = "Fig 4 Vaccine detail"
 
@@ -207,25 +225,112 @@ def plot_vaccination_detail(df: pd.DataFrame):
     )
     plt.savefig(OUTPUT_DIR / f"{SERIES_NAME} - {file_name}.png")
 
-    datawrapper_df = df[["infections", "Vaccinations"]]
-    datawrapper_df["infections - fit"] = infection
-    datawrapper_df.to_csv(OUTPUT_DIR / f"{SERIES_NAME} - {file_name}.csv")
+    datawrapper_df = df[["infections", "Vaccinations"]].assign(
+        **{"infections - fit": infection[0]}
+    )
+    export_csv(
+        datawrapper_df,
+        OUTPUT_DIR / f"{SERIES_NAME} - {file_name}.csv",
+        TARGET_POINTS,
+        keep=[event.date for event in events],
+    )
+
 
+def plot_uncertainty(df: Panel):
 
-if __name__ == "__main__":
-    meta = XLMeta(
-        workbook="publishedweek282021.xlsx",
-        region="England",
-        start_row=4,
-        end_row=506,
+    file_name = "Fig 5 Delay uncertainty"
+
+    # Monte Carlo bands ############################################################
+
+    fits = [("1 Aug 2020", "10 Oct 2020"), ("12 Jan 2021", "8 Mar 2021")]
+    bands = monte_carlo_fatal_infections(df["deaths (raw)"], fits=fits, seed=2021)
+    infections = bands.infections.loc["1 Jul 2020":"10 Mar 2021"]
+
+    # OK. Go! ######################################################################
+
+    fig, ax = plt.subplots(1, 1)
+    fig.set_size_inches(16, 5)
+    fig.patch.set_facecolor("white")
+    fig.suptitle(
+        "Fatal COVID-19 Infections England 2020/21: infection-to-death delay and reporting uncertainty"
+    )
+    ax.fill_between(
+        infections.index,
+        infections["2.5%"],
+        infections["97.5%"],
+        color="tab:blue",
+        alpha=0.2,
+        label="95% band",
+    )
+    ax.plot(infections["50%"], color="tab:blue", label="median")
+    ax.plot(
+        df["infections"].loc["1 Jul 2020":"10 Mar 2021"],
+        color="lightgrey",
+        label="fixed 28 day delay",
+    )
+    ax.set_ylabel("fatal infections")
+    ax.legend(loc="upper left")
+
+    plt.savefig(OUTPUT_DIR / f"{SERIES_NAME} - {file_name}.png")
+    bands.slopes.to_csv(OUTPUT_DIR / f"{SERIES_NAME} - {file_name} slopes.csv")
+
+
+def plot_counterfactual(df: Panel):
+
+    file_name = "Fig 6 SEIR counterfactual"
+
+    # SEIR fit to the first wave ###################################################
+
+    events = [
+        EventItem("2020-03-26", "Lockdown #1"),
+        EventItem("2020-05-10", "Restrictions relaxed"),
+    ]
+    fit = fit_seir(df["infections"].loc[:"30 Jun 2020"], events, seed=2020)
+
+    earlier = [
+        EventItem("2020-03-19", "Lockdown #1"),
+        EventItem("2020-05-10", "Restrictions relaxed"),
+    ]
+    counterfactual = seir_fatal_infections(
+        fit.parameters.iloc[:1], earlier, fit.infections.index
+    )
+
+    # OK. Go! ######################################################################
+
+    fig, ax = plt.subplots(1, 1)
+    fig.set_size_inches(16, 5)
+    fig.patch.set_facecolor("white")
+    fig.suptitle(
+        "Fatal COVID-19 Infections England 2020: SEIR fit and lockdown one week earlier"
     )
-    df = prepare_fatal_infection_data(meta)
+    ax.plot(fit.infections["observed"], color="lightgrey", label="fatal infections")
+    ax.plot(fit.infections["fitted"], color="tab:blue", label="SEIR fit")
+    ax.plot(
+        counterfactual.iloc[:, 0],
+        color="tab:orange",
+        linestyle="--",
+        label="SEIR fit, lockdown 19 Mar 2020",
+    )
+    for event in events:
+        ax.axvline(pd.Timestamp(event.date), color="grey", linewidth=0.5)
+    ax.set_ylabel("fatal infections")
+    ax.legend(loc="upper right")
+
+    plt.savefig(OUTPUT_DIR / f"{SERIES_NAME} - {file_name}.png")
+    fit.parameters.to_csv(OUTPUT_DIR / f"{SERIES_NAME} - {file_name} parameters.csv")
+
+
+if __name__ == "__main__":
+    df = collect(fatal_infections(ons("England", version="2021-w28")))
 
     # df["Vaccinations"] = read_vaccination_data(
     #     workbook="COVID-19-daily-announced-vaccinations-28-July-2021.xlsx"
     # )
 
     plot_overview(df)
-    plot_2020(df)
-    plot_2020_2021(df)
+    plot_2020(df, animate=ANIMATE)
+    plot_2020_2021(df, animate=ANIMATE)
     # plot_vaccination_detail(df)
+    if SIMULATE:
+        plot_uncertainty(df)
+        plot_counterfactual(df)
@@ -5,28 +5,13 @@ Visualises the odds ratio data presented in Public Health England's COVID-19 vac
 """
 
 import matplotlib.pyplot as plt
-import pandas as pd
-from pycovid import DATA_DIR, OUTPUT_DIR
-
-DATA_DIR = DATA_DIR / "PHE_VACCINE_REPORT_20"
-
-manufacturer = {
-    1: "Pfizer-BioNTech",
-    2: "AstraZeneca",
-}
+from pycovid import OUTPUT_DIR
+from pycovid.catalog import catalog
+from pycovid.data_utils.phe import MANUFACTURERS
 
 
 def make_title(figure, dose):
-    return f"{manufacturer[figure]} Dose {dose}"
-
-
-def read_csv(figure, dose):
-    file = f"{DATA_DIR}/Fig_{figure}_Dose_{dose}.csv"
-    df = pd.read_csv(file)
-    df["day"] = df["d1"] + (df["d2"] - df["d1"]) / 2
-    df.set_index(df["day"], inplace=True)
-
-    return df["odds ratio"]
+    return f"{MANUFACTURERS[figure]} Dose {dose}"
 
 
 def plot():
@@ -86,7 +71,7 @@ def plot():
                 linestyle = "dotted"
 
             title = make_title(fig, dose)
-            df = read_csv(fig, dose)
+            df = catalog.get("phe-odds-ratio", figure=fig, dose=dose)
             df = df.iloc[1:]
             ax1.plot(df.index, df, color=colour, linestyle=linestyle, label=title)
 
@@ -4,3 +4,4 @@ import pathlib
 ROOT_DIR = pathlib.Path(__file__).parent.parent.parent.absolute()
 DATA_DIR = ROOT_DIR / "data"
 OUTPUT_DIR = ROOT_DIR / "output"
+CACHE_DIR = ROOT_DIR / "cache"
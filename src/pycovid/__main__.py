@@ -0,0 +1,94 @@
+"""
+__main__.py
+
+Command line entry point:
+
+    python -m pycovid serve [--host HOST] [--port PORT] [--source NAME[@VERSION] ...]
+    python -m pycovid memory-report [--source NAME[@VERSION] ...]
+"""
+
+import argparse
+import sys
+
+from pycovid.client import DEFAULT_PORT, HOST
+
+
+def parse_source(text: str):
+    """Parse NAME or NAME@VERSION."""
+    name, _, version = text.partition("@")
+    return name, version or None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="pycovid")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser(
+        "serve", help="keep data sources loaded and serve them over localhost HTTP"
+    )
+    serve_parser.add_argument("--host", default=HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument(
+        "--source",
+        action="append",
+        type=parse_source,
+        dest="sources",
+        help="a source to preload, NAME or NAME@VERSION (default: the latest version of every source)",
+    )
+
+    report_parser = commands.add_parser(
+        "memory-report", help="show the memory the low memory mode saves per source"
+    )
+    report_parser.add_argument(
+        "--source",
+        action="append",
+        type=parse_source,
+        dest="sources",
+        help="a source to measure, NAME or NAME@VERSION (default: the latest version of every source)",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        # render off screen: the server has no display
+        import matplotlib
+
+        matplotlib.use("Agg")
+        from pycovid.server import serve
+
+        serve(args.host, args.port, args.sources)
+    elif args.command == "memory-report":
+        memory_report(args.sources)
+
+
+def memory_report(sources=None):
+    """Load sources in each memory mode and print the bytes the low mode saves for each."""
+    from pycovid.catalog import catalog
+    from pycovid.memory import MEMORY_MODES, memory_mode, memory_report
+
+    if sources is None:
+        names = dict.fromkeys(source.name for source in catalog.sources())
+        sources = [(name, None) for name in names]
+    requests = {
+        f"{name}@{catalog.source(name, version).version}": (name, {"version": version})
+        for name, version in sources
+    }
+
+    datasets = {}
+    for mode in MEMORY_MODES:
+        with memory_mode(mode):
+            futures = catalog.prefetch(requests)
+            datasets[mode] = {}
+            for label, future in futures.items():
+                # report the sources whose data files are present
+                try:
+                    datasets[mode][label] = future.result()
+                except Exception as error:
+                    if mode == MEMORY_MODES[0]:
+                        print(f"could not load {label}: {error!r}", file=sys.stderr)
+
+    print(memory_report(datasets["default"], datasets["low"]).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+animation.py
+
+Animate a figure from `create_figure`, revealing the curves day by day and each event annotation on its date.
+
+The figure is drawn in full once, without its animated artists (those `create_figure` tags with a gid), and the pixels
+are kept as the background: axes, date locators, regions, legend and watermark are never redrawn. Each frame restores
+the background and draws only the animated lines cut at the frame's date (blitting). An event annotation is drawn
+into the background on the frame it appears, so it too is drawn once. Frames are streamed to the writer as they are
+rendered: a PNG sequence, or raw RGBA piped to ffmpeg.
+
+    fig, _ = create_figure(title, df, fits=fits, regions=regions, events=events)
+    with frame_writer(OUTPUT_DIR / "Fig 2 2020.mp4") as writer:
+        animate_figure(fig, writer)
+"""
+
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Union
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.text import Annotation
+
+FPS = 30
+STEP_DAYS = 1  # days revealed a frame
+CODECS = {
+    ".mp4": "libx264",
+    ".mkv": "libx264",
+    ".mov": "libx264",
+    ".webm": "libvpx-vp9",
+}
+
+
+class PNGSequenceWriter:
+    """Write frames as numbered PNG files to a directory."""
+
+    def __init__(self, directory: Union[str, Path], prefix: str = "frame"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.frames = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, frame: np.ndarray):
+        """Write an RGBA frame, shape (height, width, 4)."""
+        plt.imsave(self.directory / f"{self.prefix}_{self.frames:05d}.png", frame)
+        self.frames += 1
+
+    def close(self):
+        pass
+
+
+class FFmpegWriter:
+    """Pipe frames to ffmpeg as raw RGBA video. ffmpeg is started on the first frame, which sets the size."""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        fps: int = FPS,
+        codec: Optional[str] = None,
+        ffmpeg: Optional[str] = None,
+    ):
+        self.path = Path(path)
+        self.fps = fps
+        self.codec = codec or CODECS.get(self.path.suffix, "libx264")
+        self.ffmpeg = ffmpeg or matplotlib.rcParams["animation.ffmpeg_path"]
+        self.frames = 0
+        self._process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, frame: np.ndarray):
+        """Write an RGBA frame, shape (height, width, 4)."""
+        if self._process is None:
+            height, width = frame.shape[:2]
+            self._process = subprocess.Popen(
+                [
+                    self.ffmpeg,
+                    "-y",
+                    "-loglevel",
+                    "error",
+                    "-f",
+                    "rawvideo",
+                    "-pix_fmt",
+                    "rgba",
+                    "-s",
+                    f"{width}x{height}",
+                    "-r",
+                    str(self.fps),
+                    "-i",
+                    "-",
+                    "-vcodec",
+                    self.codec,
+                    "-pix_fmt",
+                    "yuv420p",
+                    str(self.path),
+                ],
+                stdin=subprocess.PIPE,
+            )
+        self._process.stdin.write(np.ascontiguousarray(frame).data)
+        self.frames += 1
+
+    def close(self):
+        if self._process is None:
+            return
+        self._process.stdin.close()
+        if self._process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed writing {self.path}")
+        self._process = None
+
+
+Writer = Union[PNGSequenceWriter, FFmpegWriter]
+
+
+def frame_writer(path: Union[str, Path], fps: int = FPS) -> Writer:
+    """Create a writer for a video file (a suffix in CODECS, written by ffmpeg) or else a directory of PNG frames."""
+    path = Path(path)
+    if path.suffix in CODECS:
+        return FFmpegWriter(path, fps)
+    return PNGSequenceWriter(path)
+
+
+def reveal_line(line: Line2D, xy: np.ndarray, date: float):
+    line.set_data(*xy[xy[:, 0] <= date].T)
+
+
+def reveal_collection(
+    collection: PolyCollection, vertices: List[np.ndarray], date: float
+):
+    # a filled area's outline runs out along the curve and back along the base: cutting it keeps a polygon
+    collection.set_verts([v[v[:, 0] <= date] for v in vertices])
+
+
+def animate_figure(
+    fig: Figure,
+    writer: Writer,
+    step: int = STEP_DAYS,
+    dates: Optional[np.ndarray] = None,
+) -> int:
+    """
+    Write the frames of a figure revealed day by day.
+
+    Artists with a gid are animated: lines and filled areas are revealed up to each frame's date, and annotations
+    appear from the date they point at. Everything else is drawn once.
+
+    :param fig: A figure from `create_figure`
+    :param writer: Where to write the frames
+    :param step: Days revealed a frame
+    :param dates: The date of each frame, as matplotlib date numbers (default: from the first to the last date of
+        the animated lines, every step days)
+    :return: the number of frames written
+    """
+    animated = fig.findobj(
+        lambda artist: artist.get_gid() is not None
+        and isinstance(artist, (Line2D, PolyCollection, Annotation))
+    )
+    lines = [a for a in animated if isinstance(a, Line2D)]
+    collections = [a for a in animated if isinstance(a, PolyCollection)]
+    annotations = sorted(
+        (a for a in animated if isinstance(a, Annotation)), key=lambda a: a.xy[0]
+    )
+
+    # the full data of each artist, before it is cut
+    line_data = [line.get_xydata() for line in lines]
+    collection_data = [
+        [path.vertices.copy() for path in collection.get_paths()]
+        for collection in collections
+    ]
+    if dates is None:
+        x = np.concatenate([xy[:, 0] for xy in line_data] or [np.array([])])
+        x = x[np.isfinite(x)]
+        dates = np.arange(x.min(), x.max() + step, step) if len(x) else np.array([])
+
+    for artist in animated:
+        artist.set_animated(True)
+
+    # draw the static parts once
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+
+    shown = 0
+    try:
+        for date in dates:
+            if shown < len(annotations) and annotations[shown].xy[0] <= date:
+                canvas.restore_region(background)
+                while shown < len(annotations) and annotations[shown].xy[0] <= date:
+                    fig.draw_artist(annotations[shown])
+                    shown += 1
+                background = canvas.copy_from_bbox(fig.bbox)
+
+            canvas.restore_region(background)
+            for collection, vertices in zip(collections, collection_data):
+                reveal_collection(collection, vertices, date)
+                fig.draw_artist(collection)
+            for line, xy in zip(lines, line_data):
+                reveal_line(line, xy, date)
+                fig.draw_artist(line)
+            writer.write(np.asarray(canvas.buffer_rgba()))
+    finally:
+        # leave the figure as it was
+        for line, xy in zip(lines, line_data):
+            line.set_data(*xy.T)
+        for collection, vertices in zip(collections, collection_data):
+            collection.set_verts(vertices)
+        for artist in animated:
+            artist.set_animated(False)
+
+    return len(dates)
@@ -0,0 +1,356 @@
+"""
+catalog.py
+
+A registry of the data sources used for COVID-19 analysis.
+
+Sources are registered by name and version and loaded lazily on first access. Loaded data is held in a least recently
+used cache keyed on (source, version, parameters) and bounded by the measured memory usage of the cached frames. Data
+is handed out as read-only views, so callers can add or drop columns freely but cannot corrupt the cached values.
+
+Independent sources can be prefetched concurrently at startup with `Catalog.prefetch`.
+"""
+
+import dataclasses
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pycovid.data_utils.cmi import read_CMI_cumulative_SMR, read_CMI_SMR
+from pycovid.data_utils.nhs import read_vaccination_data
+from pycovid.data_utils.ons import (
+    compute_skiprows,
+    prepare_fatal_infection_data,
+    read_ONS_daily_registrations,
+    XLMeta,
+)
+from pycovid.data_utils.owid import prepare_owid_data
+from pycovid.data_utils.phe import read_PHE_odds_ratio
+from pycovid.government_response import (
+    government_response,
+    OXCGRT_CSV,
+    policy_events,
+    read_policy_cube,
+)
+from pycovid.memory import get_memory_mode, memory_usage
+from pycovid.prefetch import LoaderCall, prefetch
+from pycovid import DATA_DIR
+
+DEFAULT_MEMORY_BUDGET = 1024**3  # bytes
+_registrations = itertools.count()
+
+Frame = Union[pd.DataFrame, pd.Series]
+
+
+@dataclass
+class SourceItem:
+    """Class for holding a registered data source."""
+
+    name: str
+    version: str
+    loader: Callable[..., Frame]
+    defaults: dict = field(default_factory=dict)
+    # distinguishes registrations of the same name and version, for caches keyed on a source
+    registration: int = field(
+        default_factory=lambda: next(_registrations), compare=False, repr=False
+    )
+
+
+@dataclass
+class CacheStats:
+    """Class for reporting the state of the catalog cache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    memory_usage: int
+    memory_budget: int
+
+
+class Catalog:
+    """A registry of data sources with a memory-bounded LRU cache of loaded frames."""
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self._sources: Dict[str, Dict[str, SourceItem]] = {}
+        self._cache: "OrderedDict[tuple, Frame]" = OrderedDict()
+        self._sizes: Dict[tuple, int] = {}
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def register(
+        self, name: str, version: str, loader: Callable[..., Frame], **defaults
+    ) -> SourceItem:
+        """
+        Register a loader as a version of a named source.
+
+        :param name: The source name, e.g. "ons-fatal-infections"
+        :param version: The data release, e.g. "2021-w28". The most recently registered version is the default.
+        :param loader: A function returning a dataframe or series
+        :param defaults: Keyword arguments passed to the loader unless overridden in `get`
+        :return: the registered source
+        """
+        source = SourceItem(name, version, loader, defaults)
+        with self._lock:
+            versions = self._sources.setdefault(name, {})
+            versions.pop(version, None)
+            versions[version] = source
+            self._discard(lambda key: key[:2] == (name, version))
+        return source
+
+    def sources(self) -> List[SourceItem]:
+        """Return every registered source version."""
+        with self._lock:
+            return [s for versions in self._sources.values() for s in versions.values()]
+
+    def source(self, name: str, version: Optional[str] = None) -> SourceItem:
+        """Return the registered source for name and version (default: latest)."""
+        if name not in self._sources:
+            raise AttributeError(
+                f"source not in {list(self._sources.keys())}: got {name}"
+            )
+        versions = self._sources[name]
+        if version is None:
+            return list(versions.values())[-1]
+        if version not in versions:
+            raise AttributeError(
+                f"version of {name} not in {list(versions.keys())}: got {version}"
+            )
+        return versions[version]
+
+    def get(self, name: str, version: Optional[str] = None, **params) -> Frame:
+        """
+        Get a read-only view of a source, loading it on first access.
+
+        :param name: The source name
+        :param version: The data release (default: latest registered)
+        :param params: Keyword arguments passed to the loader, overriding the registered defaults
+        :return: a shallow copy of the cached frame whose values cannot be written to
+        """
+        source, kwargs, key = self._resolve(name, version, params)
+
+        with self._lock:
+            if key in self._cache:
+                return self._hit(key)
+            self._misses += 1
+
+        # load outside the lock so independent sources can load concurrently
+        return self._insert(key, source.loader(**kwargs))
+
+    def prefetch(
+        self, requests: Dict[str, Tuple[str, dict]], processes: bool = True
+    ) -> Dict[str, Future]:
+        """
+        Start loading several sources concurrently and return futures to join on when the data is needed.
+
+        :param requests: (source name, `get` keyword arguments) by result name
+        :param processes: Load in a process pool (default) or a thread pool
+        :return: a future for each request, resolving to the same read-only view `get` returns
+        """
+        futures = {}
+        calls = {}
+        keys = {}
+        for result_name, (name, get_kwargs) in requests.items():
+            get_kwargs = dict(get_kwargs)
+            version = get_kwargs.pop("version", None)
+            source, kwargs, key = self._resolve(name, version, get_kwargs)
+            with self._lock:
+                if key in self._cache:
+                    futures[result_name] = Future()
+                    futures[result_name].set_result(self._hit(key))
+                    continue
+                self._misses += 1
+            calls[result_name] = LoaderCall(source.loader, kwargs)
+            keys[result_name] = key
+
+        for result_name, loading in prefetch(calls, processes).items():
+            futures[result_name] = Future()
+            loading.add_done_callback(
+                partial(self._resolve_future, keys[result_name], futures[result_name])
+            )
+
+        return {result_name: futures[result_name] for result_name in requests}
+
+    def is_cached(self, name: str, version: Optional[str] = None, **params) -> bool:
+        """Return True if the source is loaded for these parameters."""
+        _, _, key = self._resolve(name, version, params)
+        with self._lock:
+            return key in self._cache
+
+    def clear(self, name: Optional[str] = None):
+        """Drop cached frames for a source (default: all sources)."""
+        with self._lock:
+            self._discard(lambda key: name is None or key[0] == name)
+
+    def stats(self) -> CacheStats:
+        """Return hit, miss and memory statistics for the cache."""
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._cache),
+                memory_usage=sum(self._sizes.values()),
+                memory_budget=self.memory_budget,
+            )
+
+    def _resolve(self, name: str, version: Optional[str], params: dict):
+        source = self.source(name, version)
+        kwargs = {**source.defaults, **params}
+        # loaders return different dtypes in each memory mode
+        key = (source.name, source.version, freeze(kwargs), get_memory_mode())
+        return source, kwargs, key
+
+    def _hit(self, key: tuple) -> Frame:
+        self._hits += 1
+        self._cache.move_to_end(key)
+        return self._cache[key].copy(deep=False)
+
+    def _insert(self, key: tuple, data: Frame) -> Frame:
+        set_read_only(data)
+        size = int(memory_usage(data))
+        with self._lock:
+            self._cache[key] = data
+            self._sizes[key] = size
+            self._evict()
+        return data.copy(deep=False)
+
+    def _resolve_future(self, key: tuple, future: Future, loading: Future):
+        try:
+            future.set_result(self._insert(key, loading.result()))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _evict(self):
+        """Evict least recently used frames until the cache fits the memory budget."""
+        # always keep the most recently loaded frame, even if it alone exceeds the budget
+        while len(self._cache) > 1 and sum(self._sizes.values()) > self.memory_budget:
+            key, _ = self._cache.popitem(last=False)
+            del self._sizes[key]
+            self._evictions += 1
+
+    def _discard(self, predicate: Callable[[tuple], bool]):
+        for key in [key for key in self._cache if predicate(key)]:
+            del self._cache[key]
+            del self._sizes[key]
+
+
+def freeze(value):
+    """Convert loader arguments into a hashable cache key."""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return (type(value).__name__, freeze(dataclasses.asdict(value)))
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = tuple(freeze(v) for v in value)
+        return (
+            tuple(sorted(items, key=repr))
+            if isinstance(value, (set, frozenset))
+            else items
+        )
+    return value
+
+
+def set_read_only(data: Frame):
+    """
+    Mark the arrays backing a dataframe or series as read-only.
+
+    This covers numpy blocks and the numpy arrays inside extension arrays (categorical codes, datetimes with a time
+    zone, the data and mask of nullable dtypes). Arrow-backed arrays are immutable already. Mutable objects held in
+    object columns can still be changed in place.
+    """
+    # pandas has no public API for this: the block manager owns the arrays shared by shallow copies
+    for block in data._mgr.blocks:
+        values = block.values
+        arrays = [values] + [
+            getattr(values, name, None) for name in ["_ndarray", "_data", "_mask"]
+        ]
+        for array in arrays:
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+
+
+# default sources ##################################################################
+
+
+def _ons_fatal_infections(
+    workbook: str, start_row: int, end_row: int, region: str
+) -> pd.DataFrame:
+    return prepare_fatal_infection_data(XLMeta(workbook, region, start_row, end_row))
+
+
+def _ons_registrations(workbook: str, start_row: int, end_row: int) -> pd.DataFrame:
+    skiprows = compute_skiprows(start_row, end_row)
+    return read_ONS_daily_registrations(DATA_DIR / workbook, skiprows)
+
+
+ONS_RELEASES = {
+    "2021-w14": dict(workbook="publishedweek142021.xlsx", start_row=4, end_row=408),
+    "2021-w28": dict(workbook="publishedweek282021.xlsx", start_row=4, end_row=506),
+}
+NHS_RELEASES = {
+    "2021-04-15": "COVID-19-monthly-announced-vaccinations-15-April-2021-revised.xlsx",
+    "2021-05-13": "COVID-19-monthly-announced-vaccinations-13-May-2021.xlsx",
+}
+CMI_RELEASES = {
+    "2021-Q1": "Mortality-monitor-spreadsheet-Q1-2021-v01-2021-04-13.xlsx",
+}
+OWID_RELEASES = {
+    "2021-07-28": "owid-covid-data-uk-india-280721.csv",
+}
+
+
+def _oxcgrt_policy_events(csvfile: str) -> pd.DataFrame:
+    return policy_events(read_policy_cube(csvfile))
+
+
+def register_default_sources(catalog: Catalog):
+    """Register every data source shipped under DATA_DIR."""
+    for version, release in ONS_RELEASES.items():
+        catalog.register("ons-registrations", version, _ons_registrations, **release)
+        catalog.register(
+            "ons-fatal-infections",
+            version,
+            _ons_fatal_infections,
+            region="England",
+            **release,
+        )
+    for version, workbook in NHS_RELEASES.items():
+        catalog.register(
+            "nhs-vaccinations", version, read_vaccination_data, workbook=workbook
+        )
+    for version, filename in CMI_RELEASES.items():
+        catalog.register(
+            "cmi-smr", version, read_CMI_SMR, filename=filename, smr_set="weekly"
+        )
+        catalog.register(
+            "cmi-cumulative-smr",
+            version,
+            read_CMI_cumulative_SMR,
+            filename=filename,
+            gender="Unisex",
+            age_range="20to100",
+        )
+    for version, csvfile in OWID_RELEASES.items():
+        catalog.register(
+            "owid-deaths", version, prepare_owid_data, csvfile=csvfile, country=None
+        )
+    catalog.register(
+        "oxcgrt", "latest", government_response, measures=["stringency_index"]
+    )
+    catalog.register(
+        "oxcgrt-policy-events", "latest", _oxcgrt_policy_events, csvfile=OXCGRT_CSV
+    )
+    catalog.register("phe-odds-ratio", "week-20", read_PHE_odds_ratio)
+
+
+catalog = Catalog()
+register_default_sources(catalog)
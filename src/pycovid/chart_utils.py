@@ -7,9 +7,34 @@ Utilities for preparing charts for COVID-19 analysis.
 from dataclasses import dataclass, InitVar
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-from matplotlib.dates import MonthLocator, YearLocator, DateFormatter, datestr2num
-from typing import List
+from matplotlib.collections import (
+    Collection,
+    LineCollection,
+    PathCollection,
+    PolyCollection,
+)
+from matplotlib.colors import to_rgba
+from matplotlib.dates import (
+    MonthLocator,
+    YearLocator,
+    DateFormatter,
+    date2num,
+    datestr2num,
+)
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+from pycovid.downsample import downsample
+from pycovid.events import EventItem
+from pycovid.panel import Panel
+from typing import Dict, List, Optional, Union
+
+# the keyword of a collection's offset transform: transOffset before matplotlib 3.6
+OFFSET_TRANSFORM = (
+    "offset_transform" if hasattr(Collection, "set_offset_transform") else "transOffset"
+)
 
 
 @dataclass
@@ -35,14 +60,6 @@ class RegionItem:
         self.x2 = pd.to_datetime(end)
 
 
-@dataclass
-class EventItem:
-    """Class for holding Non Pharmaceutical Event information."""
-
-    date: str
-    label: str
-
-
 @dataclass
 class LabelOrigin:
     """Class for holding the origin of the labels in a plot."""
@@ -53,15 +70,30 @@ class LabelOrigin:
 
 def create_figure(
     title: str,
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, Panel],
     fits: List[FitItem] = [],
     regions: List[RegionItem] = [],
     events: List[EventItem] = [],
     show_deaths=False,
     show_vaccinations=False,
     label_origin=LabelOrigin(100, 180),
+    target_points: Optional[int] = None,
 ):
-    """Create a side-by-side figure of fatal infections and (optionally) vaccinations, with overlays."""
+    """
+    Create a side-by-side figure of fatal infections and (optionally) vaccinations, with overlays.
+
+    The series, fits and event annotations are tagged with a gid ("infections", "fit 1", "event 1", ...) so that
+    `pycovid.animation` can reveal them day by day over the rest of the figure.
+
+    :param target_points: Downsample each series to about this many points before plotting (default: every point).
+        Peaks, event dates and region boundaries are kept exactly.
+    :return: a tuple (figure, (axes, log scale axes, vaccination axes or None))
+    """
+
+    if target_points is not None:
+        keep = [event.date for event in events]
+        keep += [date for region in regions for date in (region.x1, region.x2)]
+        df = downsample(df, target_points, keep=keep)
 
     fig, (ax1, ax2) = plt.subplots(1, 2)
     if show_vaccinations:
@@ -95,10 +127,22 @@ def create_figure(
 
     # plot fatal infections (left panel)
     if show_deaths:
-        ax1.plot(df.index, df["deaths (raw)"], color="lightgrey", label="deaths (raw)")
-        ax1.plot(df.index, df["infections"], color="tab:blue", label="fatal infections")
+        ax1.plot(
+            df.index,
+            df["deaths (raw)"],
+            color="lightgrey",
+            label="deaths (raw)",
+            gid="deaths (raw)",
+        )
+        ax1.plot(
+            df.index,
+            df["infections"],
+            color="tab:blue",
+            label="fatal infections",
+            gid="infections",
+        )
     else:
-        ax1.plot(df.index, df["infections"], color="lightgrey")
+        ax1.plot(df.index, df["infections"], color="lightgrey", gid="infections")
     ax1.set_ylabel("fatal infections")
     ax1.set_ylim([0, 1400])
 
@@ -107,7 +151,7 @@ def create_figure(
         color = "tab:blue"
     else:
         color = "lightgrey"
-    ax2.semilogy(df.index, df["infections"], color=color)
+    ax2.semilogy(df.index, df["infections"], color=color, gid="infections (log)")
     ax2.set_ylabel("fatal infections (logarithmic scale)")
     ax2.set_ylim([1, 1400])
 
@@ -115,18 +159,19 @@ def create_figure(
     if show_vaccinations:
         ax3.set_ylabel("Total vaccination doses (million)", color="m")
         ax3.set_ylim([0, df["Vaccinations"].max() / 1e6 * 2])
-        ax3.plot(df["Vaccinations"] / 1e6, color="m")
+        ax3.plot(df["Vaccinations"] / 1e6, color="m", gid="vaccinations")
         ax3.fill_between(
             x=df["Vaccinations"].index,
             y1=0,
             y2=df["Vaccinations"] / 1e6,
             color="m",
             alpha=0.1,
+            gid="vaccinations (fill)",
         )
 
-    for fit in fits:
-        ax1.plot(fit.infection, color=fit.colour)
-        ax2.plot(fit.infection, color=fit.colour)
+    for i, fit in enumerate(fits):
+        ax1.plot(fit.infection, color=fit.colour, gid=f"fit {i+1}")
+        ax2.plot(fit.infection, color=fit.colour, gid=f"fit {i+1} (log)")
 
     for region in regions:
         for ax in [ax1, ax2]:
@@ -148,6 +193,7 @@ def create_figure(
             xytext=(x, 1150),
             textcoords="data",
             arrowprops=dict(arrowstyle="-|>"),
+            gid=f"event {i+1}",
         )
         ax2.annotate(
             f"{i+1} {event.label}",
@@ -155,6 +201,204 @@ def create_figure(
             xytext=(label_origin.x, label_origin.y - i * 20),
             textcoords="axes pixels",
             arrowprops=dict(arrowstyle="-|>"),
+            gid=f"event {i+1} (label)",
+        )
+
+    ax1.legend(loc="upper center", ncol=max(len(regions), 1))
+
+    return fig, (ax1, ax2, ax3)
+
+
+def band_polygons(x: np.ndarray, low: np.ndarray, high: np.ndarray) -> List[np.ndarray]:
+    """The outlines of the area between low and high: one polygon per run of dates where both are known."""
+    known = np.isfinite(low) & np.isfinite(high)
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], known.astype(int), [0]])))
+    return [
+        np.concatenate(
+            [
+                np.column_stack([x[a:b], high[a:b]]),
+                np.column_stack([x[a:b], low[a:b]])[::-1],
+            ]
+        )
+        for a, b in zip(edges[::2], edges[1::2])
+    ]
+
+
+def text_paths(labels: List[str], size: float) -> List[Path]:
+    """Outlines of labels in points, each with its top left corner at the origin."""
+    paths = []
+    for label in labels:
+        path = TextPath((0, 0), label, size=size)
+        paths.append(Path(path.vertices - [0, path.get_extents().y1], path.codes))
+    return paths
+
+
+def create_small_multiples(
+    title: str,
+    df: Union[pd.DataFrame, Panel],
+    fits: Dict[str, List[FitItem]] = {},
+    regions: List[RegionItem] = [],
+    events: List[EventItem] = [],
+    ncols: int = 4,
+    log: bool = True,
+    context: bool = True,
+):
+    """
+    Create a grid of shared-axis subplots, one per column of df (e.g. every ONS region).
+
+    Each subplot is drawn with a fixed number of artists and vertices whatever the number of columns: one
+    PolyCollection for the range of every column (the grey context, computed once and shared), one LineCollection for
+    the subplot's own column and one for fits, one PolyCollection for regions and one for event lines, and one scatter
+    of event markers. Event numbers are placed on the top row only, as one PathCollection, and the event labels listed
+    once below the grid.
+
+    :param df: Daily data, one column per subplot
+    :param fits: Fits to overlay, by column name
+    :param regions: Date ranges shaded on every subplot
+    :param events: Events marked on every subplot
+    :param ncols: Subplots per row
+    :param log: Use a logarithmic y axis
+    :param context: Shade the range of every column in grey behind each subplot's own column
+    :return: a tuple (figure, array of axes)
+    """
+    columns = list(df.columns)
+    nrows = -(-len(columns) // ncols)
+    fig, axes = plt.subplots(
+        nrows,
+        ncols,
+        sharex=True,
+        sharey=True,
+        squeeze=False,
+        figsize=(4 * ncols, 2.5 * nrows),
+    )
+    fig.patch.set_facecolor("white")
+    fig.suptitle(title)
+
+    # every series as (x, y) vertices, computed once
+    x = date2num(df.index)
+    values = np.column_stack([df[column].to_numpy(dtype=float) for column in columns])
+    if log:
+        values = np.where(values > 0, values, np.nan)
+    segments = np.stack([np.broadcast_to(x[:, None], values.shape), values], axis=-1)
+    segments = segments.transpose(1, 0, 2)  # (column, date, xy)
+
+    # the context: the daily range of every column, whose vertices do not grow with the number of columns
+    context_polygons = (
+        band_polygons(x, np.fmin.reduce(values, axis=1), np.fmax.reduce(values, axis=1))
+        if context
+        else []
+    )
+
+    # regions and events are the same on every subplot, in x data / y axes coordinates
+    region_vertices = [
+        [(x1, 0), (x1, 1), (x2, 1), (x2, 0)]
+        for x1, x2 in zip(
+            date2num([r.x1 for r in regions]), date2num([r.x2 for r in regions])
+        )
+    ]
+    region_colours = [to_rgba(r.color, 0.1) for r in regions]
+    event_x = datestr2num([event.date for event in events]) if events else np.array([])
+    event_rows = np.searchsorted(x, event_x).clip(0, max(len(x) - 1, 0))
+    event_segments = [[(ex, 0), (ex, 1)] for ex in event_x]
+    event_numbers = text_paths([f"{n + 1}" for n in range(len(event_x))], size=8)
+    # numbers drawn in points from an offset 3 days right of each event line, near the top
+    points = Affine2D().scale(1 / 72) + fig.dpi_scale_trans
+
+    grey, highlight = to_rgba("lightgrey"), to_rgba("tab:blue")
+
+    for i, ax in enumerate(axes.flat):
+        if i >= len(columns):
+            ax.set_visible(False)
+            continue
+        column = columns[i]
+
+        if context_polygons:
+            ax.add_collection(
+                PolyCollection(context_polygons, facecolors=grey, linewidths=0)
+            )
+        ax.add_collection(
+            LineCollection(segments[i : i + 1], colors=highlight, linewidths=1)
+        )
+
+        column_fits = fits.get(column, [])
+        if column_fits:
+            ax.add_collection(
+                LineCollection(
+                    [
+                        np.column_stack(
+                            [
+                                date2num(fit.infection.index),
+                                fit.infection.to_numpy(dtype=float),
+                            ]
+                        )
+                        for fit in column_fits
+                    ],
+                    colors=[fit.colour for fit in column_fits],
+                    linewidths=1.5,
+                )
+            )
+
+        transform = ax.get_xaxis_transform()
+        if regions:
+            ax.add_collection(
+                PolyCollection(
+                    region_vertices, facecolors=region_colours, transform=transform
+                ),
+                autolim=False,
+            )
+        if events:
+            ax.add_collection(
+                LineCollection(
+                    event_segments,
+                    colors="grey",
+                    linestyles="dotted",
+                    linewidths=0.8,
+                    transform=transform,
+                ),
+                autolim=False,
+            )
+            ax.scatter(event_x, values[event_rows, i], s=12, color="black", zorder=3)
+            if i < ncols:
+                # number each event just to the right of its line
+                ax.add_collection(
+                    PathCollection(
+                        event_numbers,
+                        offsets=np.column_stack(
+                            [event_x + 3, np.full(len(event_x), 0.97)]
+                        ),
+                        transform=points,
+                        facecolors="black",
+                        linewidths=0,
+                        **{OFFSET_TRANSFORM: transform},
+                    ),
+                    autolim=False,
+                )
+
+        ax.set_title(column, fontsize=10)
+
+    ax = axes.flat[0]
+    if log:
+        ax.set_yscale("log")
+    finite = values[np.isfinite(values)]
+    if len(finite):
+        ax.set_ylim(
+            finite.min() / 1.5 if log else min(finite.min(), 0), finite.max() * 1.5
+        )
+    if len(x):
+        ax.set_xlim(x[0], x[-1])
+    for ax in axes[-1]:
+        ax.xaxis.set_major_locator(YearLocator())
+        ax.xaxis.set_major_formatter(DateFormatter("\n%Y"))
+        ax.xaxis.set_minor_locator(MonthLocator((1, 4, 7, 10)))
+        ax.xaxis.set_minor_formatter(DateFormatter("%b"))
+
+    if events:
+        fig.text(
+            0.01,
+            0.01,
+            "   ".join(f"{n + 1} {event.label}" for n, event in enumerate(events)),
+            fontsize=8,
+            va="bottom",
         )
 
-    ax1.legend(loc="upper center", ncol=len(regions))
+    return fig, axes
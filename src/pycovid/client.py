@@ -0,0 +1,164 @@
+"""
+client.py
+
+A thin client for a running `pycovid serve` data server.
+
+`connect()` returns a RemoteCatalog when a server is running and the in-process catalog otherwise, so scripts can
+replace `from pycovid.catalog import catalog` with `catalog = connect()` and keep their `get` and `prefetch` calls:
+
+    catalog = connect()
+    df = catalog.get("ons-fatal-infections", version="2021-w28")
+"""
+
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+TIMEOUT = 60  # seconds
+KIND = b"pycovid.kind"  # Arrow schema metadata: b"series" if the table holds a series
+
+
+class RemoteCatalog:
+    """The `Catalog` interface, answered by a data server."""
+
+    def __init__(self, host: str = HOST, port: int = DEFAULT_PORT):
+        self.url = f"http://{host}:{port}"
+
+    def _request(self, path: str, request: Optional[dict] = None) -> bytes:
+        data = None if request is None else json.dumps(request).encode()
+        try:
+            with urllib.request.urlopen(
+                f"{self.url}{path}", data=data, timeout=TIMEOUT
+            ) as response:
+                return response.read()
+        except urllib.error.HTTPError as error:
+            message = error.read().decode()
+            if error.code == 400:
+                raise AttributeError(message) from None
+            raise RuntimeError(f"{path} failed: {message}") from None
+
+    def is_alive(self) -> bool:
+        try:
+            self.sources()
+        except (OSError, RuntimeError):
+            return False
+        return True
+
+    def sources(self) -> List[Tuple[str, str]]:
+        """Return the (name, version) of every source registered with the server."""
+        return [tuple(source) for source in json.loads(self._request("/sources"))]
+
+    def stats(self) -> dict:
+        return json.loads(self._request("/stats"))
+
+    def get(
+        self,
+        name: str,
+        version: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        **params,
+    ) -> Union[pd.DataFrame, pd.Series]:
+        """
+        Get a source from the server, as `Catalog.get`.
+
+        :param start: The first date to return
+        :param end: The last date to return
+        :param columns: The columns to return (default: all)
+        :return: a series for a series source (unless columns are requested), else a dataframe
+        """
+        request = _request_body(name, version, params, start, end)
+        if columns is not None:
+            request["columns"] = columns
+        return from_arrow(self._request("/data", request))
+
+    def prefetch(
+        self, requests: Dict[str, Tuple[str, dict]], processes: bool = True
+    ) -> Dict[str, Future]:
+        """Get several sources, as `Catalog.prefetch`: the server has already loaded them."""
+        futures = {}
+        for result_name, (name, get_kwargs) in requests.items():
+            futures[result_name] = Future()
+            try:
+                futures[result_name].set_result(self.get(name, **get_kwargs))
+            except Exception as error:
+                futures[result_name].set_exception(error)
+        return futures
+
+    def fit(
+        self,
+        name: str,
+        column: str,
+        start: str,
+        end: str,
+        version: Optional[str] = None,
+        **params,
+    ) -> pd.DataFrame:
+        """Fit log10 of a column of a source between start and end: columns "log fit" and "fit"."""
+        request = _request_body(name, version, params, start, end)
+        request["column"] = column
+        return from_arrow(self._request("/fit", request))
+
+    def render(
+        self,
+        name: str,
+        chart: str = "figure",
+        title: str = "",
+        version: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        regions: List[Tuple[str, str, str, str]] = [],
+        events: List[Tuple[str, str]] = [],
+        **params,
+    ) -> bytes:
+        """
+        Render a chart of a source on the server.
+
+        :param chart: "figure" (`create_figure`) or "small-multiples" (`create_small_multiples`)
+        :param regions: (start, end, color, label) of each shaded region
+        :param events: (date, label) of each event
+        :return: the PNG image
+        """
+        request = _request_body(name, version, params, start, end)
+        request.update(chart=chart, title=title, regions=regions, events=events)
+        if columns is not None:
+            request["columns"] = columns
+        return self._request("/render", request)
+
+
+def _request_body(name, version, params, start, end) -> dict:
+    request = {"name": name, "version": version, "params": params}
+    if start is not None:
+        request["start"] = start
+    if end is not None:
+        request["end"] = end
+    return request
+
+
+def from_arrow(data: bytes) -> Union[pd.DataFrame, pd.Series]:
+    """Deserialise an Arrow IPC stream written by `server.to_arrow`."""
+    table = pa.ipc.open_stream(data).read_all()
+    df = table.to_pandas()
+    if (table.schema.metadata or {}).get(KIND) == b"series":
+        return df.iloc[:, 0]
+    return df
+
+
+def connect(host: str = HOST, port: int = DEFAULT_PORT):
+    """Return a RemoteCatalog if a server is running, else the in-process catalog."""
+    remote = RemoteCatalog(host, port)
+    if remote.is_alive():
+        return remote
+
+    from pycovid.catalog import catalog
+
+    return catalog
@@ -1 +1 @@
-from .data_utils import polyfit
+from .data_utils import batched_linregress, polyfit
@@ -1,5 +1,8 @@
 import pandas as pd
 from pycovid import DATA_DIR
+from pycovid.data_utils.xlsx import read_xlsx
+from pycovid.memoize import memoize
+from pycovid.memory import low_memory
 
 SETS = {
     "weekly": "WeeklySMR",
@@ -26,6 +29,8 @@ def compute_cols_for_gender_agerange(gender: str) -> str:
     return [f"{gender[0]}_{age_range}" for age_range in AGE_RANGES]
 
 
+@low_memory
+@memoize(inputs=lambda filename, smr_set: [DATA_DIR / "CMI" / filename])
 def read_CMI_SMR(filename: str, smr_set: str):
     """
     Create dataframe, index ["Gender", "AgeBand", "Year"] column "Week number"
@@ -42,9 +47,7 @@ def read_CMI_SMR(filename: str, smr_set: str):
 
     # Create dataframe, index ["Gender", "AgeBand", "Year"], column "Week number"
 
-    df_raw = pd.read_excel(
-        FILE, sheet_name=SETS.get(smr_set), usecols="C:N, T:AC, AI:AR"
-    )
+    df_raw = read_xlsx(FILE, sheet_name=SETS.get(smr_set), usecols="C:N, T:AC, AI:AR")
 
     # construct a dataframe from each gender
     df = pd.DataFrame()
@@ -71,6 +74,8 @@ def read_CMI_SMR(filename: str, smr_set: str):
     return df
 
 
+@low_memory
+@memoize(inputs=lambda filename, **kwargs: [DATA_DIR / "CMI" / filename])
 def read_CMI_cumulative_SMR(
     filename: str,
     gender: str,
@@ -93,7 +98,7 @@ def read_CMI_cumulative_SMR(
         sheetname = "CumulativeSMR"
 
     FILE = DATA_DIR / "CMI" / filename
-    df_raw = pd.read_excel(
+    df_raw = read_xlsx(
         FILE,
         sheet_name=sheetname,
         usecols="A:C, F:NG",
@@ -36,3 +36,36 @@ def polyfit(
     infections_fit = 10 ** (log_infections_fit)
 
     return log_infections_fit, infections_fit
+
+
+def batched_linregress(
+    y: np.ndarray, x: np.ndarray = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute least squares straight line fits for every row of y at once, ignoring NaNs.
+
+    :param y: A 2D array, one series per row
+    :param x: The sample positions, shared (1D) or per row (2D). Defaults to 0, 1, 2, ...
+    :return: a tuple containing the slope and intercept of each row (NaN where fewer than two points)
+    """
+    y = np.atleast_2d(y)
+    if x is None:
+        x = np.arange(y.shape[1], dtype=float)
+    x = np.broadcast_to(x, y.shape)
+
+    valid = np.isfinite(y) & np.isfinite(x)
+    n = valid.sum(axis=1)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = x.sum(axis=1) / n
+        y_mean = y.sum(axis=1) / n
+        dx = np.where(valid, x - x_mean[:, None], 0.0)
+        dy = np.where(valid, y - y_mean[:, None], 0.0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+        intercept = y_mean - slope * x_mean
+
+    slope[n < 2] = np.nan
+    intercept[n < 2] = np.nan
+
+    return slope, intercept
@@ -1,16 +1,18 @@
 import pandas as pd
 from pycovid import DATA_DIR
+from pycovid.data_utils.xlsx import read_xlsx
+from pycovid.memory import low_memory
 
 
+@low_memory
 def read_vaccination_data(workbook: str) -> pd.DataFrame:
     """Read NHS Vaccination data for England and return as a dataframe."""
     skiprows = list(range(12)) + list(range(129, 500))
-    df = pd.read_excel(
+    df = read_xlsx(
         DATA_DIR / workbook,
         sheet_name="Vaccination Date",
         usecols="B,T",
         skiprows=skiprows,
-        parse_dates=True,
         index_col=0,
     )
     df.columns = ["Total doses"]
@@ -6,12 +6,20 @@ from typing import List
 import numpy as np
 import pandas as pd
 from pycovid import DATA_DIR
+from pycovid.data_utils.xlsx import read_xlsx
+from pycovid.memoize import memoize
+from pycovid.memory import low_memory
+from pycovid.smoothing import smooth
 
+INFECTION_TO_DEATH_DAYS = 28
+SMOOTHING_DAYS = 7
 
+
+@low_memory
 def read_ONS_daily_registrations(workbook, skiprows) -> pd.DataFrame:
     """Read raw ONS data for daily deaths where COVID-19 is mentioned on the certificate."""
     cols = "A:P"
-    df = pd.read_excel(
+    df = read_xlsx(
         workbook,
         sheet_name="Covid-19 - Daily registrations",
         usecols=cols,
@@ -45,6 +53,7 @@ class XLMeta:
     end_row: int
 
 
+@memoize(inputs=lambda meta: [DATA_DIR / meta.workbook])
 def prepare_fatal_infection_data(meta: XLMeta) -> pd.DataFrame:
     """
     Construct a timeseries dataframe of fatal infections.
@@ -55,8 +64,6 @@ def prepare_fatal_infection_data(meta: XLMeta) -> pd.DataFrame:
     :return: a dataframe of smoothed fatal infection rate and log fatal infection rate
     """
 
-    INFECTION_TO_DEATH_DAYS = 28
-
     # get the raw death data #####################################################
 
     filename = DATA_DIR / meta.workbook
@@ -67,33 +74,172 @@ def prepare_fatal_infection_data(meta: XLMeta) -> pd.DataFrame:
 
     # compute fatal infection from death #########################################
 
-    # extend dates to allow deaths to be shifted forward by INFECTION_TO_DEATH_DAYS
-    idx = pd.date_range(
-        df.index[0] - pd.Timedelta(days=INFECTION_TO_DEATH_DAYS), df.index[-1]
-    )
-    df = df.reindex(idx)
+    pipeline = FatalInfectionPipeline(meta.region)
+    pipeline.append(df[meta.region])
+    df = pipeline.to_frame()
 
-    # compute fatal infections
-    infections = df[meta.region].shift(periods=-INFECTION_TO_DEATH_DAYS)
+    # smoothing discards a small number of infections: the pipeline scales back up
+    assert abs(df["infections"].sum() / total_deaths) > 0.9999999
 
-    # smooth: this discards a small number of infections, so scale back up
-    infections_smoothed = infections.rolling(window=7, center=True).mean()
-    correction_factor = infections.sum() / infections_smoothed.sum()
-    infections_smoothed *= correction_factor
-    assert abs(infections_smoothed.sum() / total_deaths) > 0.9999999
+    return df
 
-    # log
-    infections_log = np.log10(infections_smoothed)
 
-    # construct dataframe
-    data = {
-        "deaths (raw)": df[meta.region],
-        "infections": infections_smoothed,
-        "infections (log)": infections_log,
-    }
-    df = pd.concat(data, axis=1)
+@dataclass
+class FatalInfectionUpdate:
+    """Class for reporting the rows changed by appending registrations to a FatalInfectionPipeline."""
 
-    return df
+    rows: pd.DataFrame
+    correction_factor: float
+    previous_correction_factor: float
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Bring a dataframe from before the update up to date: rescale it and overwrite the changed rows."""
+        if df.empty:
+            return self.rows.copy()
+        ratio = self.correction_factor / self.previous_correction_factor
+        df = df.reindex(df.index.union(self.rows.index))
+        df["infections"] *= ratio
+        df["infections (log)"] += np.log10(ratio)
+        df.loc[self.rows.index] = self.rows
+
+        return df
+
+
+class FatalInfectionPipeline:
+    """
+    Incrementally maintained fatal infections of one region.
+
+    Fatal infections are registrations shifted back by INFECTION_TO_DEATH_DAYS and smoothed over SMOOTHING_DAYS, then
+    scaled so that no infections are lost to smoothing. The pipeline keeps the raw registrations, the unscaled smoothed
+    infections and both running totals, so appending registrations recomputes only the smoothing windows from the
+    first changed day onwards, plus the scalar correction factor.
+    """
+
+    def __init__(self, region: str, capacity: int = 512):
+        self.region = region
+        self.start = None  # date of the first registration
+        self._deaths = np.full(capacity, np.nan)  # by registration day
+        self._smoothed = np.full(capacity, np.nan)  # unscaled, by infection day
+        self._n = 0
+        self._total_deaths = 0.0
+        self._total_smoothed = 0.0
+
+    @classmethod
+    def from_meta(cls, meta: XLMeta) -> "FatalInfectionPipeline":
+        """Create a pipeline holding the registrations of an ONS spreadsheet."""
+        skiprows = compute_skiprows(meta.start_row, meta.end_row)
+        df = read_ONS_daily_registrations(DATA_DIR / meta.workbook, skiprows=skiprows)
+        pipeline = cls(meta.region)
+        pipeline.append(df[meta.region])
+
+        return pipeline
+
+    @property
+    def correction_factor(self) -> float:
+        """The factor restoring the infections discarded by smoothing."""
+        if self._total_smoothed <= 0:
+            return np.nan
+        return self._total_deaths / self._total_smoothed
+
+    def append(self, deaths: pd.Series) -> FatalInfectionUpdate:
+        """
+        Add daily registrations, either new days or revisions of days already held, and update the fatal infections.
+
+        The cost is proportional to the number of days from the first changed value to the end of the data.
+
+        :param deaths: Daily registrations of the region, indexed by date
+        :return: the rows (in the layout of `to_frame`) whose values changed other than by the correction factor
+        """
+        previous_factor = self.correction_factor
+        deaths = deaths.sort_index()
+        if self.start is None:
+            self.start = pd.Timestamp(deaths.index[0]).normalize()
+        offsets = np.asarray((pd.DatetimeIndex(deaths.index) - self.start).days)
+        if offsets.min(initial=0) < 0:
+            raise AttributeError(
+                f"registrations must start on or after {self.start:%d %b %Y}: got {deaths.index[0]:%d %b %Y}"
+            )
+
+        n = max(self._n, int(offsets.max(initial=-1)) + 1)
+        self._reserve(n)
+
+        # registrations that differ from those held (new days are NaN)
+        values = deaths.to_numpy(dtype=float)
+        previous = self._deaths[offsets]
+        changed = ~((previous == values) | (np.isnan(previous) & np.isnan(values)))
+        first = min(int(offsets[changed].min(initial=n)), self._n)
+
+        self._total_deaths += np.nansum(values[changed]) - np.nansum(previous[changed])
+        self._deaths[offsets] = values
+        self._n = n
+
+        # re-smooth every window that includes a changed day
+        half = SMOOTHING_DAYS // 2
+        lo = max(first - half, 0)
+        segment_lo = max(lo - half, 0)
+        smoothed = smooth(
+            self._deaths[segment_lo:n],
+            window=SMOOTHING_DAYS,
+            edge="nan",
+            preserve_total=False,
+        )[lo - segment_lo :]
+        self._total_smoothed += np.nansum(smoothed) - np.nansum(self._smoothed[lo:n])
+        self._smoothed[lo:n] = smoothed
+
+        return FatalInfectionUpdate(
+            rows=self.to_frame(first_row=lo),
+            correction_factor=self.correction_factor,
+            previous_correction_factor=previous_factor,
+        )
+
+    def _reserve(self, n: int):
+        """Double the capacity until n days fit, amortising the copy over many appends."""
+        capacity = len(self._deaths)
+        if n <= capacity:
+            return
+        while capacity < n:
+            capacity *= 2
+        for name in ["_deaths", "_smoothed"]:
+            values = np.full(capacity, np.nan)
+            values[: self._n] = getattr(self, name)[: self._n]
+            setattr(self, name, values)
+
+    def to_frame(self, first_row: int = 0) -> pd.DataFrame:
+        """
+        Return the fatal infections in the layout of `prepare_fatal_infection_data`.
+
+        :param first_row: Return only rows from this row onwards
+        :return: a dataframe of raw deaths, smoothed fatal infection rate and log fatal infection rate
+        """
+        rows = np.arange(first_row, self._n + INFECTION_TO_DEATH_DAYS)
+
+        deaths = np.full(len(rows), np.nan)
+        registered = rows >= INFECTION_TO_DEATH_DAYS
+        deaths[registered] = self._deaths[rows[registered] - INFECTION_TO_DEATH_DAYS]
+
+        infections = np.full(len(rows), np.nan)
+        infected = rows < self._n
+        infections[infected] = self._smoothed[rows[infected]] * self.correction_factor
+        with np.errstate(divide="ignore", invalid="ignore"):
+            infections_log = np.log10(infections)
+
+        if self.start is None:
+            index = pd.DatetimeIndex([])
+        else:
+            index = pd.date_range(
+                self.start + pd.Timedelta(days=first_row - INFECTION_TO_DEATH_DAYS),
+                periods=len(rows),
+                freq="D",
+            )
+
+        return pd.DataFrame(
+            {
+                "deaths (raw)": deaths,
+                "infections": infections,
+                "infections (log)": infections_log,
+            },
+            index=index,
+        )
 
 
 def compute_skiprows(start, end) -> List[int]:
@@ -1,7 +1,9 @@
 import pandas as pd
 from pycovid import DATA_DIR
+from pycovid.memory import low_memory
 
 
+@low_memory
 def prepare_owid_data(csvfile: str, country: str) -> pd.DataFrame:
     """Extract Our World In Data data and return as a dataframe."""
 
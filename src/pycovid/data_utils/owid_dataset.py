@@ -0,0 +1,209 @@
+"""
+owid_dataset.py
+
+Convert the Our World In Data COVID-19 CSV into a location-partitioned Parquet dataset and read it back.
+
+The converter streams the CSV in chunks (the file is sorted by location), so memory is bounded by one chunk plus one
+location. Label columns are stored as categoricals, dates as timestamps, and float columns as float32 wherever that
+reproduces the CSV values to the precision OWID publishes. A newer CSV rewrites only the partitions whose data changed.
+
+Reads push column selection and location/date predicates down to the Parquet scan.
+"""
+
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pycovid import DATA_DIR
+
+OWID_LABELS = ["iso_code", "continent"]
+OWID_METRICS = [
+    "total_cases",
+    "new_cases",
+    "new_cases_smoothed",
+    "total_deaths",
+    "new_deaths",
+    "new_deaths_smoothed",
+    "new_cases_per_million",
+    "new_cases_smoothed_per_million",
+    "total_deaths_per_million",
+    "new_deaths_per_million",
+    "new_deaths_smoothed_per_million",
+    "reproduction_rate",
+    "icu_patients",
+    "hosp_patients",
+    "new_tests_smoothed_per_thousand",
+    "positive_rate",
+    "total_vaccinations",
+    "people_vaccinated_per_hundred",
+    "people_fully_vaccinated_per_hundred",
+    "stringency_index",
+    "population",
+]
+FLOAT32_TOLERANCE = 5e-4  # OWID publishes at most 3 decimal places
+MANIFEST = "_manifest.json"
+PART = "part-0.parquet"
+
+
+def build_owid_dataset(
+    csvfile: str,
+    dataset: str = "owid",
+    metrics: List[str] = OWID_METRICS,
+    chunksize: int = 100_000,
+) -> List[str]:
+    """
+    Convert an OWID CSV into a Parquet dataset partitioned by location, rewriting only partitions that changed.
+
+    :param csvfile: The OWID CSV, relative to DATA_DIR
+    :param dataset: The dataset directory, relative to DATA_DIR
+    :param metrics: The metric columns to keep (columns missing from older files are skipped)
+    :param chunksize: Rows read from the CSV at a time
+    :return: the locations whose partitions were (re)written
+    """
+    root = DATA_DIR / dataset
+    root.mkdir(parents=True, exist_ok=True)
+    old_manifest = read_manifest(root)
+    manifest = {}
+    written = []
+
+    def flush(location: str, frame: pd.DataFrame):
+        if location in manifest:
+            raise ValueError(f"{csvfile} is not sorted by location: {location} repeats")
+        frame, entry = compact_partition(frame.drop(columns="location"))
+        manifest[location] = entry
+        if old_manifest.get(location, {}).get("hash") != entry["hash"]:
+            path = partition_path(root, location)
+            path.mkdir(exist_ok=True)
+            frame.to_parquet(path / PART, index=False)
+            written.append(location)
+
+    wanted = set(["date", "location"] + OWID_LABELS + metrics)
+    reader = pd.read_csv(
+        DATA_DIR / csvfile,
+        usecols=lambda col: col in wanted,
+        parse_dates=["date"],
+        chunksize=chunksize,
+    )
+
+    pending = None
+    for chunk in reader:
+        if pending is not None:
+            chunk = pd.concat([pending, chunk])
+        last = chunk["location"].iloc[-1]
+        is_last = (chunk["location"] == last).values
+        for location, frame in chunk[~is_last].groupby("location", sort=False):
+            flush(location, frame)
+        pending = chunk[is_last]
+    if pending is not None:
+        flush(pending["location"].iloc[0], pending)
+
+    # drop locations that are no longer published
+    for location in set(old_manifest) - set(manifest):
+        shutil.rmtree(partition_path(root, location), ignore_errors=True)
+
+    (root / MANIFEST).write_text(json.dumps(manifest, indent=1))
+
+    return written
+
+
+def compact_partition(df: pd.DataFrame):
+    """
+    Convert a location's rows to compact dtypes and fingerprint them.
+
+    :return: a tuple (compacted dataframe, manifest entry with content hash, row count and float dtypes)
+    """
+    df = df.sort_values("date").reset_index(drop=True)
+    for col in OWID_LABELS:
+        if col in df:
+            df[col] = df[col].astype("category")
+
+    dtypes = {}
+    for col in df.columns.drop(["date"] + OWID_LABELS, errors="ignore"):
+        values = df[col].to_numpy(dtype=float)
+        as_float32 = values.astype(np.float32)
+        lossless = np.allclose(
+            as_float32, values, rtol=0, atol=FLOAT32_TOLERANCE, equal_nan=True
+        )
+        df[col] = as_float32 if lossless else values
+        dtypes[col] = str(df[col].dtype)
+
+    digest = hashlib.sha256(",".join(df.columns).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+    return df, {"hash": digest.hexdigest(), "rows": len(df), "dtypes": dtypes}
+
+
+def partition_path(root: Path, location: str) -> Path:
+    """Return the hive-style partition directory of a location."""
+    return root / f"location={quote(location, safe=' ')}"
+
+
+def read_manifest(root: Path) -> Dict[str, dict]:
+    """Read the dataset manifest (empty if the dataset has not been built)."""
+    path = root / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def dataset_schema(manifest: Dict[str, dict]) -> pa.Schema:
+    """Unify partition schemas: a float column is float32 only if it is float32 in every partition."""
+    floats = {}
+    for entry in manifest.values():
+        for col, dtype in entry["dtypes"].items():
+            if floats.get(col) != "float64":
+                floats[col] = dtype
+    fields = [pa.field("date", pa.timestamp("ns"))]
+    fields += [pa.field(col, pa.string()) for col in OWID_LABELS]
+    fields += [
+        pa.field(col, pa.float32() if dtype == "float32" else pa.float64())
+        for col, dtype in floats.items()
+    ]
+    fields += [pa.field("location", pa.string())]
+
+    return pa.schema(fields)
+
+
+def read_owid_dataset(
+    dataset: str = "owid",
+    columns: Optional[List[str]] = None,
+    locations: Optional[List[str]] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Read OWID data from a Parquet dataset built by `build_owid_dataset`.
+
+    Only the requested columns are read, and only partitions and row groups that can satisfy the location and date
+    filters are scanned.
+
+    :param dataset: The dataset directory, relative to DATA_DIR
+    :param columns: Metric (or label) columns to read (default: all)
+    :param locations: Locations to read (default: all)
+    :param start: The first date to read
+    :param end: The last date to read
+    :return: a dataframe indexed on ["location", "date"]
+    """
+    root = DATA_DIR / dataset
+    schema = dataset_schema(read_manifest(root))
+    dataset = ds.dataset(root, schema=schema, partitioning="hive", format="parquet")
+
+    if columns is None:
+        columns = [name for name in schema.names if name not in ["location", "date"]]
+    predicate = ds.scalar(True)
+    if locations is not None:
+        predicate &= ds.field("location").isin(locations)
+    if start is not None:
+        predicate &= ds.field("date") >= pd.Timestamp(start)
+    if end is not None:
+        predicate &= ds.field("date") <= pd.Timestamp(end)
+
+    table = dataset.to_table(columns=["location", "date"] + columns, filter=predicate)
+    df = table.to_pandas(strings_to_categorical=True)
+
+    return df.set_index(["location", "date"]).sort_index()
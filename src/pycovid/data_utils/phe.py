@@ -0,0 +1,24 @@
+import pandas as pd
+from pycovid import DATA_DIR
+
+MANUFACTURERS = {
+    1: "Pfizer-BioNTech",
+    2: "AstraZeneca",
+}
+
+
+def read_PHE_odds_ratio(
+    figure: int, dose: int, report: str = "PHE_VACCINE_REPORT_20"
+) -> pd.Series:
+    """Read PHE vaccine surveillance odds ratios for a figure and dose, indexed on days after vaccination."""
+    if figure not in MANUFACTURERS.keys():
+        raise AttributeError(
+            f"figure not in {list(MANUFACTURERS.keys())}: got {figure}"
+        )
+
+    file = DATA_DIR / report / f"Fig_{figure}_Dose_{dose}.csv"
+    df = pd.read_csv(file)
+    df["day"] = df["d1"] + (df["d2"] - df["d1"]) / 2
+    df.set_index(df["day"], inplace=True)
+
+    return df["odds ratio"]
@@ -0,0 +1,510 @@
+"""
+xlsx.py
+
+A value-only reader for Excel workbooks, used by the Excel loaders in place of `pd.read_excel`.
+
+An xlsx workbook is a zip of XML parts. The reader parses the shared strings and the cell formats once per workbook,
+then streams the XML of one sheet with an incremental parser, keeping only the cells of the selected columns and
+discarding each row once read. Values are written into preallocated numpy columns (sized from the sheet's dimension),
+and columns whose cells are all formatted as dates are converted from Excel serial dates in one vectorized step.
+Formulas are not evaluated: the values Excel cached when the workbook was saved are read.
+
+    df = read_xlsx(workbook, "Covid-19 - Daily registrations", usecols="A:P", skiprows=skiprows)
+
+    with Workbook(workbook) as wb:  # several sheets, strings parsed once
+        frames = {name: wb.read(name) for name in wb.sheet_names}
+
+The result matches `pd.read_excel` for the arguments supported (`header`, `usecols`, `skiprows`, `nrows` and
+`index_col`): blank rows within the data are rows of missing values, whole numbers give integer columns (float where
+values are missing), "NA"-like strings are missing, and numeric text is converted to numbers.
+"""
+
+import functools
+import posixpath
+import re
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+
+MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+RELATIONSHIPS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_RELATIONSHIPS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# built-in number formats that display dates or times
+DATE_FORMAT_IDS = (
+    set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59))
+)
+# the strings pandas reads as missing by default
+NA_VALUES = {
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+}
+EPOCHS = {
+    False: np.datetime64("1899-12-30", "us"),
+    True: np.datetime64("1904-01-01", "us"),
+}
+MICROSECONDS_PER_DAY = 86400 * 10**6
+MIN_CAPACITY = 16
+
+# cell kinds
+EMPTY, NUMBER, DATE, OBJECT = 0, 1, 2, 3
+
+Columns = Union[str, Sequence[int], None]
+
+
+@functools.lru_cache(maxsize=None)
+def column_index(letters: str) -> int:
+    """Convert column letters ("A", "AC") to a 0-based column number."""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def cell_column(ref: str) -> int:
+    """The 0-based column number of a cell reference such as "AC12"."""
+    return column_index(ref.rstrip("0123456789"))
+
+
+def parse_usecols(usecols: Columns) -> Optional[List[int]]:
+    """
+    Convert a column selection to 0-based column numbers.
+
+    :param usecols: Excel column letters and inclusive ranges ("A:P", "B,T" or "C:N, T:AC, AI:AR"), a list of column
+        numbers, or None for every column
+    :return: the column numbers, in sheet order, or None
+    """
+    if usecols is None:
+        return None
+    if not isinstance(usecols, str):
+        return sorted(int(col) for col in usecols)
+    columns = set()
+    for part in usecols.split(","):
+        part = part.strip()
+        if not re.fullmatch(r"[A-Za-z]+(:[A-Za-z]+)?", part):
+            raise AttributeError(
+                f"usecols not Excel columns such as 'A:P': got {usecols}"
+            )
+        first, _, last = part.partition(":")
+        columns.update(range(column_index(first), column_index(last or first) + 1))
+    return sorted(columns)
+
+
+def excel_dates(serials: np.ndarray, date1904: bool = False) -> np.ndarray:
+    """
+    Convert Excel serial dates (days since the workbook's epoch, with fractions for times) to datetime64[ns].
+
+    :param serials: The serial dates; NaN gives NaT
+    :param date1904: True if the workbook counts days from 1904
+    :return: the dates, to the microsecond
+    """
+    serials = np.asarray(serials, dtype=float)
+    if not date1904:
+        # Excel counts a 29 Feb 1900 that never was: serials before it are a day early
+        serials = np.where(serials < 60, serials + 1, serials)
+    missing = np.isnan(serials)
+    micros = np.round(np.where(missing, 0, serials) * MICROSECONDS_PER_DAY).astype(
+        np.int64
+    )
+    dates = (EPOCHS[date1904] + micros.astype("timedelta64[us]")).astype(
+        "datetime64[ns]"
+    )
+    dates[missing] = np.datetime64("NaT")
+    return dates
+
+
+def is_date_format(code: str) -> bool:
+    """True if a custom number format displays a date or time."""
+    # ignore literal text, escaped characters and colours or conditions in brackets
+    code = re.sub(r'"[^"]*"|\\.|\[[^\]]*\]', "", code)
+    return re.search(r"[dmyhs]", code, re.IGNORECASE) is not None
+
+
+class Column:
+    """A preallocated column of cell values: numbers in a float array, anything else in an object array."""
+
+    __slots__ = ["kinds", "numbers", "objects"]
+
+    def __init__(self, capacity: int):
+        self.kinds = np.zeros(capacity, dtype=np.int8)
+        self.numbers = np.full(capacity, np.nan)
+        self.objects = None  # allocated on the first text, boolean or error cell
+
+    def grow(self, capacity: int):
+        n = len(self.kinds)
+        self.kinds = np.concatenate([self.kinds, np.zeros(capacity - n, dtype=np.int8)])
+        self.numbers = np.concatenate([self.numbers, np.full(capacity - n, np.nan)])
+        if self.objects is not None:
+            self.objects = np.concatenate(
+                [self.objects, np.full(capacity - n, np.nan, dtype=object)]
+            )
+
+    def set(self, row: int, kind: int, value):
+        self.kinds[row] = kind
+        if kind == OBJECT:
+            if self.objects is None:
+                self.objects = np.full(len(self.kinds), np.nan, dtype=object)
+            self.objects[row] = value
+        else:
+            self.numbers[row] = value
+
+    def values(self, n: int, date1904: bool) -> np.ndarray:
+        """The first n values, as the array pandas would read."""
+        kinds, numbers = self.kinds[:n], self.numbers[:n]
+        dates = kinds == DATE
+        if self.objects is None and not (dates.any() and (kinds == NUMBER).any()):
+            if dates.any():
+                return excel_dates(numbers, date1904)
+            if (kinds == NUMBER).all() and np.array_equal(numbers, np.round(numbers)):
+                return numbers.astype(np.int64)
+            return numbers
+
+        # mixed: whole numbers as int, dates as timestamps, as openpyxl reads them
+        values = (
+            np.full(n, np.nan, dtype=object)
+            if self.objects is None
+            else self.objects[:n].copy()
+        )
+        for i in np.flatnonzero(kinds == NUMBER):
+            number = numbers[i]
+            values[i] = int(number) if number == round(number) else number
+        for i, date in zip(
+            np.flatnonzero(dates), excel_dates(numbers[dates], date1904)
+        ):
+            values[i] = pd.Timestamp(date)
+        if pd.api.types.infer_dtype(values, skipna=True) in ["string", "mixed-integer"]:
+            try:
+                return pd.to_numeric(values)  # numbers stored as text
+            except (ValueError, TypeError):
+                pass
+        return values
+
+
+def column_names(header: Dict[int, object], columns: List[int]) -> List:
+    """
+    Name the columns from the header cells as pandas does: "Unnamed: i" if blank (i being the sheet column number),
+    "name.1" if repeated.
+    """
+    names, seen = [], {}
+    for i, col in enumerate(columns):
+        name = header.get(i)
+        if name is None:
+            name = f"Unnamed: {col}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+class Workbook:
+    """
+    An xlsx workbook opened for reading values.
+
+    The shared strings and cell formats are parsed on the first read and kept for the reads of other sheets.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._zip = zipfile.ZipFile(self.path)
+        self._strings = None
+        self._date_styles = None
+
+        workbook = ElementTree.fromstring(self._zip.read("xl/workbook.xml"))
+        properties = workbook.find(f"{MAIN}workbookPr")
+        self.date1904 = properties is not None and properties.get("date1904") in [
+            "1",
+            "true",
+        ]
+
+        rels = ElementTree.fromstring(self._zip.read("xl/_rels/workbook.xml.rels"))
+        targets = {
+            rel.get("Id"): rel.get("Target")
+            for rel in rels.iter(f"{PACKAGE_RELATIONSHIPS}Relationship")
+        }
+        self._sheets = {}
+        for sheet in workbook.iter(f"{MAIN}sheet"):
+            target = targets[sheet.get(f"{RELATIONSHIPS}id")]
+            if target.startswith("/"):
+                self._sheets[sheet.get("name")] = target[1:]
+            else:
+                self._sheets[sheet.get("name")] = posixpath.normpath(
+                    posixpath.join("xl", target)
+                )
+
+    def __enter__(self) -> "Workbook":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return list(self._sheets)
+
+    @property
+    def strings(self) -> List[str]:
+        """The shared strings table."""
+        if self._strings is None:
+            self._strings = []
+            if "xl/sharedStrings.xml" in self._zip.namelist():
+                with self._zip.open("xl/sharedStrings.xml") as f:
+                    for _, elem in ElementTree.iterparse(f):
+                        if elem.tag == f"{MAIN}si":
+                            # plain text, or runs of rich text; phonetic guides are not part of the value
+                            texts = [elem.find(f"{MAIN}t")] + [
+                                run.find(f"{MAIN}t") for run in elem.iter(f"{MAIN}r")
+                            ]
+                            self._strings.append(
+                                "".join(t.text or "" for t in texts if t is not None)
+                            )
+                            elem.clear()
+        return self._strings
+
+    @property
+    def date_styles(self) -> Set[str]:
+        """The indices (as they appear in cell "s" attributes) of the cell formats displaying dates."""
+        if self._date_styles is None:
+            self._date_styles = set()
+            if "xl/styles.xml" in self._zip.namelist():
+                styles = ElementTree.fromstring(self._zip.read("xl/styles.xml"))
+                custom = {
+                    int(fmt.get("numFmtId")): is_date_format(fmt.get("formatCode", ""))
+                    for fmt in styles.iter(f"{MAIN}numFmt")
+                }
+                cell_formats = styles.find(f"{MAIN}cellXfs")
+                for i, xf in enumerate(
+                    [] if cell_formats is None else cell_formats.iter(f"{MAIN}xf")
+                ):
+                    fmt = int(xf.get("numFmtId", 0))
+                    if custom.get(fmt, fmt in DATE_FORMAT_IDS):
+                        self._date_styles.add(str(i))
+        return self._date_styles
+
+    def read(
+        self,
+        sheet_name: str,
+        header: Optional[int] = 0,
+        usecols: Columns = None,
+        skiprows: Union[int, Sequence[int], None] = None,
+        nrows: Optional[int] = None,
+        index_col: Union[int, List[int], None] = None,
+    ) -> pd.DataFrame:
+        """
+        Read the values of one sheet.
+
+        :param sheet_name: The sheet
+        :param header: The row (counted after skipped and blank rows) holding the column names, or None for none
+        :param usecols: The columns to read: see `parse_usecols`
+        :param skiprows: The 0-based sheet rows to skip, or the number of rows to skip from the top
+        :param nrows: The most data rows to read (the rest of the sheet is not parsed)
+        :param index_col: The column (or columns), counted within usecols, to use as the index
+        :return: a dataframe of the values
+        """
+        if sheet_name not in self._sheets:
+            raise AttributeError(
+                f"sheet_name not in {self.sheet_names}: got {sheet_name}"
+            )
+        selected = parse_usecols(usecols)
+        skip = (
+            set(range(skiprows)) if isinstance(skiprows, int) else set(skiprows or [])
+        )
+
+        header_cells, columns, n, width = self._read_cells(
+            self._sheets[sheet_name], selected, skip, header, nrows
+        )
+
+        sheet_columns = list(range(width)) if selected is None else selected
+        names = (
+            column_names(header_cells, sheet_columns)
+            if header is not None
+            else sheet_columns
+        )
+        arrays = {
+            i: (
+                columns[i].values(n, self.date1904)
+                if i in columns
+                else np.full(n, np.nan)
+            )
+            for i in range(len(sheet_columns))
+        }
+        df = pd.DataFrame(arrays, index=pd.RangeIndex(n)).set_axis(
+            pd.Index(names), axis=1
+        )
+
+        if index_col is not None:
+            keys = [
+                names[i]
+                for i in ([index_col] if isinstance(index_col, int) else index_col)
+            ]
+            df = df.set_index(keys)
+            df.columns = pd.Index(list(df.columns))  # infer the dtype of the names left
+            df.index.names = [
+                None if str(key).startswith("Unnamed: ") else key for key in keys
+            ]
+
+        return df
+
+    def _read_cells(
+        self,
+        path: str,
+        selected: Optional[List[int]],
+        skip: Set[int],
+        header: Optional[int],
+        nrows: Optional[int],
+    ) -> Tuple[Dict[int, object], Dict[int, Column], int, int]:
+        """
+        Stream a sheet into columns.
+
+        Rows are counted as pandas counts them: every sheet row not skipped, blank or not, up to the last row holding
+        a value.
+
+        :return: the header cells and the columns (by position in selected), the number of data rows and the width
+            of the sheet (one past the last column holding a value)
+        """
+        positions = (
+            None if selected is None else {col: i for i, col in enumerate(selected)}
+        )
+        strings, date_styles = self.strings, self.date_styles
+        first_data = 0 if header is None else header + 1
+        header_cells, columns = {}, {}
+        capacity, n, width, kept, row_number = MIN_CAPACITY, 0, 0, 0, -1
+
+        with self._zip.open(path) as f:
+            for _, elem in ElementTree.iterparse(f):
+                if elem.tag == f"{MAIN}dimension":
+                    last = re.search(r"(\d+)$", elem.get("ref", ""))
+                    capacity = max(int(last.group(1)) if last else 0, MIN_CAPACITY)
+                    continue
+                if elem.tag != f"{MAIN}row":
+                    continue
+                previous = row_number
+                row = elem.get("r")
+                row_number = int(row) - 1 if row else row_number + 1
+                # rows missing from the sheet are blank rows
+                kept += sum(1 for i in range(previous + 1, row_number) if i not in skip)
+                index = kept - first_data
+                if nrows is not None and index >= nrows:
+                    break
+
+                cells, blank, col = [], True, -1
+                for cell in elem.iter(f"{MAIN}c"):
+                    ref = cell.get("r")
+                    col = cell_column(ref) if ref else col + 1
+                    kind, value = self._cell_value(cell, strings, date_styles)
+                    if kind == EMPTY:
+                        continue
+                    blank = False
+                    width = max(width, col + 1)
+                    position = col if positions is None else positions.get(col)
+                    if position is not None:
+                        cells.append((position, kind, value))
+                elem.clear()
+
+                if row_number in skip:
+                    # blank rows are trimmed from the end of the sheet before rows are skipped
+                    if not blank:
+                        n = max(n, index)
+                    continue
+                kept += 1
+                if index == -1 and header is not None:
+                    header_cells = {
+                        position: self._header_name(kind, value)
+                        for position, kind, value in cells
+                    }
+                if index < 0 or blank:
+                    continue
+
+                while index >= capacity:
+                    capacity *= 2
+                    for column in columns.values():
+                        column.grow(capacity)
+                for position, kind, value in cells:
+                    if kind == OBJECT and isinstance(value, str) and value in NA_VALUES:
+                        continue
+                    if position not in columns:
+                        columns[position] = Column(capacity)
+                    columns[position].set(index, kind, value)
+                n = index + 1
+
+        for column in columns.values():
+            if len(column.kinds) < n:
+                column.grow(n)
+
+        return header_cells, columns, n, width
+
+    @staticmethod
+    def _cell_value(
+        cell: ElementTree.Element, strings: List[str], date_styles: Set[str]
+    ) -> Tuple[int, object]:
+        cell_type = cell.get("t")
+        if cell_type == "inlineStr":
+            text = cell.find(f"{MAIN}is")
+            return (EMPTY, None) if text is None else (OBJECT, "".join(text.itertext()))
+        value = cell.find(f"{MAIN}v")
+        if value is None or value.text is None:
+            return EMPTY, None
+        if cell_type is None or cell_type == "n":
+            return (DATE if cell.get("s") in date_styles else NUMBER), float(value.text)
+        if cell_type == "s":
+            text = strings[int(value.text)]
+            return (OBJECT, text) if text else (EMPTY, None)
+        if cell_type == "b":
+            return OBJECT, value.text == "1"
+        if cell_type == "d":
+            return OBJECT, pd.Timestamp(value.text)
+        return OBJECT, value.text  # formula text ("str") and errors ("e")
+
+    def _header_name(self, kind: int, value):
+        if kind == DATE:
+            return pd.Timestamp(excel_dates(np.array([value]), self.date1904)[0])
+        if kind == NUMBER and value == round(value):
+            return int(value)
+        return value
+
+
+def read_xlsx(
+    path: Union[str, Path],
+    sheet_name: str,
+    header: Optional[int] = 0,
+    usecols: Columns = None,
+    skiprows: Union[int, Sequence[int], None] = None,
+    nrows: Optional[int] = None,
+    index_col: Union[int, List[int], None] = None,
+) -> pd.DataFrame:
+    """Read the values of one sheet of an xlsx workbook: see `Workbook.read`."""
+    with Workbook(path) as wb:
+        return wb.read(
+            sheet_name,
+            header=header,
+            usecols=usecols,
+            skiprows=skiprows,
+            nrows=nrows,
+            index_col=index_col,
+        )
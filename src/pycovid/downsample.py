@@ -0,0 +1,174 @@
+"""
+downsample.py
+
+Reduce long daily series to a few hundred points per series before charting or exporting, without visible change.
+
+Two methods, both vectorised over every column at once:
+
+- "lttb": Largest-Triangle-Three-Buckets. Each bucket keeps the point forming the largest triangle with the point kept
+  from the previous bucket and the average of the next bucket, which preserves the shape of the line.
+- "minmax": the minimum and maximum of each bucket, which preserves the envelope of noisy series exactly.
+
+Each column keeps its own points; the rows kept by any column are returned, so every column is drawn from its own
+selection. The first and last rows, each column's peak, the edges of missing data (so lines keep their gaps) and any
+requested dates (e.g. event dates) are always kept.
+"""
+
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from pycovid.panel import Panel
+
+METHODS = ["lttb", "minmax"]
+
+
+def _positions(index: pd.Index) -> np.ndarray:
+    """The x coordinate of each row: days for a DatetimeIndex, else the index values."""
+    if isinstance(index, pd.DatetimeIndex):
+        return (index.asi8 - index.asi8[0]) / pd.Timedelta(days=1).value
+    return index.to_numpy(dtype=float)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, target: int) -> np.ndarray:
+    """
+    Select `target` rows of each column by Largest-Triangle-Three-Buckets.
+
+    :param x: The x coordinate of each row, increasing
+    :param y: A (row x column) array; NaN points are never preferred
+    :param target: Points kept per column (at least 3)
+    :return: an array of row indices of shape (target, column)
+    """
+    # infinite values (e.g. log10 of 0) count as missing
+    y = np.where(np.isfinite(y), y, np.nan)
+    n, n_cols = y.shape
+    cols = np.arange(n_cols)
+    every = (n - 2) / (target - 2)
+    selected = np.empty((target, n_cols), dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = np.zeros(n_cols, dtype=int)
+    for i in range(target - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        # the average of the next bucket (the last point for the final bucket)
+        next_y = y[end:next_end]
+        valid = ~np.isnan(next_y)
+        count = valid.sum(axis=0)
+        with np.errstate(invalid="ignore"):
+            avg_y = np.where(valid, next_y, 0.0).sum(axis=0) / count
+        avg_x = x[end:next_end].mean()
+
+        ax, ay = x[a], y[a, cols]
+        bx, by = x[start:end, None], y[start:end]
+        area = np.abs((ax - avg_x) * (by - ay) - (ax - bx) * (avg_y - ay))
+        area[np.isnan(area)] = -1.0
+
+        a = start + np.argmax(area, axis=0)
+        selected[i + 1] = a
+
+    return selected
+
+
+def minmax_indices(y: np.ndarray, target: int) -> np.ndarray:
+    """
+    Select the minimum and maximum row of each column in target / 2 equal buckets.
+
+    :return: an array of row indices of shape (2 x bucket, column)
+    """
+    n, n_cols = y.shape
+    size = -(-n // max(target // 2, 1))
+    buckets = -(-n // size)
+    padded = np.full((buckets * size, n_cols), np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size, n_cols)
+
+    offsets = np.arange(buckets)[:, None] * size
+    finite = np.isfinite(padded)
+    low = np.argmin(np.where(finite, padded, np.inf), axis=1) + offsets
+    high = np.argmax(np.where(finite, padded, -np.inf), axis=1) + offsets
+
+    return np.minimum(np.concatenate([low, high]), n - 1)
+
+
+def downsample(
+    df: Union[pd.DataFrame, pd.Series, Panel],
+    target_points: int,
+    method: str = "lttb",
+    keep: List = [],
+) -> Union[pd.DataFrame, pd.Series]:
+    """
+    Downsample every column of df for charting or export.
+
+    :param df: Data, one series per column, sorted by index
+    :param target_points: Points kept per column (the result may have more rows: the rows kept by all columns)
+    :param method: One of METHODS
+    :param keep: Index values (e.g. event dates) always kept
+    :return: the kept rows of df, unchanged (a dataframe for a panel)
+    """
+    if method not in METHODS:
+        raise AttributeError(f"method not in {METHODS}: got {method}")
+    if target_points < 3:
+        raise AttributeError(f"target_points must be at least 3: got {target_points}")
+
+    if isinstance(df, Panel):
+        df = df.to_frame()
+    frame = df.to_frame() if isinstance(df, pd.Series) else df
+    n = len(frame)
+    if n <= target_points:
+        return df.copy()
+
+    y = frame.to_numpy(dtype=float)
+    if method == "lttb":
+        selected = lttb_indices(_positions(frame.index), y, target_points)
+    else:
+        selected = minmax_indices(y, target_points)
+
+    mask = np.zeros(n, dtype=bool)
+    mask[selected.ravel()] = True
+    mask[[0, -1]] = True
+
+    # peaks (infinite values, e.g. log10 of 0, count as missing)
+    valid = np.isfinite(y)
+    has_data = valid.any(axis=0)
+    peaks = np.argmax(np.where(valid, y, -np.inf), axis=0)
+    mask[peaks[has_data]] = True
+
+    # the rows either side of every change between data and missing data
+    edges = np.flatnonzero((valid[1:] != valid[:-1]).any(axis=1))
+    mask[edges] = True
+    mask[edges + 1] = True
+
+    if len(keep) > 0:
+        if isinstance(frame.index, pd.DatetimeIndex):
+            keep = pd.to_datetime(keep)
+        rows = frame.index.get_indexer(keep)
+        mask[rows[rows >= 0]] = True
+
+    return df[mask]
+
+
+def export_csv(
+    df: Union[pd.DataFrame, Panel],
+    path: Union[str, Path],
+    target_points: Optional[int] = None,
+    method: str = "lttb",
+    keep: List = [],
+):
+    """
+    Write df to a CSV file (e.g. for Datawrapper), downsampled to target_points per column if given.
+
+    :param path: The CSV file to write
+    :param target_points: Points kept per column (default: every row)
+    :param method: One of METHODS
+    :param keep: Index values (e.g. event dates) always kept
+    """
+    if target_points is not None:
+        df = downsample(df, target_points, method, keep)
+    elif isinstance(df, Panel):
+        df = df.to_frame()
+    df.to_csv(path)
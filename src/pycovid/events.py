@@ -0,0 +1,18 @@
+"""
+events.py
+
+Dated events (e.g. Non Pharmaceutical Interventions), shared by the models, data loaders and charts without importing
+a plotting library.
+
+    events = [EventItem("2020-03-26", "Lockdown #1"), EventItem("2020-05-10", "Restrictions relaxed")]
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass
+class EventItem:
+    """Class for holding Non Pharmaceutical Event information."""
+
+    date: str
+    label: str
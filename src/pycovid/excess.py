@@ -0,0 +1,188 @@
+"""
+excess.py
+
+Excess mortality from the Continuous Mortality Investigation (CMI) standardised mortality rates (SMR).
+
+Works on the full `read_CMI_SMR` dataframe (index ["Gender", "AgeBand", "Year"], one column per ISO week) and computes
+baselines, weekly excess and cumulative SMR for every gender, age band and year at once as array operations over a
+(gender x age band x year x week) array.
+
+Cumulative SMR reproduces the CMI "CumulativeSMR" sheet: each day of an ISO week contributes the week's (annualised)
+SMR / DAYS_PER_YEAR, so the cumulative SMR on the last day of a year approximates the annual SMR.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+BASELINES = ["mean", "year", "trend"]
+DAYS_PER_YEAR = 365.25
+WEEKS = 53
+
+
+@dataclass
+class Baseline:
+    """
+    Class for describing an expected mortality baseline.
+
+    method: "mean" of `years` years, a single "year", or a linear "trend" over `years` years extrapolated to each year
+    end: the last year of a fixed baseline period (e.g. 2019). If None, each year is compared with the `years` years
+        immediately before it.
+    """
+
+    method: str = "mean"
+    years: int = 10
+    end: Optional[int] = None
+
+    def __post_init__(self):
+        if self.method not in BASELINES:
+            raise AttributeError(f"method not in {BASELINES}: got {self.method}")
+        if self.method == "year":
+            self.years = 1
+
+
+def to_array(df: pd.DataFrame):
+    """
+    Reshape a CMI SMR dataframe into a dense (gender x age band x year x week) array.
+
+    :return: a tuple (array, index) where index is the complete ["Gender", "AgeBand", "Year"] index of the array rows
+    """
+    genders, age_bands, years = (
+        df.index.unique(level).sort_values() for level in range(3)
+    )
+    years = pd.RangeIndex(years.min(), years.max() + 1)
+    index = pd.MultiIndex.from_product(
+        [genders, age_bands, years], names=df.index.names
+    )
+    weeks = pd.RangeIndex(1, WEEKS + 1)
+
+    values = df.reindex(index=index, columns=weeks).to_numpy(dtype=float)
+    values = values.reshape(len(genders), len(age_bands), len(years), WEEKS)
+
+    return values, index
+
+
+def from_array(values: np.ndarray, index: pd.MultiIndex, columns: pd.Index):
+    """Reshape a (gender x age band x year x period) array back into a dataframe."""
+    return pd.DataFrame(values.reshape(len(index), -1), index=index, columns=columns)
+
+
+def baseline_smr(df: pd.DataFrame, baseline: Baseline = Baseline()) -> pd.DataFrame:
+    """
+    Compute the expected weekly SMR of every gender, age band and year.
+
+    A baseline is only computed where every year of its period has data for the week, except that week 53 falls back
+    to the week 52 baseline.
+
+    :param df: Weekly SMR from `read_CMI_SMR`
+    :param baseline: The baseline to compute
+    :return: a dataframe shaped like df (with any missing years filled in)
+    """
+    values, index = to_array(df)
+    years = index.get_level_values(2).unique().to_numpy()
+    n = baseline.years
+
+    # window sums of 1, x, x^2, y, xy over years, where x is the year relative to the first year
+    valid = ~np.isnan(values)
+    x = np.broadcast_to((years - years[0])[:, None].astype(float), values.shape)
+    terms = [
+        valid,
+        x * valid,
+        x * x * valid,
+        np.where(valid, values, 0),
+        x * np.where(valid, values, 0),
+    ]
+    sums = []
+    for term in terms:
+        cumulative = np.concatenate(
+            [np.zeros(values.shape[:2] + (1, WEEKS)), np.cumsum(term, axis=2)], axis=2
+        )
+        if baseline.end is None:
+            # the n years before each year: rows [i - n, i)
+            i = np.arange(len(years))
+            lo, hi = np.clip(i - n, 0, None), i
+        else:
+            i_end = int(baseline.end - years[0])
+            lo = np.full(len(years), max(i_end - n + 1, 0))
+            hi = np.full(len(years), i_end + 1)
+        sums.append(np.take(cumulative, hi, axis=2) - np.take(cumulative, lo, axis=2))
+    s0, sx, sxx, sy, sxy = sums
+
+    complete = s0 == n
+    if baseline.end is not None:
+        complete &= (baseline.end - n + 1 >= years[0]) & (baseline.end <= years[-1])
+    else:
+        complete &= (np.arange(len(years)) >= n)[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if baseline.method == "trend":
+            slope = (s0 * sxy - sx * sy) / (s0 * sxx - sx * sx)
+            intercept = (sy - slope * sx) / s0
+            expected = intercept + slope * x
+        else:
+            expected = sy / s0
+
+    expected = np.where(complete, expected, np.nan)
+
+    # few baseline periods have a 53 week year in every year: use week 52
+    expected[..., 52] = np.where(
+        np.isnan(expected[..., 52]), expected[..., 51], expected[..., 52]
+    )
+
+    return from_array(
+        expected, index, pd.RangeIndex(1, WEEKS + 1, name=df.columns.name)
+    )
+
+
+def excess_smr(
+    df: pd.DataFrame, baseline: Baseline = Baseline(), relative: bool = False
+) -> pd.DataFrame:
+    """
+    Compute the weekly excess SMR of every gender, age band and year.
+
+    :param df: Weekly SMR from `read_CMI_SMR`
+    :param baseline: The expected mortality baseline
+    :param relative: Return excess as a proportion of the baseline rather than an SMR difference
+    :return: a dataframe shaped like `baseline_smr`
+    """
+    expected = baseline_smr(df, baseline)
+    actual = df.reindex(index=expected.index, columns=expected.columns)
+    excess = actual - expected
+
+    return excess / expected if relative else excess
+
+
+def cumulative_smr(
+    df: pd.DataFrame, baseline: Optional[Baseline] = None
+) -> pd.DataFrame:
+    """
+    Compute the cumulative SMR by ISO day number, reproducing the CMI "CumulativeSMR" sheet.
+
+    :param df: Weekly SMR from `read_CMI_SMR`
+    :param baseline: If given, compute the cumulative excess SMR relative to this baseline as a proportion of the
+        baseline's full year SMR (the CMI "CumulativeSMRRelative" sheet uses a 2019 baseline)
+    :return: a dataframe, index ["Gender", "AgeBand", "Year"], one column per ISO day. Select a gender and age band
+        with `.loc[(gender, age_range)].T` for the layout returned by `read_CMI_cumulative_SMR`.
+    """
+    values, index = to_array(df)
+    days = pd.RangeIndex(1, WEEKS * 7 + 1, name="ISODay")
+
+    cumulative = np.cumsum(np.repeat(values / DAYS_PER_YEAR, 7, axis=-1), axis=-1)
+
+    if baseline is not None:
+        expected, _ = to_array(baseline_smr(df, baseline))
+        # a 52 week year has no week 53 to compare with
+        years = index.get_level_values(2).unique()
+        weeks_in_year = np.array([pd.Timestamp(y, 12, 28).week for y in years])
+        expected[..., weeks_in_year == 52, 52] = np.nan
+        cumulative_expected = np.nancumsum(
+            np.repeat(expected / DAYS_PER_YEAR, 7, axis=-1), axis=-1
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            year_total = np.nansum(expected, axis=-1, keepdims=True) * 7 / DAYS_PER_YEAR
+            year_total = np.where(year_total > 0, year_total, np.nan)
+            cumulative = (cumulative - cumulative_expected) / year_total
+
+    return from_array(cumulative, index, days)
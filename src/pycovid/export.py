@@ -0,0 +1,230 @@
+"""
+export.py
+
+Publish derived datasets (the data behind every figure) as CSV, Parquet or Arrow IPC files in one pass.
+
+Each dataset is hashed and then written in chunks of CHUNK_ROWS rows, so the serialised copy held in memory is
+bounded by the chunk size rather than the dataset size. Datasets are exported concurrently, each to a temporary file
+renamed into place when complete. The export directory holds a manifest (MANIFEST) recording the dataset, format, row
+count and content hash of every file; a dataset whose content hash matches the manifest entry of its file, and whose
+file is still in place, is skipped.
+
+    export_all(
+        [
+            ExportItem("fatal-infections", infections),
+            ExportItem("policy-events", lambda: catalog.get("oxcgrt-policy-events")),
+        ],
+        OUTPUT_DIR / "data",
+        fmt="parquet",
+    )
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pycovid.panel import Panel
+from pycovid.prefetch import create_executor
+
+FORMATS = ["csv", "parquet", "arrow"]
+SUFFIXES = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+CHUNK_ROWS = 65536
+MANIFEST = "manifest.json"
+
+Exportable = Union[pd.DataFrame, pd.Series, Panel]
+
+
+@dataclass
+class ExportItem:
+    """Class for naming a dataset to export: a frame, or a function returning one (called when it is exported)."""
+
+    name: str
+    data: Union[Exportable, Callable[[], Exportable]]
+
+
+@dataclass
+class ExportResult:
+    """Class for reporting the export of a dataset."""
+
+    name: str
+    file: str
+    format: str
+    rows: int
+    sha256: str
+    skipped: bool
+
+
+def as_frame(data: Exportable) -> pd.DataFrame:
+    if callable(data) and not isinstance(data, (pd.DataFrame, pd.Series, Panel)):
+        data = data()
+    if isinstance(data, Panel):
+        return data.to_frame()
+    if isinstance(data, pd.Series):
+        return data.to_frame()
+    return data
+
+
+def chunks(df: pd.DataFrame, chunk_rows: int):
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start : start + chunk_rows]
+
+
+def content_hash(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> str:
+    """Hash the columns, dtypes, index and values of a dataframe, a chunk at a time."""
+    digest = hashlib.sha256()
+    digest.update(repr(list(df.columns)).encode())
+    digest.update(repr([str(dtype) for dtype in df.dtypes]).encode())
+    digest.update(repr(list(df.index.names)).encode())
+    for chunk in chunks(df, chunk_rows):
+        digest.update(pd.util.hash_pandas_object(chunk, index=True).to_numpy())
+    return digest.hexdigest()
+
+
+def write_csv(df: pd.DataFrame, f, chunk_rows: int):
+    for i, chunk in enumerate(chunks(df, chunk_rows)):
+        f.write(chunk.to_csv(header=i == 0).encode())
+
+
+def write_parquet(df: pd.DataFrame, f, chunk_rows: int):
+    """Write each chunk as a row group."""
+    schema = pa.Schema.from_pandas(df.iloc[:chunk_rows], preserve_index=True)
+    with pq.ParquetWriter(f, schema) as writer:
+        for chunk in chunks(df, chunk_rows):
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=True)
+            writer.write_table(table)
+
+
+def write_arrow(df: pd.DataFrame, f, chunk_rows: int):
+    """Write each chunk as a record batch of an Arrow IPC file."""
+    schema = pa.Schema.from_pandas(df.iloc[:chunk_rows], preserve_index=True)
+    with pa.ipc.new_file(f, schema) as writer:
+        for chunk in chunks(df, chunk_rows):
+            batch = pa.RecordBatch.from_pandas(
+                chunk, schema=schema, preserve_index=True
+            )
+            writer.write_batch(batch)
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet, "arrow": write_arrow}
+
+
+def read_manifest(directory: Path) -> Dict[str, dict]:
+    try:
+        return json.loads((Path(directory) / MANIFEST).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def export(
+    item: ExportItem,
+    directory: Path,
+    fmt: str = "csv",
+    previous: Optional[dict] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> ExportResult:
+    """
+    Export one dataset, unless it is unchanged since the previous export.
+
+    :param item: The dataset
+    :param directory: The export directory
+    :param fmt: One of FORMATS
+    :param previous: The manifest entry of the dataset's file from the previous export, if any
+    :param chunk_rows: Rows serialised at a time
+    :return: the manifest entry of the dataset
+    """
+    if fmt not in FORMATS:
+        raise AttributeError(f"fmt not in {FORMATS}: got {fmt}")
+    df = as_frame(item.data)
+    sha256 = content_hash(df, chunk_rows)
+    path = Path(directory) / f"{item.name}{SUFFIXES[fmt]}"
+
+    result = ExportResult(item.name, path.name, fmt, len(df), sha256, skipped=False)
+    if (
+        previous is not None
+        and previous.get("sha256") == sha256
+        and previous.get("format") == fmt
+        and path.exists()
+    ):
+        result.skipped = True
+        return result
+
+    # write then rename, so a failed or concurrent export never leaves a partial file
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            WRITERS[fmt](df, f, chunk_rows)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+    return result
+
+
+def export_all(
+    items: List[ExportItem],
+    directory: Union[str, Path],
+    fmt: str = "csv",
+    chunk_rows: int = CHUNK_ROWS,
+    max_workers: Optional[int] = None,
+) -> List[ExportResult]:
+    """
+    Export datasets concurrently and update the manifest.
+
+    Every dataset is attempted; the manifest records those exported (or skipped) and the first error, if any, is
+    raised afterwards.
+
+    :param items: The datasets, with distinct names
+    :param directory: The export directory (created if needed)
+    :param fmt: One of FORMATS
+    :param chunk_rows: Rows serialised at a time
+    :param max_workers: Datasets exported at once (default: all)
+    :return: the manifest entry of each exported dataset
+    """
+    if fmt not in FORMATS:
+        raise AttributeError(f"fmt not in {FORMATS}: got {fmt}")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(directory)
+
+    # hashing and serialisation mostly release the GIL: threads avoid copying the frames to other processes
+    with create_executor(max_workers or len(items), processes=False) as executor:
+        futures = [
+            executor.submit(
+                export,
+                item,
+                directory,
+                fmt,
+                manifest.get(f"{item.name}{SUFFIXES[fmt]}"),
+                chunk_rows,
+            )
+            for item in items
+        ]
+
+    results, errors = [], []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as error:
+            errors.append(error)
+
+    for result in results:
+        manifest[result.file] = {
+            key: value for key, value in asdict(result).items() if key != "skipped"
+        }
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, directory / MANIFEST)
+
+    if errors:
+        raise errors[0]
+
+    return results
@@ -0,0 +1,456 @@
+"""
+expr.py
+
+Lazy expressions over daily series: derived columns are described as a graph and computed only when collected.
+
+    deaths = ons("England")
+    infections = deaths.smooth(7, edge="nan").shift(-28)
+    df = collect({"infections": infections, "infections (log)": infections.log10()})  # a Panel
+
+    df = collect(fatal_infections(ons("England", version="2021-w28")))  # as prepare_fatal_infection_data
+
+Building an expression computes nothing. `collect` evaluates only the nodes the requested outputs depend on, so a
+column that is described but not requested costs nothing. Before evaluating, the graph is planned:
+
+- common subexpressions are merged: nodes are keyed by their operation, arguments and inputs, so the same
+  expression built twice (e.g. by two figures) is one node
+- chains of element-wise steps (`log10`, arithmetic with numbers, `clip`) are fused: the chain copies its input once
+  and applies every step in place, rather than materialising a series per step
+- shifts and date slices move the start date of a series without copying its values
+
+Every value computed (other than the inside of a fused chain) is kept in a Context, by node key. Collects share the
+default context, so a subexpression computed for one figure is reused by every later figure of the run. The context
+keeps at most DEFAULT_CONTEXT_SIZE bytes, least recently used first out; call `context.clear()` to release the values.
+Catalog sources are keyed on the registration they read and the memory mode, so a re-registered source or a new
+memory mode is read afresh.
+"""
+
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from pycovid.data_utils.ons import INFECTION_TO_DEATH_DAYS, SMOOTHING_DAYS
+from pycovid.memory import get_memory_mode
+from pycovid.panel import Panel
+from pycovid.smoothing import smooth
+
+Number = Union[int, float]
+DEFAULT_CONTEXT_SIZE = 256 * 1024**2  # bytes of evaluated values kept
+
+# element-wise operations: (values, argument, out) -> out
+ELEMENTWISE: Dict[str, Callable] = {
+    "log10": lambda x, _, out: np.log10(x, out=out),
+    "pow10": lambda x, _, out: np.power(10.0, x, out=out),
+    "add": lambda x, k, out: np.add(x, k, out=out),
+    "sub": lambda x, k, out: np.subtract(x, k, out=out),
+    "rsub": lambda x, k, out: np.subtract(k, x, out=out),
+    "mul": lambda x, k, out: np.multiply(x, k, out=out),
+    "div": lambda x, k, out: np.divide(x, k, out=out),
+    "rdiv": lambda x, k, out: np.divide(k, x, out=out),
+    "clip": lambda x, k, out: np.clip(x, *k, out=out),
+}
+BINARY = {"add": np.add, "sub": np.subtract, "mul": np.multiply, "div": np.divide}
+
+
+def node_key(signature: tuple) -> bytes:
+    """A fixed-size digest of a node signature, so that keys of deep graphs hash in constant time."""
+    return hashlib.blake2b(repr(signature).encode(), digest_size=16).digest()
+
+
+@dataclass
+class Daily:
+    """Class for holding the values of a daily series from a start date."""
+
+    start: pd.Timestamp
+    values: np.ndarray
+
+    @property
+    def end(self) -> pd.Timestamp:
+        return self.start + pd.Timedelta(days=len(self.values) - 1)
+
+    def to_series(self, name: Optional[str] = None) -> pd.Series:
+        index = pd.date_range(self.start, periods=len(self.values), freq="D")
+        return pd.Series(self.values, index=index, name=name)
+
+
+def from_pandas(series: pd.Series) -> Daily:
+    series = series.sort_index().asfreq("D")
+    values = series.to_numpy(dtype=float)
+    values.flags.writeable = False
+    return Daily(pd.Timestamp(series.index[0]), values)
+
+
+class Expr:
+    """A daily series described by an expression graph node: an operation, its arguments and its input nodes."""
+
+    __slots__ = ["op", "args", "inputs", "key", "data"]
+
+    def __init__(self, op: str, args: tuple = (), inputs: tuple = (), data=None):
+        self.op = op
+        self.args = args
+        self.inputs = tuple(inputs)
+        self.key = node_key((op, args, tuple(node.key for node in self.inputs)))
+        # the series of a "series" node (its key is a hash of the values)
+        self.data = data
+
+    def __repr__(self) -> str:
+        args = ", ".join(repr(arg) for arg in self.args)
+        if not self.inputs:
+            return f"{self.op}({args})"
+        return f"{self.inputs[0]!r}.{self.op}({args})"
+
+    # element-wise steps (fused) ###################################################
+
+    def _map(self, name: str, argument=None) -> "Expr":
+        return Expr("map", (name, argument), (self,))
+
+    def log10(self) -> "Expr":
+        return self._map("log10")
+
+    def pow10(self) -> "Expr":
+        return self._map("pow10")
+
+    def clip(self, lower: Optional[Number] = None, upper: Optional[Number] = None):
+        """Limit values to [lower, upper]; without bounds the series is unchanged, as in pandas."""
+        if lower is None and upper is None:
+            return self
+        return self._map("clip", (lower, upper))
+
+    def _arithmetic(self, name: str, other, reflected: bool = False) -> "Expr":
+        if isinstance(other, Expr):
+            inputs = (other, self) if reflected else (self, other)
+            return Expr("binary", (name,), inputs)
+        if reflected and name in ["sub", "div"]:
+            name = f"r{name}"
+        return self._map(name, float(other))
+
+    def __add__(self, other):
+        return self._arithmetic("add", other)
+
+    def __radd__(self, other):
+        return self._arithmetic("add", other, reflected=True)
+
+    def __sub__(self, other):
+        return self._arithmetic("sub", other)
+
+    def __rsub__(self, other):
+        return self._arithmetic("sub", other, reflected=True)
+
+    def __mul__(self, other):
+        return self._arithmetic("mul", other)
+
+    def __rmul__(self, other):
+        return self._arithmetic("mul", other, reflected=True)
+
+    def __truediv__(self, other):
+        return self._arithmetic("div", other)
+
+    def __rtruediv__(self, other):
+        return self._arithmetic("div", other, reflected=True)
+
+    def __neg__(self):
+        return self._map("mul", -1.0)
+
+    # steps that move dates (no copy) ##############################################
+
+    def shift(self, days: int) -> "Expr":
+        """Move every value `days` days later (earlier if negative)."""
+        return Expr("shift", (int(days),), (self,))
+
+    def between(self, start=None, end=None) -> "Expr":
+        """Keep the dates from start to end (inclusive)."""
+        start = None if start is None else pd.Timestamp(start).normalize()
+        end = None if end is None else pd.Timestamp(end).normalize()
+        return Expr("between", (start, end), (self,))
+
+    # other steps ##################################################################
+
+    def smooth(
+        self,
+        window: int = SMOOTHING_DAYS,
+        kernel: str = "moving-average",
+        edge: str = "shrink",
+        preserve_total: bool = True,
+    ) -> "Expr":
+        """Smooth the series: see `pycovid.smoothing.smooth`."""
+        return Expr("smooth", (window, kernel, edge, preserve_total), (self,))
+
+    def collect(self, context: Optional["Context"] = None) -> pd.Series:
+        """Evaluate the expression."""
+        return collect_values([self], context)[0].to_series()
+
+
+def source(
+    name: str, column: Optional[str] = None, version: Optional[str] = None, **params
+) -> Expr:
+    """
+    A series from the catalog.
+
+    :param name: The source name
+    :param column: The column of the source's dataframe (if it is not a series)
+    :param version: The data release (default: latest registered)
+    :param params: Loader arguments, as `Catalog.get`
+    """
+    return Expr("source", (name, column, version, tuple(sorted(params.items()))))
+
+
+def ons(region: str, version: Optional[str] = None) -> Expr:
+    """Daily ONS registrations of deaths mentioning COVID-19 in a region."""
+    return source("ons-registrations", column=region, version=version)
+
+
+def from_series(series: pd.Series) -> Expr:
+    """A series held in memory, keyed by its values (equal series are one node)."""
+    daily = from_pandas(series)
+    digest = hashlib.sha256(daily.values.tobytes()).hexdigest()
+    return Expr("series", (daily.start, len(daily.values), digest), data=daily)
+
+
+def fatal_infections(deaths: Expr) -> Dict[str, Expr]:
+    """
+    The columns of `prepare_fatal_infection_data` as expressions, to collect only those needed.
+
+    :param deaths: Daily registrations, e.g. `ons("England")`
+    :return: expressions by column name
+    """
+    infections = deaths.smooth(SMOOTHING_DAYS, edge="nan").shift(
+        -INFECTION_TO_DEATH_DAYS
+    )
+    return {
+        "deaths (raw)": deaths,
+        "infections": infections,
+        "infections (log)": infections.log10(),
+    }
+
+
+# evaluation ###########################################################################
+
+
+class Context:
+    """
+    The values of evaluated nodes, shared by the collects that use the context.
+
+    Values are kept up to max_size bytes, evicting the least recently used first.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CONTEXT_SIZE):
+        self.max_size = max_size
+        self._values: "OrderedDict[bytes, Daily]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evaluated = 0  # nodes (fused chains counting once) evaluated
+        self.fused = 0  # element-wise steps evaluated inside fused chains
+        self.hits = 0  # nodes found already evaluated
+        self.evictions = 0
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self._values
+
+    def get(self, key: bytes) -> Optional[Daily]:
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self.hits += 1
+                self._values.move_to_end(key)
+            return value
+
+    def put(self, key: bytes, value: Daily):
+        with self._lock:
+            if key in self._values:
+                self._size -= self._values.pop(key).values.nbytes
+            self._values[key] = value
+            self._size += value.values.nbytes
+            # always keep the newest value, even if it alone exceeds the budget
+            while len(self._values) > 1 and self._size > self.max_size:
+                _, evicted = self._values.popitem(last=False)
+                self._size -= evicted.values.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._size = 0
+
+
+context = Context()
+
+
+def plan(outputs: List[Expr]):
+    """
+    Order the distinct nodes the outputs depend on, inputs first, and count the distinct consumers of each.
+
+    :return: a tuple (nodes, consumers by key)
+    """
+    nodes, seen, consumers = [], set(), Counter()
+    stack = [(node, False) for node in reversed(outputs)]
+    while stack:
+        node, expanded = stack.pop()
+        if node.key in seen:
+            continue
+        if expanded:
+            seen.add(node.key)
+            nodes.append(node)
+            consumers.update({child.key for child in node.inputs})
+            continue
+        stack.append((node, True))
+        stack.extend((child, False) for child in node.inputs if child.key not in seen)
+    return nodes, consumers
+
+
+def resolve_keys(nodes: List[Expr]) -> Dict[bytes, bytes]:
+    """
+    Key the values of nodes (in plan order) for the context.
+
+    A source's key adds the catalog registration it reads now and the memory mode, so values computed from a source
+    that has since been re-registered, or in another memory mode, are not reused.
+    """
+    from pycovid.catalog import catalog
+
+    resolved = {}
+    for node in nodes:
+        if node.op == "source":
+            name, _, version, _ = node.args
+            source = catalog.source(name, version)
+            token = (source.version, source.registration, get_memory_mode())
+            resolved[node.key] = node_key((node.key, token))
+        elif node.inputs:
+            inputs = tuple(resolved[child.key] for child in node.inputs)
+            resolved[node.key] = node_key((node.op, node.args, inputs))
+        else:
+            resolved[node.key] = node.key
+    return resolved
+
+
+def collect_values(
+    outputs: List[Expr], context: Optional[Context] = None
+) -> List[Daily]:
+    """Evaluate expressions, sharing common subexpressions and fusing element-wise chains."""
+    context = globals()["context"] if context is None else context
+    nodes, consumers = plan(outputs)
+    keys = resolve_keys(nodes)
+    output_keys = {node.key for node in outputs}
+
+    def fused(node: Expr) -> bool:
+        """True if a node is evaluated inside the chain of its one consumer rather than materialised."""
+        return (
+            node.op == "map"
+            and consumers[node.key] == 1
+            and node.key not in output_keys
+            and keys[node.key] not in context
+        )
+
+    consumer_ops = {}
+    for node in nodes:
+        for child in node.inputs:
+            consumer_ops.setdefault(child.key, node.op)
+
+    values: Dict[bytes, Daily] = {}
+    for node in nodes:
+        if fused(node) and consumer_ops.get(node.key) == "map":
+            continue
+        cached = context.get(keys[node.key])
+        if cached is None:
+            if node.op == "map":
+                cached = evaluate_chain(node, values, context, fused)
+            else:
+                cached = evaluate(node, [values[child.key] for child in node.inputs])
+            context.put(keys[node.key], cached)
+            context.evaluated += 1
+        values[node.key] = cached
+
+    return [values[node.key] for node in outputs]
+
+
+def evaluate_chain(node: Expr, values: Dict[bytes, Daily], context: Context, fused):
+    """Evaluate a chain of element-wise steps ending at node: copy the input once, then apply each step in place."""
+    steps = [node]
+    while steps[-1].inputs[0].op == "map" and fused(steps[-1].inputs[0]):
+        steps.append(steps[-1].inputs[0])
+    source = values[steps[-1].inputs[0].key]
+
+    out = np.array(source.values, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for step in reversed(steps):
+            name, argument = step.args
+            ELEMENTWISE[name](out, argument, out)
+    context.fused += len(steps) - 1
+    out.flags.writeable = False
+
+    return Daily(source.start, out)
+
+
+def evaluate(node: Expr, inputs: List[Daily]) -> Daily:
+    if node.op == "source":
+        from pycovid.catalog import catalog
+
+        name, column, version, params = node.args
+        data = catalog.get(name, version=version, **dict(params))
+        return from_pandas(data if column is None else data[column])
+
+    if node.op == "series":
+        return node.data
+
+    if node.op == "shift":
+        (daily,) = inputs
+        return Daily(daily.start + pd.Timedelta(days=node.args[0]), daily.values)
+
+    if node.op == "between":
+        (daily,) = inputs
+        start, end = node.args
+        first = 0 if start is None else max((start - daily.start).days, 0)
+        last = len(daily.values) if end is None else (end - daily.start).days + 1
+        last = min(max(last, first), len(daily.values))
+        return Daily(daily.start + pd.Timedelta(days=first), daily.values[first:last])
+
+    if node.op == "smooth":
+        (daily,) = inputs
+        window, kernel, edge, preserve_total = node.args
+        values = smooth(daily.values, window, kernel, edge, preserve_total)
+        values.flags.writeable = False
+        return Daily(daily.start, values)
+
+    if node.op == "binary":
+        # align on the union of the dates: NaN where either is missing
+        left, right = inputs
+        start, end = min(left.start, right.start), max(left.end, right.end)
+        n = (end - start).days + 1
+        aligned = []
+        for daily in inputs:
+            values = np.full(n, np.nan)
+            offset = (daily.start - start).days
+            values[offset : offset + len(daily.values)] = daily.values
+            aligned.append(values)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = BINARY[node.args[0]](*aligned)
+        values.flags.writeable = False
+        return Daily(start, values)
+
+    raise AttributeError(f"op not known: got {node.op}")
+
+
+def collect(
+    exprs: Dict[str, Expr],
+    columns: Optional[List[str]] = None,
+    context: Optional[Context] = None,
+) -> Panel:
+    """
+    Evaluate named expressions into a panel.
+
+    :param exprs: Expressions by column name
+    :param columns: The columns wanted (default: all); the others are not evaluated
+    :param context: The context holding evaluated nodes (default: the run's context)
+    :return: a panel spanning every column
+    """
+    names = list(exprs) if columns is None else columns
+    values = collect_values([exprs[name] for name in names], context)
+    start = min(daily.start for daily in values)
+    end = max(daily.end for daily in values)
+    panel = Panel(start, end, capacity=len(names))
+    for name, daily in zip(names, values):
+        panel.insert(name, daily.to_series(name))
+
+    return panel
@@ -6,12 +6,45 @@ Get COVID-19 Government Response data from
 Codes:
 https://github.com/OxCGRT/covid-policy-tracker/blob/master/documentation/codebook.md
 
+Policy change points: the ordinal indicators of every country are held as a (country x date x indicator) int8 array,
+and tightening and easing events are found with one vectorized diff along the date axis.
 """
 
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
 import pandas as pd
 from pycovid import DATA_DIR
+from pycovid.events import EventItem
+from pycovid.data_utils.xlsx import Workbook
+from pycovid.memoize import memoize
+from pycovid.memory import low_memory
+
+OXCGRT_CSV = "OxCGRT_latest.csv"
+ORDINAL_INDICATORS = [
+    "C1_School closing",
+    "C2_Workplace closing",
+    "C3_Cancel public events",
+    "C4_Restrictions on gatherings",
+    "C5_Close public transport",
+    "C6_Stay at home requirements",
+    "C7_Restrictions on internal movement",
+    "C8_International travel controls",
+    "E1_Income support",
+    "E2_Debt/contract relief",
+    "H1_Public information campaigns",
+    "H2_Testing policy",
+    "H3_Contact tracing",
+    "H6_Facial Coverings",
+    "H7_Vaccination policy",
+    "H8_Protection of elderly people",
+]
+MISSING = -1  # indicator not reported
+EVENT_KINDS = ["tightening", "easing"]
 
 
+@low_memory
 def get_government_response(country_code: str = "GBR", policies=None) -> pd.DataFrame:
     data_file = DATA_DIR / "OxCGRT_latest.csv"
     df = pd.read_csv(data_file)
@@ -23,6 +56,8 @@ def get_government_response(country_code: str = "GBR", policies=None) -> pd.Data
     return df
 
 
+@low_memory
+@memoize(inputs=[DATA_DIR / "OxCGRT_timeseries_all.xlsx"])
 def government_response(measures: List[str]) -> pd.DataFrame:
     """
     Get COVID-19 Government Response data (see: https://github.com/OxCGRT/covid-policy-tracker)
@@ -32,18 +67,153 @@ def government_response(measures: List[str]) -> pd.DataFrame:
 
     result = pd.DataFrame()
 
-    for measure in measures:
-        df = pd.read_excel(
-            DATA_DIR / "OxCGRT_timeseries_all.xlsx",
-            sheet_name=measure,
-        )
+    with Workbook(DATA_DIR / "OxCGRT_timeseries_all.xlsx") as workbook:
+        for measure in measures:
+            df = workbook.read(sheet_name=measure)
 
-        df = df[df["country_code"] == "GBR"].T
-        df = df.drop(["country_code", "country_name"])
-        df.index = pd.to_datetime(df.index)
-        df.rename(columns={61: measure}, inplace=True)
+            df = df[df["country_code"] == "GBR"].T
+            df = df.drop(["country_code", "country_name"])
+            df.index = pd.to_datetime(df.index)
+            df.rename(columns={61: measure}, inplace=True)
 
-        # result.index = pd.to_datetime(df.index)
-        result = pd.concat([result, df], axis=1)
+            # result.index = pd.to_datetime(df.index)
+            result = pd.concat([result, df], axis=1)
 
     return result
+
+
+@dataclass
+class PolicyCube:
+    """Class for holding OxCGRT ordinal indicators as a (country x date x indicator) int8 array."""
+
+    values: np.ndarray  # MISSING where not reported
+    countries: pd.Index  # country codes
+    dates: pd.DatetimeIndex
+    indicators: pd.Index
+
+
+def policy_cube(
+    df: pd.DataFrame, indicators: List[str] = ORDINAL_INDICATORS
+) -> PolicyCube:
+    """
+    Build a policy cube from national rows of OxCGRT data in the long ("latest") format.
+
+    :param df: OxCGRT data with columns "CountryCode", "Date" (YYYYMMDD) and the indicators. Rows with a
+        "RegionName" are subnational and ignored.
+    :param indicators: The ordinal indicators to hold
+    :return: the policy cube
+    """
+    if "RegionName" in df:
+        df = df[df["RegionName"].isna()]
+    dates = pd.to_datetime(df["Date"].astype(str), format="%Y%m%d")
+
+    country_codes, countries = pd.factorize(df["CountryCode"], sort=True)
+    calendar = pd.date_range(dates.min(), dates.max(), freq="D")
+    days = ((dates - calendar[0]).dt.days).to_numpy()
+
+    values = np.full((len(countries), len(calendar), len(indicators)), MISSING, np.int8)
+    values[country_codes, days] = (
+        df[indicators].fillna(MISSING).to_numpy(dtype=float).astype(np.int8)
+    )
+
+    return PolicyCube(
+        values=values,
+        countries=pd.Index(countries, name="country"),
+        dates=calendar,
+        indicators=pd.Index(indicators, name="indicator"),
+    )
+
+
+@memoize(inputs=lambda csvfile, indicators: [DATA_DIR / csvfile])
+def read_policy_cube(
+    csvfile: str = OXCGRT_CSV, indicators: List[str] = ORDINAL_INDICATORS
+) -> PolicyCube:
+    """Read the policy cube of every country from an OxCGRT CSV (relative to DATA_DIR)."""
+    df = pd.read_csv(
+        DATA_DIR / csvfile,
+        usecols=["CountryCode", "RegionName", "Date"] + indicators,
+        dtype={"RegionName": str},
+    )
+    return policy_cube(df, indicators)
+
+
+def policy_events(cube: PolicyCube) -> pd.DataFrame:
+    """
+    Find every change of every indicator of every country.
+
+    Unreported days carry the last reported level forward, so reporting gaps do not create events.
+
+    :return: a dataframe with columns "country", "date", "indicator", "previous", "level" and "kind" ("tightening" or
+        "easing"), one row per change, ordered by country, date and indicator
+    """
+    values = cube.values
+    reported = values != MISSING
+
+    # forward fill the last reported level along the date axis
+    days = np.arange(values.shape[1])[None, :, None]
+    last = np.maximum.accumulate(np.where(reported, days, 0), axis=1)
+    filled = np.take_along_axis(values, last, axis=1)
+
+    previous, current = filled[:, :-1], values[:, 1:]
+    changed = reported[:, 1:] & (previous != MISSING) & (current != previous)
+    c, d, i = np.nonzero(changed)
+
+    kinds = np.where(current[c, d, i] > previous[c, d, i], 0, 1)
+    return pd.DataFrame(
+        {
+            "country": pd.Categorical.from_codes(c, cube.countries),
+            "date": cube.dates[d + 1],
+            "indicator": pd.Categorical.from_codes(i, cube.indicators),
+            "previous": previous[c, d, i],
+            "level": current[c, d, i],
+            "kind": pd.Categorical.from_codes(kinds, EVENT_KINDS),
+        }
+    )
+
+
+def event_items(
+    events: pd.DataFrame,
+    country: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    indicators: Optional[List[str]] = None,
+    kind: Optional[str] = None,
+) -> List[EventItem]:
+    """
+    Create chart events from policy events, one per date.
+
+    :param events: Policy events from `policy_events`
+    :param country: The country code, e.g. "GBR"
+    :param start: The first date to include
+    :param end: The last date to include
+    :param indicators: The indicators to include (default: all)
+    :param kind: "tightening" or "easing" (default: both)
+    :return: a list of EventItem, labelled e.g. "School closing eased to 1"
+    """
+    if kind is not None and kind not in EVENT_KINDS:
+        raise AttributeError(f"kind not in {EVENT_KINDS}: got {kind}")
+
+    selected = events["country"] == country
+    if start is not None:
+        selected &= events["date"] >= pd.Timestamp(start)
+    if end is not None:
+        selected &= events["date"] <= pd.Timestamp(end)
+    if indicators is not None:
+        selected &= events["indicator"].isin(indicators)
+    if kind is not None:
+        selected &= events["kind"] == kind
+    events = events[selected]
+
+    verbs = events["kind"].map({"tightening": "tightened", "easing": "eased"})
+    labels = (
+        events["indicator"].astype(str).str.split("_", n=1).str[-1]
+        + " "
+        + verbs.astype(str)
+        + " to "
+        + events["level"].astype(str)
+    )
+
+    return [
+        EventItem(date.strftime("%Y-%m-%d"), ", ".join(group))
+        for date, group in labels.groupby(events["date"], sort=True)
+    ]
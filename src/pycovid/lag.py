@@ -0,0 +1,271 @@
+"""
+lag.py
+
+Lagged correlation between driver series (e.g. infections, vaccinations, solar declination) and response series (e.g.
+deaths) for many series at once.
+
+The Pearson correlation of every (driver, response) pair at every lag is computed from FFT cross-correlations of the
+stacked series and their validity masks, so each lag uses exactly the days where both series have data. A positive lag
+means the response follows the driver.
+
+The significance of a peak is tested against the peaks of resampled drivers: block permutations (block=1 is a plain
+permutation) or a block bootstrap. Resampling in blocks preserves the short-range autocorrelation of daily data, which
+would otherwise make every smooth series look significant. Resamples are drawn in parallel with independent seeds
+spawned from one SeedSequence, so results are reproducible for a given seed whatever the number of processes.
+"""
+
+import os
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from scipy import fft
+from pycovid.prefetch import create_executor
+
+MAX_LAG_DAYS = 60
+MIN_OVERLAP = 30  # fewest shared days for a correlation
+BLOCK_DAYS = 14
+TESTS = ["permutation", "block-bootstrap"]
+BATCH = 64  # resamples transformed (and seeded) together
+
+Series2D = Union[pd.DataFrame, pd.Series, np.ndarray]
+
+
+def _as_frame(data: Series2D, prefix: str) -> pd.DataFrame:
+    if isinstance(data, pd.Series):
+        return data.to_frame()
+    if isinstance(data, np.ndarray):
+        data = data.reshape(len(data), -1)
+        return pd.DataFrame(
+            data, columns=[f"{prefix}{i}" for i in range(data.shape[1])]
+        )
+    return data
+
+
+def _spectra(values: np.ndarray, n_fft: int) -> np.ndarray:
+    """FFT of each column's values, squared values and validity mask: shape (3, column, frequency)."""
+    valid = ~np.isnan(values)
+    # standardise each column (correlation is unchanged) so the raw moments do not cancel for large offsets
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = np.nanstd(values, axis=0)
+        standard = (values - np.nanmean(values, axis=0)) / np.where(scale > 0, scale, 1)
+    filled = np.where(valid, standard, 0.0)
+    stacked = np.stack([filled, filled * filled, valid.astype(float)])
+    return fft.rfft(stacked, n=n_fft, axis=1).transpose(0, 2, 1)
+
+
+def _correlate(x: np.ndarray, y: np.ndarray, n_fft: int, max_lag: int) -> np.ndarray:
+    """Correlate every spectrum of x with every spectrum of y: sum_t x[t] y[t + k] for k in [-max_lag, max_lag]."""
+    c = fft.irfft(np.conj(x)[:, None, :] * y[None, :, :], n=n_fft, axis=-1)
+    return np.concatenate([c[..., n_fft - max_lag :], c[..., : max_lag + 1]], axis=-1)
+
+
+def _lagged_pearson(
+    x: np.ndarray, y: np.ndarray, n_fft: int, max_lag: int, min_overlap: int
+) -> np.ndarray:
+    """Pearson correlation at every lag from the spectra of drivers x and responses y: shape (x, y, lag)."""
+    x_sum, x_sq, x_mask = x
+    y_sum, y_sq, y_mask = y
+    n = np.rint(_correlate(x_mask, y_mask, n_fft, max_lag))
+    sx = _correlate(x_sum, y_mask, n_fft, max_lag)
+    sy = _correlate(x_mask, y_sum, n_fft, max_lag)
+    sxx = _correlate(x_sq, y_mask, n_fft, max_lag)
+    syy = _correlate(x_mask, y_sq, n_fft, max_lag)
+    sxy = _correlate(x_sum, y_sum, n_fft, max_lag)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+    r[(n < min_overlap) | ~np.isfinite(r)] = np.nan
+
+    return np.clip(r, -1, 1)
+
+
+def cross_correlation(
+    drivers: Series2D,
+    responses: Series2D,
+    max_lag: int = MAX_LAG_DAYS,
+    min_overlap: int = MIN_OVERLAP,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the correlation of every driver with every response at every lag.
+
+    :param drivers: Daily driver series, one per column, on the same dates as responses
+    :param responses: Daily response series, one per column
+    :param max_lag: The largest lag (days) in either direction
+    :param min_overlap: Fewest shared days for a correlation (fewer gives NaN)
+    :return: a tuple (correlations, lags): an array of shape (driver, response, lag) and the lags in days
+    """
+    x = _as_frame(drivers, "driver").to_numpy(dtype=float)
+    y = _as_frame(responses, "response").to_numpy(dtype=float)
+    if len(x) != len(y):
+        raise AttributeError(
+            f"drivers and responses must share dates: got {len(x)} and {len(y)} rows"
+        )
+
+    n_fft = fft.next_fast_len(len(x) + max_lag)
+    r = _lagged_pearson(
+        _spectra(x, n_fft), _spectra(y, n_fft), n_fft, max_lag, min_overlap
+    )
+
+    return r, np.arange(-max_lag, max_lag + 1)
+
+
+def _peaks(r: np.ndarray, absolute: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the lag position and correlation of the peak of each pair (NaN correlation where there is none)."""
+    score = np.abs(r) if absolute else r
+    all_nan = np.isnan(score).all(axis=-1)
+    position = np.nanargmax(np.where(all_nan[..., None], 0, score), axis=-1)
+    peak = np.take_along_axis(r, position[..., None], axis=-1)[..., 0]
+    peak[all_nan] = np.nan
+    return position, peak
+
+
+def peak_lags(
+    drivers: Series2D,
+    responses: Series2D,
+    max_lag: int = MAX_LAG_DAYS,
+    min_overlap: int = MIN_OVERLAP,
+    absolute: bool = False,
+) -> pd.DataFrame:
+    """
+    Find the lag of peak correlation of every (driver, response) pair.
+
+    :param absolute: Find the peak of |correlation| (e.g. for inverse relationships) rather than of correlation
+    :return: a dataframe with columns "driver", "response", "lag" (days) and "correlation", one row per pair
+    """
+    drivers = _as_frame(drivers, "driver")
+    responses = _as_frame(responses, "response")
+    r, lags = cross_correlation(drivers, responses, max_lag, min_overlap)
+    position, peak = _peaks(r, absolute)
+
+    return pd.DataFrame(
+        {
+            "driver": np.repeat(drivers.columns, len(responses.columns)),
+            "response": np.tile(responses.columns, len(drivers.columns)),
+            "lag": lags[position].ravel(),
+            "correlation": peak.ravel(),
+        }
+    )
+
+
+def resample_blocks(
+    values: np.ndarray, test: str, block: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Resample the rows of a (date x series) array in blocks.
+
+    "permutation" shuffles consecutive blocks (block=1 shuffles days); "block-bootstrap" draws circular blocks with
+    replacement.
+    """
+    n = len(values)
+    if test == "permutation":
+        starts = np.arange(0, n, block)
+        rows = np.concatenate(
+            [np.arange(s, min(s + block, n)) for s in rng.permutation(starts)]
+        )
+    else:
+        starts = rng.integers(0, n, size=-(-n // block))
+        rows = ((starts[:, None] + np.arange(block)[None, :]) % n).ravel()[:n]
+    return values[rows]
+
+
+def null_peaks(
+    drivers: np.ndarray,
+    responses: np.ndarray,
+    batches: List[Tuple[int, np.random.SeedSequence]],
+    test: str = "permutation",
+    block: int = BLOCK_DAYS,
+    max_lag: int = MAX_LAG_DAYS,
+    min_overlap: int = MIN_OVERLAP,
+    absolute: bool = False,
+) -> np.ndarray:
+    """
+    Compute the peak correlations of resampled drivers with the responses.
+
+    :param batches: (number of resamples, seed) of each batch of resamples
+    :return: an array of shape (resample, driver, response)
+    """
+    n_fft = fft.next_fast_len(len(drivers) + max_lag)
+    y = _spectra(responses, n_fft)
+    n_drivers = drivers.shape[1]
+
+    peaks = []
+    for size, seed in batches:
+        rng = np.random.default_rng(seed)
+        resampled = np.hstack(
+            [resample_blocks(drivers, test, block, rng) for _ in range(size)]
+        )
+        r = _lagged_pearson(_spectra(resampled, n_fft), y, n_fft, max_lag, min_overlap)
+        _, peak = _peaks(r, absolute)
+        peaks.append(peak.reshape(size, n_drivers, -1))
+
+    return np.concatenate(peaks)
+
+
+def lag_significance(
+    drivers: Series2D,
+    responses: Series2D,
+    test: str = "permutation",
+    n_resamples: int = 1000,
+    block: int = BLOCK_DAYS,
+    max_lag: int = MAX_LAG_DAYS,
+    min_overlap: int = MIN_OVERLAP,
+    absolute: bool = False,
+    seed: Optional[int] = None,
+    partitions: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Find the peak lag of every (driver, response) pair and test whether its correlation is significant.
+
+    The p value is the share of resampled drivers whose peak correlation (over all lags) is at least the observed
+    peak, so it accounts for searching over lags.
+
+    :param test: One of TESTS
+    :param n_resamples: Number of resampled drivers
+    :param block: Resampling block length in days
+    :param seed: Seed for reproducible resampling
+    :param partitions: Number of processes to share the resamples (default: one per CPU)
+    :return: the `peak_lags` dataframe with a "p value" column
+    """
+    if test not in TESTS:
+        raise AttributeError(f"test not in {TESTS}: got {test}")
+
+    drivers = _as_frame(drivers, "driver")
+    responses = _as_frame(responses, "response")
+    result = peak_lags(drivers, responses, max_lag, min_overlap, absolute)
+
+    # one seed per batch, so the resamples do not depend on how batches are shared between processes
+    sizes = np.diff(np.r_[np.arange(0, n_resamples, BATCH), n_resamples]).tolist()
+    batches = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+    if partitions is None:
+        partitions = os.cpu_count()
+    partitions = max(min(partitions, len(batches)), 1)
+    args = (drivers.to_numpy(dtype=float), responses.to_numpy(dtype=float))
+    kwargs = dict(
+        test=test,
+        block=block,
+        max_lag=max_lag,
+        min_overlap=min_overlap,
+        absolute=absolute,
+    )
+
+    if partitions == 1:
+        nulls = [null_peaks(*args, batches, **kwargs)]
+    else:
+        with create_executor(partitions) as executor:
+            futures = [
+                executor.submit(null_peaks, *args, batches[i::partitions], **kwargs)
+                for i in range(partitions)
+            ]
+            nulls = [future.result() for future in futures]
+    null = np.concatenate(nulls).reshape(n_resamples, -1)
+
+    observed = result["correlation"].to_numpy()
+    if absolute:
+        null, observed = np.abs(null), np.abs(observed)
+    exceed = (np.nan_to_num(null, nan=-np.inf) >= observed).sum(axis=0)
+    result["p value"] = np.where(
+        np.isnan(observed), np.nan, (1 + exceed) / (1 + n_resamples)
+    )
+
+    return result
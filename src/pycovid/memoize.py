@@ -0,0 +1,299 @@
+"""
+memoize.py
+
+Content-addressed memoization of analysis results on disk.
+
+`@memoize` keys a result on the function (its code and constants, and the source of the module defining it), its
+arguments and the content hashes of the input files it reads, and stores it as a pickle in CACHE_DIR. A change to
+code in another module that the function calls is not seen: bump the function's `version` salt.
+
+Results are shared between processes and sessions. Changing an input file changes the keys of exactly the results
+computed from it; stale results are never read again and age out of the cache, which is bounded in size by evicting
+the least recently used results.
+
+    @memoize(inputs=lambda meta: [DATA_DIR / meta.workbook])
+    def prepare_fatal_infection_data(meta: XLMeta) -> pd.DataFrame:
+        ...
+"""
+
+import dataclasses
+import datetime
+import enum
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path, PurePath
+from types import CodeType
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pycovid import CACHE_DIR
+
+DEFAULT_CACHE_SIZE = 2 * 1024**3  # bytes
+SUFFIX = ".pickle"
+
+Inputs = Union[Iterable[Path], Callable[..., Iterable[Path]]]
+# arguments fingerprinted by their repr, which is stable across processes
+REPR_TYPES = (
+    type(None),
+    bool,
+    int,
+    float,
+    complex,
+    str,
+    bytes,
+    PurePath,
+    datetime.date,
+    datetime.time,
+    datetime.timedelta,
+    pd.Timestamp,
+    pd.Timedelta,
+    np.generic,
+    enum.Enum,
+)
+
+
+@dataclass
+class DiskCacheStats:
+    """Class for reporting the state of a disk cache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+    max_size: int
+
+
+def touch(path: Path):
+    """Record the last use of a result as its modification time (at full clock resolution)."""
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+class DiskCache:
+    """A directory of pickled results, evicted least recently used first when it outgrows max_size."""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_size: int = DEFAULT_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{SUFFIX}"
+
+    def get(self, key: str) -> Tuple[bool, object]:
+        """
+        Look up a result.
+
+        :return: a tuple (found, result)
+        """
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False, None
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # damaged, or written by incompatible library versions: recompute
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self.misses += 1
+            return False, None
+
+        touch(path)
+        with self._lock:
+            self.hits += 1
+        return True, result
+
+    def put(self, key: str, result):
+        """Store a result, then evict old results until the cache fits max_size."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # write then rename, so concurrent processes never read a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path(key))
+        touch(self.path(key))
+        self._evict(keep=self.path(key))
+
+    def _entries(self):
+        entries = []
+        for path in self.cache_dir.glob(f"*{SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def _evict(self, keep: Path):
+        entries = sorted(self._entries())
+        size = sum(entry[1] for entry in entries)
+        for _, nbytes, path in entries:
+            if size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            size -= nbytes
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        """Remove every stored result."""
+        for _, _, path in self._entries():
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> DiskCacheStats:
+        entries = self._entries()
+        return DiskCacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            entries=len(entries),
+            size=sum(entry[1] for entry in entries),
+            max_size=self.max_size,
+        )
+
+
+cache = DiskCache()
+
+
+# file hashes, keyed on (path, modification time, size) so unchanged files are read once per process
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_hash(path: Path) -> str:
+    """Return the SHA-256 of a file's contents ("missing" if it does not exist)."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return "missing"
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024**2), b""):
+                digest.update(block)
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+
+def fingerprint(value, digest) -> None:
+    """Feed a stable encoding of a function argument into a hashlib digest."""
+    digest.update(type(value).__qualname__.encode())
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        fingerprint(dataclasses.asdict(value), digest)
+    elif isinstance(value, dict):
+        for k in sorted(value, key=repr):
+            fingerprint(k, digest)
+            fingerprint(value[k], digest)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            fingerprint(v, digest)
+    elif isinstance(value, (set, frozenset)):
+        for v in sorted(value, key=repr):
+            fingerprint(v, digest)
+    elif isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        digest.update(repr(list(getattr(value, "columns", [value.name]))).encode())
+        digest.update(pd.util.hash_pandas_object(value).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, REPR_TYPES):
+        digest.update(repr(value).encode())
+    else:
+        # a default repr holds a memory address, which would make a new key every process
+        raise AttributeError(
+            f"argument type not fingerprintable: got {type(value).__qualname__}"
+        )
+
+
+def code_fingerprint(code: CodeType, digest) -> None:
+    """Feed a function's bytecode and constants (including those of nested functions) into a hashlib digest."""
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            code_fingerprint(const, digest)
+        else:
+            fingerprint(const, digest)
+
+
+def module_hash(name: str) -> str:
+    """Return the SHA-256 of a module's source file ("" if it has none)."""
+    try:
+        path = inspect.getsourcefile(sys.modules[name])
+    except (KeyError, TypeError):
+        return ""
+    return file_hash(Path(path)) if path else ""
+
+
+def memoize(
+    func: Optional[Callable] = None,
+    *,
+    inputs: Optional[Inputs] = None,
+    store: Optional[DiskCache] = None,
+    version: str = "",
+):
+    """
+    Cache a pure function's results on disk, keyed on its code, its arguments and the contents of its input files.
+
+    :param func: The function (when used as a bare `@memoize`)
+    :param inputs: The files the function reads: a list of paths, or a function called with the memoized function's
+        arguments (defaults applied) that returns them
+    :param store: The disk cache (default: the module's shared `cache`)
+    :param version: A salt for the keys: change it when code in another module that the function calls changes
+    :return: the memoized function. Its `cache_key(*args, **kwargs)` returns the key of a call, and `uncached` is the
+        original function.
+    """
+    if func is None:
+        return functools.partial(memoize, inputs=inputs, store=store, version=version)
+
+    signature = inspect.signature(func)
+
+    def cache_key(*args, **kwargs) -> str:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if callable(inputs):
+            files = inputs(**bound.arguments)
+        else:
+            files = inputs or []
+
+        digest = hashlib.sha256()
+        # a change to the function's own code or module invalidates its results
+        digest.update(f"{func.__module__}.{func.__qualname__}:{version}".encode())
+        code_fingerprint(func.__code__, digest)
+        digest.update(module_hash(func.__module__).encode())
+        fingerprint(dict(bound.arguments), digest)
+        for path in files:
+            digest.update(file_hash(Path(path)).encode())
+        return digest.hexdigest()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        disk_cache = store if store is not None else cache
+        key = cache_key(*args, **kwargs)
+        found, result = disk_cache.get(key)
+        if not found:
+            result = func(*args, **kwargs)
+            disk_cache.put(key, result)
+        return result
+
+    wrapper.cache_key = cache_key
+    wrapper.uncached = func
+
+    return wrapper
@@ -0,0 +1,139 @@
+"""
+memory.py
+
+A process-wide memory mode for the data loaders.
+
+In "low" mode every loader decorated with `@low_memory` returns compact dtypes (`compact`):
+
+- label columns (strings such as gender, age band, location or country code) become categoricals
+- counts and policy levels become the smallest integer type holding them (float32 where values are missing, which
+  represents whole numbers exactly up to 2**24)
+- rates become float32
+
+The mode is held in the PYCOVID_MEMORY_MODE environment variable, so process pools started after `set_memory_mode`
+load in the same mode. The catalog keys cached frames on the mode; memoized results are stored in the default dtypes
+and compacted as they are returned.
+
+    set_memory_mode("low")
+    df = catalog.get("owid-deaths")  # float32 rates
+
+`memory_report` shows the bytes the low mode saves for each dataset, as does `python -m pycovid memory-report`.
+"""
+
+import contextlib
+import functools
+import os
+from typing import Callable, Dict, Union
+
+import numpy as np
+import pandas as pd
+
+MEMORY_MODES = ["default", "low"]
+MEMORY_MODE_VARIABLE = "PYCOVID_MEMORY_MODE"
+MAX_CATEGORY_SHARE = 0.5  # most distinct labels (share of rows) for a categorical
+FLOAT32_INTEGER_LIMIT = 2**24  # largest whole number float32 represents exactly
+
+Frame = Union[pd.DataFrame, pd.Series]
+
+
+def get_memory_mode() -> str:
+    return os.environ.get(MEMORY_MODE_VARIABLE, "default")
+
+
+def set_memory_mode(mode: str):
+    """Set the memory mode of this process and of the processes it starts: one of MEMORY_MODES."""
+    if mode not in MEMORY_MODES:
+        raise AttributeError(f"mode not in {MEMORY_MODES}: got {mode}")
+    os.environ[MEMORY_MODE_VARIABLE] = mode
+
+
+@contextlib.contextmanager
+def memory_mode(mode: str):
+    """Use a memory mode within a block."""
+    previous = get_memory_mode()
+    set_memory_mode(mode)
+    try:
+        yield
+    finally:
+        set_memory_mode(previous)
+
+
+def memory_usage(data: Frame) -> int:
+    """Measure the memory used by a dataframe or series, including object contents."""
+    usage = data.memory_usage(deep=True)
+    return usage.sum() if isinstance(usage, pd.Series) else usage
+
+
+def compact_series(series: pd.Series) -> pd.Series:
+    """Convert a column to the most compact dtype that holds its values."""
+    if series.dtype == object:
+        kind = pd.api.types.infer_dtype(series, skipna=True)
+        if kind in ["integer", "floating", "mixed-integer-float"]:
+            series = pd.to_numeric(series)
+        elif kind == "string" and series.nunique() <= MAX_CATEGORY_SHARE * len(series):
+            return series.astype("category")
+        else:
+            return series
+
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return series
+
+    values = series.to_numpy()
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+
+    finite = values[np.isfinite(values)]
+    whole = np.array_equal(finite, np.round(finite))
+    if whole and len(finite) == len(values) and len(values) > 0:
+        return pd.to_numeric(series.astype(np.int64), downcast="integer")
+    if whole and np.abs(finite).max(initial=0) > FLOAT32_INTEGER_LIMIT:
+        return series  # missing values and counts too large for float32
+    return series.astype(np.float32)
+
+
+def compact(data: Frame) -> Frame:
+    """
+    Convert every column of a dataframe (or a series) to compact dtypes: categoricals for labels, the smallest
+    integer type for whole numbers and float32 for everything else.
+    """
+    if isinstance(data, pd.Series):
+        return compact_series(data)
+    return pd.DataFrame(
+        {i: compact_series(data.iloc[:, i]) for i in range(data.shape[1])},
+        index=data.index,
+    ).set_axis(data.columns, axis=1)
+
+
+def low_memory(func: Callable[..., Frame]) -> Callable[..., Frame]:
+    """Compact a loader's result when the memory mode is "low"."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if get_memory_mode() == "low":
+            result = compact(result)
+        return result
+
+    return wrapper
+
+
+def memory_report(default: Dict[str, Frame], low: Dict[str, Frame]) -> pd.DataFrame:
+    """
+    Report the memory each dataset uses when loaded in each memory mode.
+
+    :param default: Datasets loaded in the default mode, by name
+    :param low: The same datasets loaded in the low mode
+    :return: a dataframe, one row per dataset, of bytes "default", "low" and "saved", and "saved (%)"
+    """
+    rows = {}
+    for name, data in default.items():
+        default_bytes = int(memory_usage(data))
+        low_bytes = int(memory_usage(low[name]))
+        rows[name] = [default_bytes, low_bytes, default_bytes - low_bytes]
+    report = pd.DataFrame.from_dict(
+        rows, orient="index", columns=["default", "low", "saved"]
+    )
+    report.index.name = "dataset"
+    report["saved (%)"] = (100 * report["saved"] / report["default"]).round(1)
+
+    return report
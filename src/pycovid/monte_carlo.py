@@ -0,0 +1,357 @@
+"""
+monte_carlo.py
+
+Propagate uncertainty in the infection-to-death delay and in death reporting into fatal infection curves and fits.
+
+`prepare_fatal_infection_data` shifts smoothed registrations back by a fixed INFECTION_TO_DEATH_DAYS. Here each draw
+instead
+
+1. perturbs the daily registrations with multiplicative log-normal reporting noise,
+2. smooths them as `prepare_fatal_infection_data` does (SMOOTHING_DAYS, totals preserved),
+3. back-projects them onto infection dates through a gamma-distributed delay whose mean and spread are drawn from the
+   priors: infections on day t are the deaths on days t + k weighted by the delay probability of k, and
+4. fits the log10 growth rate of the infections in each requested window.
+
+With no noise and a fixed delay of INFECTION_TO_DEATH_DAYS this reproduces `prepare_fatal_infection_data`.
+
+Draws are simulated in batches of BATCH as 2D (date x draw) arrays, and the batches are shared across a process pool
+with one seed per batch spawned from a single SeedSequence, so results are reproducible for a given seed whatever the
+number of processes. Percentiles are estimated from fixed-bin histograms (of log10(1 + infections), and of slopes)
+that each worker updates batch by batch and that are merged at the end, so memory does not grow with the number of
+draws.
+"""
+
+import os
+import warnings
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.signal import fftconvolve
+from scipy.stats import gamma
+from pycovid.data_utils import batched_linregress
+from pycovid.data_utils.ons import INFECTION_TO_DEATH_DAYS, SMOOTHING_DAYS
+from pycovid.prefetch import create_executor
+from pycovid.smoothing import smooth
+
+MAX_DELAY_DAYS = 70
+MIN_MASS = 0.5  # least share of the delay observed for an infection estimate
+MIN_SHARE = 0.5  # least share of draws with a value for a percentile
+PERCENTILES = [2.5, 50, 97.5]
+BATCH = 64  # draws simulated (and seeded) together
+BINS = 2000
+# decades above the deterministic peak covered by the infection histograms
+LOG_MARGIN = 1.0
+SLOPE_MARGIN = 0.05  # log10 per day either side of the deterministic slope covered by the slope histograms
+
+
+@dataclass
+class Priors:
+    """Class for holding the priors of a Monte Carlo fatal infection simulation."""
+
+    delay_mean: float = INFECTION_TO_DEATH_DAYS  # days
+    delay_mean_sd: float = 3.0  # normal prior on the mean delay
+    delay_sd_low: float = 5.0  # uniform prior on the spread (sd) of the delay
+    delay_sd_high: float = 12.0
+    reporting_noise: float = 0.1  # sd of the log-normal noise on daily registrations
+
+
+FIXED_DELAY = Priors(
+    delay_mean_sd=0.0, delay_sd_low=0.0, delay_sd_high=0.0, reporting_noise=0.0
+)
+
+
+@dataclass
+class MonteCarloBands:
+    """Class for returning the percentile bands of a Monte Carlo fatal infection simulation."""
+
+    infections: pd.DataFrame  # by infection date, one column per percentile
+    slopes: pd.DataFrame  # by fit window, one column per percentile
+    draws: int
+
+
+class HistogramQuantiles:
+    """Quantiles of many variables estimated from equal-width histograms, updated a batch of draws at a time."""
+
+    def __init__(self, low: np.ndarray, high: np.ndarray, bins: int = BINS):
+        """
+        Values outside a histogram are counted in its edge bins, and also as overflow: a percentile among them is only
+        a bound, and `quantiles` warns.
+
+        :param low: The lower edge of each variable's histogram
+        :param high: The upper edge of each variable's histogram
+        """
+        self.low = np.asarray(low, dtype=float)
+        self.width = (np.asarray(high, dtype=float) - self.low) / bins
+        self.bins = bins
+        self.counts = np.zeros((len(self.low), bins), dtype=np.int64)
+        self.below = np.zeros(len(self.low), dtype=np.int64)
+        self.above = np.zeros(len(self.low), dtype=np.int64)
+        self.draws = 0
+
+    def update(self, values: np.ndarray):
+        """Count a batch of draws: an array of shape (draw, variable); NaNs are not counted."""
+        valid = ~np.isnan(values)
+        with np.errstate(invalid="ignore"):
+            position = (values - self.low) / self.width
+            self.below += (position < 0).sum(axis=0)
+            self.above += (position > self.bins).sum(axis=0)
+            bins = np.floor(position)
+        bins = np.clip(np.nan_to_num(bins, nan=0), 0, self.bins - 1).astype(np.int64)
+        cells = (np.arange(len(self.low)) * self.bins + bins)[valid]
+        self.counts += np.bincount(cells, minlength=self.counts.size).reshape(
+            self.counts.shape
+        )
+        self.draws += len(values)
+
+    def merge(self, other: "HistogramQuantiles") -> "HistogramQuantiles":
+        """Add the counts of an estimator with the same edges, e.g. from another partition of the draws."""
+        self.counts += other.counts
+        self.below += other.below
+        self.above += other.above
+        self.draws += other.draws
+        return self
+
+    def quantiles(
+        self, percentiles: Sequence[float], min_share: float = MIN_SHARE
+    ) -> np.ndarray:
+        """
+        Interpolate percentiles of every variable within its histogram bins.
+
+        :param min_share: Least share of the draws with a value (fewer gives NaN)
+        :return: an array of shape (percentile, variable)
+        """
+        cumulative = np.cumsum(self.counts, axis=1)
+        total = cumulative[:, -1]
+        result = np.full((len(percentiles), len(self.low)), np.nan)
+        rows = np.arange(len(self.low))
+        outside = np.zeros(len(self.low), dtype=bool)
+        for i, percentile in enumerate(percentiles):
+            target = total * percentile / 100
+            outside |= (target <= self.below) & (self.below > 0)
+            outside |= target > total - self.above
+            position = np.minimum(
+                (cumulative < target[:, None]).sum(axis=1), self.bins - 1
+            )
+            below = np.where(position > 0, cumulative[rows, position - 1], 0)
+            count = self.counts[rows, position]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                fraction = np.where(count > 0, (target - below) / count, 0.5)
+            result[i] = self.low + self.width * (position + fraction)
+        missing = (total == 0) | (total < min_share * self.draws)
+        result[:, missing] = np.nan
+        if (outside & ~missing).any():
+            warnings.warn(
+                f"percentiles of {(outside & ~missing).sum()} variables fall outside their histogram range and are "
+                f"only bounds: widen the range",
+                RuntimeWarning,
+            )
+
+        return result
+
+
+def delay_distributions(means: np.ndarray, sds: np.ndarray) -> np.ndarray:
+    """
+    Discretise gamma delay distributions onto days 0 to MAX_DELAY_DAYS.
+
+    :param means: The mean delay of each draw (days)
+    :param sds: The standard deviation of each delay (0 gives the whole mass on the nearest day)
+    :return: an array of shape (day, draw); each column sums to 1
+    """
+    means = np.clip(means, 1.0, MAX_DELAY_DAYS)
+    days = np.arange(MAX_DELAY_DAYS + 1, dtype=float)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shape = (means / sds) ** 2
+        scale = sds**2 / means
+        cdf = gamma.cdf(np.clip(days + 0.5, 0, None), shape, scale=scale)
+    pmf = np.diff(np.vstack([np.zeros(len(means)), cdf]), axis=0)
+
+    fixed = sds <= 0
+    pmf[:, fixed] = days == np.rint(means[fixed])
+    return pmf / pmf.sum(axis=0)
+
+
+def back_project(smoothed: np.ndarray, pmf: np.ndarray) -> np.ndarray:
+    """
+    Project smoothed deaths back onto infection dates, each draw through its own delay distribution.
+
+    :param smoothed: Smoothed deaths, shape (date, draw); NaN where unknown
+    :param pmf: Delay distributions from `delay_distributions`, shape (day, draw)
+    :return: infections, shape (MAX_DELAY_DAYS + date, draw), starting MAX_DELAY_DAYS before the first death date.
+        NaN where less than MIN_MASS of the delay distribution falls on known deaths.
+    """
+    valid = ~np.isnan(smoothed)
+    pad = ((MAX_DELAY_DAYS, MAX_DELAY_DAYS), (0, 0))
+    filled = np.pad(np.where(valid, smoothed, 0.0), pad)
+    mask = np.pad(valid.astype(float), pad)
+
+    # infections[u] = sum_k deaths[u + k] pmf[k]: correlate each column with its own delay
+    kernel = pmf[::-1]
+    numerator = fftconvolve(filled, kernel, mode="valid", axes=0)
+    mass = fftconvolve(mask, kernel, mode="valid", axes=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        infections = np.clip(numerator, 0, None) / mass
+    infections[mass < MIN_MASS] = np.nan
+
+    return infections
+
+
+def simulate(
+    deaths: np.ndarray,
+    means: np.ndarray,
+    sds: np.ndarray,
+    noise: np.ndarray,
+    fit_rows: List[Tuple[int, int]],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simulate a batch of draws.
+
+    :param deaths: Daily registrations
+    :param means: The mean delay of each draw
+    :param sds: The delay spread of each draw
+    :param noise: Multiplicative reporting noise, shape (date, draw)
+    :param fit_rows: (first, last) rows of the infection calendar of each fit window
+    :return: a tuple (infections, slopes) of arrays of shape (infection date, draw) and (fit window, draw)
+    """
+    noisy = deaths[:, None] * noise
+    smoothed = smooth(noisy, window=SMOOTHING_DAYS, edge="nan", preserve_total=True)
+    infections = back_project(smoothed, delay_distributions(means, sds))
+
+    with np.errstate(divide="ignore"):
+        log_infections = np.log10(infections)
+    log_infections[~np.isfinite(log_infections)] = np.nan
+    slopes = np.full((len(fit_rows), len(means)), np.nan)
+    for i, (first, last) in enumerate(fit_rows):
+        slopes[i], _ = batched_linregress(log_infections[first : last + 1].T)
+
+    return infections, slopes
+
+
+def simulate_batches(
+    deaths: np.ndarray,
+    batches: List[Tuple[int, np.random.SeedSequence]],
+    priors: Priors,
+    fit_rows: List[Tuple[int, int]],
+    infection_range: Tuple[np.ndarray, np.ndarray],
+    slope_range: Tuple[np.ndarray, np.ndarray],
+) -> Tuple[HistogramQuantiles, HistogramQuantiles]:
+    """
+    Simulate batches of draws, keeping only their histograms.
+
+    :param batches: (number of draws, seed) of each batch
+    :param infection_range: The (low, high) log10 infections covered by the histogram of each infection date
+    :param slope_range: The (low, high) slopes covered by the histogram of each fit window
+    :return: a tuple of histograms of (log10 infections, slopes)
+    """
+    infection_histogram = HistogramQuantiles(*infection_range)
+    slope_histogram = HistogramQuantiles(*slope_range)
+
+    for size, seed in batches:
+        rng = np.random.default_rng(seed)
+        means = rng.normal(priors.delay_mean, priors.delay_mean_sd, size)
+        sds = rng.uniform(priors.delay_sd_low, priors.delay_sd_high, size)
+        sigma = priors.reporting_noise
+        noise = np.exp(rng.normal(-0.5 * sigma**2, sigma, (len(deaths), size)))
+
+        infections, slopes = simulate(deaths, means, sds, noise, fit_rows)
+        infection_histogram.update(np.log10(1 + infections).T)
+        slope_histogram.update(slopes.T)
+
+    return infection_histogram, slope_histogram
+
+
+def monte_carlo_fatal_infections(
+    deaths: pd.Series,
+    priors: Priors = Priors(),
+    fits: List[Tuple[str, str]] = [],
+    n_draws: int = 1000,
+    percentiles: Sequence[float] = PERCENTILES,
+    seed: Optional[int] = None,
+    partitions: Optional[int] = None,
+) -> MonteCarloBands:
+    """
+    Compute percentile bands of the fatal infection curve and of its growth rates under delay and reporting
+    uncertainty.
+
+    :param deaths: Daily registrations, indexed by date (e.g. the "deaths (raw)" column of the fatal infection data)
+    :param priors: The priors of the delay and reporting noise
+    :param fits: (start, end) infection dates of each window whose log10 growth rate is fitted
+    :param n_draws: Number of draws
+    :param percentiles: The percentiles of each band
+    :param seed: Seed for reproducible draws
+    :param partitions: Number of processes to share the draws (default: one per CPU)
+    :return: the infection and slope percentiles, by infection date and by fit window
+    """
+    deaths = deaths.dropna().asfreq("D")
+    values = deaths.to_numpy(dtype=float)
+    index = pd.date_range(
+        deaths.index[0] - pd.Timedelta(days=MAX_DELAY_DAYS),
+        deaths.index[-1],
+        freq="D",
+    )
+    fit_rows = [
+        (index.get_loc(pd.Timestamp(start)), index.get_loc(pd.Timestamp(end)))
+        for start, end in fits
+    ]
+
+    # centre the histograms on the deterministic curve and slopes
+    reference, reference_slopes = simulate(
+        values,
+        np.array([priors.delay_mean]),
+        np.zeros(1),
+        np.ones((len(values), 1)),
+        fit_rows,
+    )
+    low = np.zeros(len(index))
+    high = np.full(len(index), np.log10(1 + np.nanmax(reference)) + LOG_MARGIN)
+    slope_low = np.nan_to_num(reference_slopes[:, 0]) - SLOPE_MARGIN
+    slope_high = slope_low + 2 * SLOPE_MARGIN
+
+    sizes = np.diff(np.r_[np.arange(0, n_draws, BATCH), n_draws]).tolist()
+    batches = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+    if partitions is None:
+        partitions = os.cpu_count()
+    partitions = max(min(partitions, len(batches)), 1)
+    args = (values,)
+    kwargs = dict(
+        priors=priors,
+        fit_rows=fit_rows,
+        infection_range=(low, high),
+        slope_range=(slope_low, slope_high),
+    )
+
+    if partitions == 1:
+        histograms = [simulate_batches(*args, batches, **kwargs)]
+    else:
+        with create_executor(partitions) as executor:
+            futures = [
+                executor.submit(
+                    simulate_batches, *args, batches[i::partitions], **kwargs
+                )
+                for i in range(partitions)
+            ]
+            histograms = [future.result() for future in futures]
+
+    infection_histogram, slope_histogram = histograms[0]
+    for infection_part, slope_part in histograms[1:]:
+        infection_histogram.merge(infection_part)
+        slope_histogram.merge(slope_part)
+
+    columns = [f"{percentile:g}%" for percentile in percentiles]
+    infections = pd.DataFrame(
+        10 ** infection_histogram.quantiles(percentiles).T - 1,
+        index=index,
+        columns=columns,
+    )
+    infections = infections.loc[
+        infections.first_valid_index() : infections.last_valid_index()
+    ]
+    slopes = pd.DataFrame(
+        slope_histogram.quantiles(percentiles).T,
+        index=pd.Index([f"{start} to {end}" for start, end in fits], name="fit"),
+        columns=columns,
+    )
+
+    return MonteCarloBands(infections, slopes, n_draws)
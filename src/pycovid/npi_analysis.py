@@ -0,0 +1,141 @@
+"""
+npi_analysis.py
+
+Compare the growth of deaths before and after every policy change of every country.
+
+OxCGRT policy events (`government_response.policy_events`) are joined to per-country death series from Our World In
+Data on ISO 3166 alpha-3 country code (OxCGRT "CountryCode", OWID "iso_code"). Deaths lag the infections a policy acts
+on, so the windows either side of a policy change are shifted later by INFECTION_TO_DEATH_DAYS. Every window of every
+event is fitted with one batched regression of log10 deaths; countries are partitioned across a process pool.
+"""
+
+import os
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from pycovid.data_utils import batched_linregress
+from pycovid.data_utils.ons import INFECTION_TO_DEATH_DAYS
+from pycovid.data_utils.owid_dataset import read_owid_dataset
+from pycovid.prefetch import create_executor
+from pycovid.shared_store import SharedFrameHandle, attach, share
+
+WINDOW_DAYS = 21  # days fitted either side of a policy change
+MIN_POINTS = 14  # fewest days with deaths for a fit
+
+
+def owid_deaths(
+    dataset: str = "owid", metric: str = "new_deaths_smoothed_per_million"
+) -> pd.DataFrame:
+    """
+    Read a death metric of every country from the OWID Parquet dataset.
+
+    :return: a daily dataframe, one column per country ISO code (OWID aggregates such as "OWID_WRL" included)
+    """
+    df = read_owid_dataset(dataset, columns=["iso_code", metric]).reset_index()
+    df["iso_code"] = df["iso_code"].astype(str)
+
+    return df.pivot_table(index="date", columns="iso_code", values=metric).asfreq("D")
+
+
+def growth_rates(
+    deaths: pd.DataFrame,
+    events: pd.DataFrame,
+    window: int = WINDOW_DAYS,
+    lag: int = INFECTION_TO_DEATH_DAYS,
+    min_points: int = MIN_POINTS,
+) -> pd.DataFrame:
+    """
+    Fit the log10 growth of deaths in the windows before and after each policy event.
+
+    :param deaths: Daily deaths, one column per country code
+    :param events: Policy events from `policy_events`
+    :param window: Days fitted either side of each event
+    :param lag: Days from a policy change to its effect on deaths
+    :param min_points: Fewest days with deaths for a fit (fewer gives NaN)
+    :return: the events with columns "slope before", "slope after" (log10 per day) and "slope change"
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.log10(deaths.to_numpy(dtype=float))
+    values[~np.isfinite(values)] = np.nan
+
+    # (event x day) windows of log deaths: [-window, window) days around the lagged event
+    days = (events["date"] - deaths.index[0]).dt.days.to_numpy() + lag
+    cols = deaths.columns.get_indexer(events["country"].astype(str))
+    rows = days[:, None] + np.arange(-window, window)[None, :]
+    cols = np.broadcast_to(cols[:, None], rows.shape)
+    inside = (rows >= 0) & (rows < len(values)) & (cols >= 0)
+    y = np.full(rows.shape, np.nan)
+    y[inside] = values[rows[inside], cols[inside]]
+
+    slopes = []
+    for part in (y[:, :window], y[:, window:]):
+        slope, _ = batched_linregress(part)
+        slope[np.isfinite(part).sum(axis=1) < min_points] = np.nan
+        slopes.append(slope)
+
+    result = events.reset_index(drop=True)
+    result["slope before"] = slopes[0]
+    result["slope after"] = slopes[1]
+    result["slope change"] = slopes[1] - slopes[0]
+
+    return result
+
+
+def _shared_growth_rates(
+    handle: SharedFrameHandle, countries: List[str], events: pd.DataFrame, **kwargs
+) -> pd.DataFrame:
+    return growth_rates(attach(handle)[countries], events, **kwargs)
+
+
+def npi_growth_rates(
+    deaths: pd.DataFrame,
+    events: pd.DataFrame,
+    window: int = WINDOW_DAYS,
+    lag: int = INFECTION_TO_DEATH_DAYS,
+    min_points: int = MIN_POINTS,
+    partitions: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Fit growth before and after every policy event of every country with deaths data, partitioned by country.
+
+    :param deaths: Daily deaths, one column per country code (e.g. from `owid_deaths`)
+    :param events: Policy events from `policy_events`
+    :param window: Days fitted either side of each event
+    :param lag: Days from a policy change to its effect on deaths
+    :param min_points: Fewest days with deaths for a fit
+    :param partitions: Number of country partitions, each fitted in its own process (default: one per CPU). With one
+        partition the work is done in this process.
+    :return: a single table of events with slopes before and after, ordered by country, date and indicator
+    """
+    deaths = deaths.asfreq("D")
+    events = events[events["country"].astype(str).isin(deaths.columns)]
+    countries = events["country"].astype(str).unique()
+    if partitions is None:
+        partitions = os.cpu_count()
+    partitions = max(min(partitions, len(countries)), 1)
+
+    jobs = []
+    for part in np.array_split(countries, partitions):
+        selected = events["country"].astype(str).isin(part)
+        jobs.append((list(part), events[selected]))
+    kwargs = dict(window=window, lag=lag, min_points=min_points)
+
+    if partitions == 1:
+        results = [
+            growth_rates(deaths[part], selected, **kwargs) for part, selected in jobs
+        ]
+    else:
+        with share(deaths) as shared, create_executor(partitions) as executor:
+            futures = [
+                executor.submit(_shared_growth_rates, shared.handle, *job, **kwargs)
+                for job in jobs
+            ]
+            results = [future.result() for future in futures]
+
+    result = pd.concat(results, ignore_index=True)
+    result["country"] = result["country"].astype(events["country"].dtype)
+
+    return result.sort_values(
+        ["country", "date", "indicator"], kind="stable"
+    ).reset_index(drop=True)
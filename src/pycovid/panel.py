@@ -0,0 +1,198 @@
+"""
+panel.py
+
+A daily panel of aligned timeseries from several data sources.
+
+The panel owns a single daily calendar and stores every series as a column of one preallocated 2D float array.
+Sources are aligned once, on insert, by integer day offset, so date lookups are O(1) arithmetic and date slices are
+zero-copy views of the same array. Columns come back as pandas series that share the panel's memory, so chart and
+fit code written for dataframes (`create_figure`, `polyfit`) consume a panel directly.
+"""
+
+from typing import Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+DAY = pd.Timedelta(days=1).value  # nanoseconds
+INITIAL_CAPACITY = 8
+
+
+class Panel:
+    """Daily timeseries from several sources, aligned on one calendar in one float array."""
+
+    def __init__(self, start: str, end: str, capacity: int = INITIAL_CAPACITY):
+        self.index = pd.date_range(pd.Timestamp(start).normalize(), end, freq="D")
+        self._values = np.full((len(self.index), max(capacity, 1)), np.nan)
+        self._names: List[str] = []
+        self._positions = {}
+        self._is_view = False
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> "Panel":
+        """Create a panel covering df's dates (or start to end) holding all of df's columns."""
+        panel = cls(
+            start if start is not None else df.index.min(),
+            end if end is not None else df.index.max(),
+            capacity=len(df.columns),
+        )
+        panel.insert_frame(df)
+        return panel
+
+    # columns ######################################################################
+
+    @property
+    def columns(self) -> pd.Index:
+        return pd.Index(self._names)
+
+    @property
+    def values(self) -> np.ndarray:
+        """The (date x column) array: a view, not a copy."""
+        return self._values[:, : len(self._names)]
+
+    def insert(self, name: str, data: Union[pd.Series, pd.DataFrame]):
+        """
+        Align a daily series with the panel calendar and store it as a column, replacing any column of the same name.
+
+        Dates outside the panel calendar are dropped; panel dates missing from the series are NaN.
+
+        :param name: The column name
+        :param data: A series (or single column dataframe) with a DatetimeIndex
+        """
+        if isinstance(data, pd.DataFrame):
+            if len(data.columns) != 1:
+                raise AttributeError(
+                    f"expected a single column: got {list(data.columns)}"
+                )
+            data = data.iloc[:, 0]
+        if self._is_view:
+            raise AttributeError(
+                "cannot insert into a view: insert into the full panel"
+            )
+
+        if name in self._positions:
+            col = self._positions[name]
+        else:
+            col = len(self._names)
+            if col == self._values.shape[1]:
+                self._grow()
+            self._names.append(name)
+            self._positions[name] = col
+
+        rows = self.rows(data.index)
+        inside = (rows >= 0) & (rows < len(self.index))
+        self._values[:, col] = np.nan
+        self._values[rows[inside], col] = data.to_numpy(dtype=float)[inside]
+
+    def insert_frame(self, df: pd.DataFrame):
+        """Insert every column of df."""
+        for name in df.columns:
+            self.insert(name, df[name])
+
+    def _grow(self):
+        """Double the column capacity, amortising the copy over many inserts."""
+        values = np.full((len(self.index), 2 * self._values.shape[1]), np.nan)
+        values[:, : self._values.shape[1]] = self._values
+        self._values = values
+
+    # dates ########################################################################
+
+    def row(self, date) -> int:
+        """Return the row of a date in O(1)."""
+        row = (pd.Timestamp(date).value - self.index[0].value) // DAY
+        if not 0 <= row < len(self.index):
+            raise KeyError(date)
+        return int(row)
+
+    def rows(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """Return the rows of many dates (which may fall outside the panel)."""
+        return (pd.DatetimeIndex(dates).normalize().asi8 - self.index[0].value) // DAY
+
+    def slice(self, start=None, end=None) -> "Panel":
+        """
+        Return a zero-copy view of the panel from start to end inclusive.
+
+        As with `DataFrame.loc`, dates outside the panel select nothing: the view is empty if the range misses it.
+        """
+        n = len(self.index)
+        first = 0 if start is None else min(max(self._offset(start), 0), n)
+        stop = n if end is None else min(max(self._offset(end) + 1, first), n)
+
+        view = Panel.__new__(Panel)
+        view.index = self.index[first:stop]
+        view._values = self._values[first:stop]
+        view._names = list(self._names)
+        view._positions = dict(self._positions)
+        view._is_view = True
+        return view
+
+    def _offset(self, date) -> int:
+        """The row a date would have, whether or not it is in the panel."""
+        return int((pd.Timestamp(date).value - self.index[0].value) // DAY)
+
+    @property
+    def loc(self) -> "_PanelLoc":
+        """Date slicing in the style of `DataFrame.loc`, e.g. `panel.loc["1 Jan 2020":"31 Jul 2020"]`."""
+        return _PanelLoc(self)
+
+    # access #######################################################################
+
+    def __getitem__(self, key):
+        """
+        panel["name"] returns a series sharing the panel's memory, panel[["a", "b"]] a dataframe and
+        panel[start:end] a zero-copy view.
+        """
+        if isinstance(key, slice):
+            return self.slice(key.start, key.stop)
+        if isinstance(key, list):
+            return pd.DataFrame(
+                {name: self[name] for name in key}, index=self.index, copy=False
+            )
+        if key not in self._positions:
+            raise KeyError(key)
+        return pd.Series(
+            self._values[:, self._positions[key]],
+            index=self.index,
+            name=key,
+            copy=False,
+        )
+
+    def __setitem__(self, name: str, data: Union[pd.Series, pd.DataFrame]):
+        self.insert(name, data)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._positions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._names))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the panel as a dataframe backed by the panel's array."""
+        return pd.DataFrame(
+            self.values, index=self.index, columns=self.columns, copy=False
+        )
+
+
+class _PanelLoc:
+    def __init__(self, panel: Panel):
+        self._panel = panel
+
+    def __getitem__(self, key):
+        """panel.loc[date] returns the date's row as a series, as DataFrame.loc; panel.loc[start:end] a view."""
+        if not isinstance(key, slice):
+            row = self._panel.row(key)
+            return pd.Series(
+                self._panel.values[row],
+                index=self._panel.columns,
+                name=self._panel.index[row],
+                copy=False,
+            )
+        return self._panel.slice(key.start, key.stop)
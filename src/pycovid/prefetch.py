@@ -0,0 +1,57 @@
+"""
+prefetch.py
+
+Utilities for loading independent data sources concurrently.
+
+Each loader is an independent, mostly CPU-bound Excel or CSV parse, so by default calls are submitted to a process
+pool: total load time then approaches the cost of the slowest single load rather than the sum of all of them.
+"""
+
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+
+@dataclass
+class LoaderCall:
+    """Class for holding a deferred call to a data loader."""
+
+    loader: Callable
+    kwargs: dict = field(default_factory=dict)
+
+
+def create_executor(n_calls: int, processes: bool = True) -> Executor:
+    """Create a pool sized for n_calls concurrent loads."""
+    if processes:
+        return ProcessPoolExecutor(max_workers=max(min(n_calls, os.cpu_count()), 1))
+    return ThreadPoolExecutor(max_workers=max(n_calls, 1))
+
+
+def prefetch(
+    calls: Dict[str, LoaderCall],
+    processes: bool = True,
+    executor: Optional[Executor] = None,
+) -> Dict[str, Future]:
+    """
+    Start every loader call at once and return futures to join on when the data is needed.
+
+    :param calls: Loader calls by name. Loaders must be picklable (module level functions) when processes is True.
+    :param processes: Use a process pool (default) or a thread pool
+    :param executor: An existing executor to submit to; it is left running
+    :return: a future for each named call, resolving to the loader's result
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = create_executor(len(calls), processes)
+
+    futures = {
+        name: executor.submit(call.loader, **call.kwargs)
+        for name, call in calls.items()
+    }
+
+    if own_executor:
+        # workers finish the submitted calls, then exit
+        executor.shutdown(wait=False)
+
+    return futures
@@ -0,0 +1,167 @@
+"""
+pyramid.py
+
+Daily timeseries pre-aggregated to coarser resolutions: ISO week, calendar month and season.
+
+Every level is computed once, when the pyramid is built, by a bincount over integer period codes for all columns at
+once. Levels are keyed on integers so they join directly with other sources at the same resolution: ISO weeks are
+keyed ["Year", "ISOWeek"] (ISO year and week), exactly as the CMI loader keys weekly SMR, months ["Year", "Month"] and
+seasons "Season" (July to June, labelled by the starting year, as in `seasonal`).
+
+    weekly = pyramid("ons-registrations").at("W")
+    smr = read_CMI_SMR(filename, "weekly").loc[("Unisex", "20to100")].stack()
+    joined = weekly.join(smr.rename("SMR"), how="inner")
+
+`pyramid` keeps the MAX_PYRAMIDS most recently used pyramids; call `clear_pyramids()` to release them.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+from pycovid.catalog import catalog, freeze
+from pycovid.memory import get_memory_mode
+from pycovid.seasonal import season_codes
+
+RESOLUTIONS = ["D", "W", "M", "S"]  # daily, ISO week, month, season
+AGGREGATIONS = ["sum", "mean"]
+MAX_PYRAMIDS = 16  # pyramids kept by `pyramid`, least recently used first out
+
+
+def period_codes(index: pd.DatetimeIndex, resolution: str):
+    """
+    Code each date with the integer key of its period at a resolution.
+
+    :return: a tuple (keys, names, days): a list of integer key arrays (one per index level), the index level names,
+        and the number of calendar days in each date's period
+    """
+    if resolution == "W":
+        iso = index.isocalendar()
+        keys = [iso["year"].values.astype(int), iso["week"].values.astype(int)]
+        return keys, ["Year", "ISOWeek"], np.full(len(index), 7)
+    if resolution == "M":
+        keys = [index.year.values.astype(int), index.month.values.astype(int)]
+        return keys, ["Year", "Month"], index.days_in_month.values
+    if resolution == "S":
+        season, _, _ = season_codes(index, freq="M")
+        # a season includes the February of the following year
+        year = season + 1
+        leap = ((year % 4 == 0) & (year % 100 != 0)) | (year % 400 == 0)
+        return [season.astype(int)], ["Season"], 365 + leap
+    raise AttributeError(f"resolution not in {RESOLUTIONS[1:]}: got {resolution}")
+
+
+class Pyramid:
+    """A daily timeseries with every coarser resolution precomputed."""
+
+    def __init__(self, df: Union[pd.DataFrame, pd.Series], how: str = "sum"):
+        """
+        Build every level of the pyramid.
+
+        :param df: Daily data, one column per series
+        :param how: "sum" (e.g. deaths) or "mean" (e.g. rates) of the days in each period; missing days are skipped
+        """
+        if how not in AGGREGATIONS:
+            raise AttributeError(f"how not in {AGGREGATIONS}: got {how}")
+        df = df.to_frame() if isinstance(df, pd.Series) else df
+        df = df.sort_index().asfreq("D")
+        df.index.name = "Date"
+
+        self.how = how
+        self._levels: Dict[str, pd.DataFrame] = {"D": df}
+        self._complete: Dict[str, np.ndarray] = {"D": np.ones(len(df), dtype=bool)}
+
+        values = df.to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        n_cols = values.shape[1]
+
+        for resolution in RESOLUTIONS[1:]:
+            keys, names, period_days = period_codes(df.index, resolution)
+            # dates are sorted, so periods are contiguous runs of equal keys
+            change = np.zeros(len(df), dtype=bool)
+            change[:1] = True
+            for key in keys:
+                change[1:] |= key[1:] != key[:-1]
+            codes = np.cumsum(change) - 1
+            starts = np.flatnonzero(change)
+            n_periods = len(starts)
+
+            # one bincount over (period, column) cells for all columns
+            cells = (codes[:, None] * n_cols + np.arange(n_cols)).ravel()
+            size = n_periods * n_cols
+            totals = np.bincount(cells, filled.ravel(), size).reshape(n_periods, n_cols)
+            counts = np.bincount(cells, valid.ravel(), size).reshape(n_periods, n_cols)
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                aggregated = totals / counts if how == "mean" else totals
+            aggregated[counts == 0] = np.nan
+
+            index = pd.MultiIndex.from_arrays(
+                [key[starts] for key in keys], names=names
+            )
+            if len(names) == 1:
+                index = index.get_level_values(0)
+            self._levels[resolution] = pd.DataFrame(
+                aggregated, index=index, columns=df.columns
+            )
+            self._complete[resolution] = np.bincount(codes) == period_days[starts]
+
+    def at(self, resolution: str, complete: bool = False) -> pd.DataFrame:
+        """
+        Return the data at a resolution.
+
+        :param resolution: One of RESOLUTIONS: "D" (daily), "W" (ISO week), "M" (month) or "S" (season)
+        :param complete: Drop periods not entirely covered by the daily data (e.g. the part weeks at either end)
+        :return: a dataframe, one column per series
+        """
+        if resolution not in RESOLUTIONS:
+            raise AttributeError(f"resolution not in {RESOLUTIONS}: got {resolution}")
+        df = self._levels[resolution]
+        if complete:
+            df = df[self._complete[resolution]]
+
+        return df.copy()
+
+
+_pyramids: "OrderedDict[tuple, Pyramid]" = OrderedDict()
+_pyramids_lock = threading.Lock()
+
+
+def pyramid(
+    name: str, version: Optional[str] = None, how: str = "sum", **params
+) -> Pyramid:
+    """
+    Get the pyramid of a daily catalog source, building it on first access.
+
+    A pyramid is rebuilt if the source has been registered again or the memory mode has changed since it was built.
+
+    :param name: The catalog source name
+    :param version: The data release (default: latest registered)
+    :param how: "sum" or "mean"
+    :param params: Keyword arguments passed to the loader
+    :return: the pyramid
+    """
+    source = catalog.source(name, version)
+    token = (source.version, source.registration, get_memory_mode())
+    key = (source.name, token, freeze({**source.defaults, **params}), how)
+    with _pyramids_lock:
+        if key in _pyramids:
+            _pyramids.move_to_end(key)
+            return _pyramids[key]
+
+    built = Pyramid(catalog.get(name, source.version, **params), how)
+    with _pyramids_lock:
+        _pyramids[key] = built
+        while len(_pyramids) > MAX_PYRAMIDS:
+            _pyramids.popitem(last=False)
+
+    return built
+
+
+def clear_pyramids():
+    """Drop every pyramid built by `pyramid`."""
+    with _pyramids_lock:
+        _pyramids.clear()
@@ -0,0 +1,238 @@
+"""
+seasonal.py
+
+Seasonal profiles of COVID-19 data compared with reference seasonal curves.
+
+A season runs from July to June (the northern temperate winter respiratory infection cycle) and is labelled by the year
+it starts in. A profile is the share (%) of a season's total falling in each month or ISO week of that season.
+Profiles are computed for every season and every column of a daily dataframe in a single groupby.
+"""
+
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+SEASON_START_MONTH = 7
+SEASON_START_WEEK = 27  # first ISO week of July
+WEEKS = 53
+METRICS = ["l1", "rmse", "jensen-shannon", "correlation"]
+
+# Hope-Simpson, R.E. (1981) The role of season in the epidemiology of influenza, fig. 2: world epidemic influenza
+# 1964-1975 (Northern Temperate Zone), monthly % of the season total
+HOPE_SIMPSON = {
+    7: 0,
+    8: 0,
+    9: 4.1,
+    10: 2.2,
+    11: 4.2,
+    12: 13.8,
+    1: 35.6,
+    2: 19.1,
+    3: 16.8,
+    4: 4.2,
+    5: 0,
+    6: 0,
+}
+
+
+def season_codes(index: pd.DatetimeIndex, freq: str = "M"):
+    """
+    Compute integer season, period and in-season position codes for a daily index.
+
+    :param index: The dates to code
+    :param freq: "M" for calendar months, "W" for ISO weeks
+    :return: a tuple of arrays (season, period, position): period is the month or ISO week number, position its
+        order within the season
+    """
+    if freq == "M":
+        year = index.year.values
+        period = index.month.values
+        start, n_periods = SEASON_START_MONTH, 12
+    elif freq == "W":
+        iso = index.isocalendar()
+        year = iso["year"].values.astype(int)
+        period = iso["week"].values.astype(int)
+        start, n_periods = SEASON_START_WEEK, WEEKS
+    else:
+        raise AttributeError(f"freq not in ['M', 'W']: got {freq}")
+
+    season = year - (period < start)
+    position = (period - start) % n_periods
+
+    return season, period, position
+
+
+def period_labels(freq: str = "M") -> np.ndarray:
+    """Return the month or ISO week numbers of a season, in season order."""
+    if freq == "M":
+        return (np.arange(12) + SEASON_START_MONTH - 1) % 12 + 1
+    return (np.arange(WEEKS) + SEASON_START_WEEK - 1) % WEEKS + 1
+
+
+def season_profiles(
+    df: Union[pd.DataFrame, pd.Series], freq: str = "M"
+) -> pd.DataFrame:
+    """
+    Compute share-of-season profiles for every season and column of a daily timeseries.
+
+    Periods with no data are NaN. The shares of a season in progress are of the season-to-date total.
+
+    :param df: Daily data, one column per region
+    :param freq: "M" for monthly profiles, "W" for ISO week profiles
+    :return: a dataframe of % shares, index ["Season", "Month" | "ISOWeek"] in season order, one column per region
+    """
+    df = df.to_frame() if isinstance(df, pd.Series) else df
+    season, _, position = season_codes(df.index, freq)
+
+    totals = df.groupby([season, position]).sum(min_count=1)
+    shares = totals / totals.groupby(level=0).transform("sum") * 100
+
+    # complete the grid so that every season has every period, in order
+    labels = period_labels(freq)
+    seasons = np.unique(season)
+    grid = pd.MultiIndex.from_product([seasons, np.arange(len(labels))])
+    shares = shares.reindex(grid)
+    shares.index = pd.MultiIndex.from_arrays(
+        [grid.get_level_values(0), labels[grid.get_level_values(1)]],
+        names=["Season", "Month" if freq == "M" else "ISOWeek"],
+    )
+
+    return shares
+
+
+def reference_profile(
+    monthly_shares: Dict[int, float] = HOPE_SIMPSON, freq: str = "M", season: int = 2020
+) -> pd.Series:
+    """
+    Construct a reference profile from monthly % shares, e.g. Hope-Simpson.
+
+    Weekly profiles spread each month's share uniformly over its days and sum the days into ISO weeks.
+
+    :param monthly_shares: % of the season total by month number
+    :param freq: "M" for a monthly profile, "W" for an ISO week profile
+    :param season: The season whose calendar is used to construct weeks
+    :return: a series of % shares indexed on period number, in season order
+    """
+    if freq == "M":
+        labels = period_labels(freq)
+        return pd.Series(
+            [monthly_shares[month] for month in labels],
+            index=pd.Index(labels, name="Month"),
+        )
+
+    days = pd.date_range(f"1 Jul {season}", f"30 Jun {season + 1}")
+    shares = np.array([monthly_shares[month] for month in range(1, 13)], dtype=float)
+    daily = shares[days.month - 1] / days.days_in_month.values
+
+    profile = season_profiles(pd.Series(daily, index=days), freq="W").iloc[:, 0]
+    profile = profile.loc[season] * shares.sum() / 100
+
+    return profile
+
+
+def profile_distance(
+    profiles: pd.DataFrame, reference: pd.Series, metric: str = "l1"
+) -> pd.DataFrame:
+    """
+    Compute the distance between every season and region profile and a reference profile.
+
+    Only periods present in both profiles are compared.
+
+    :param profiles: % shares from `season_profiles`
+    :param reference: % shares from `reference_profile` at the same frequency
+    :param metric: One of METRICS: "l1" (sum of absolute differences, percentage points), "rmse" (percentage points),
+        "jensen-shannon" (divergence in bits, 0 to 1), "correlation" (1 - Pearson's r)
+    :return: a dataframe of distances, index "Season", one column per region
+    """
+    if metric not in METRICS:
+        raise AttributeError(f"metric not in {METRICS}: got {metric}")
+
+    p = profiles.values
+    r = np.broadcast_to(
+        reference.reindex(profiles.index.get_level_values(1)).values[:, None], p.shape
+    )
+    valid = ~np.isnan(p) & ~np.isnan(r)
+    p = np.where(valid, p, 0)
+    r = np.where(valid, r, 0)
+    seasons = profiles.index.get_level_values(0)
+
+    def per_season(values: np.ndarray) -> pd.DataFrame:
+        return (
+            pd.DataFrame(values, columns=profiles.columns).groupby(seasons.values).sum()
+        )
+
+    n = per_season(valid)
+
+    if metric == "l1":
+        distance = per_season(np.abs(p - r))
+    elif metric == "rmse":
+        distance = np.sqrt(per_season((p - r) ** 2) / n)
+    elif metric == "jensen-shannon":
+        p = p / per_season(p).reindex(seasons).values
+        r = r / per_season(r).reindex(seasons).values
+        m = (p + r) / 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            kl_p = np.where(p > 0, p * np.log2(p / m), 0)
+            kl_r = np.where(r > 0, r * np.log2(r / m), 0)
+        distance = per_season((kl_p + kl_r) / 2)
+    else:
+        mean_p = (per_season(p) / n).reindex(seasons).values
+        mean_r = (per_season(r) / n).reindex(seasons).values
+        dp = np.where(valid, p - mean_p, 0)
+        dr = np.where(valid, r - mean_r, 0)
+        cov = per_season(dp * dr)
+        distance = 1 - cov / np.sqrt(per_season(dp**2) * per_season(dr**2))
+
+    distance = distance.where(n > 0)
+    distance.index.name = "Season"
+
+    return distance
+
+
+class SeasonalProfiles:
+    """
+    Seasonal profiles cached by season.
+
+    Each update fingerprints the data of every season and recomputes only the seasons whose data changed, so adding a
+    new ONS week recomputes only the current season.
+    """
+
+    def __init__(self, freq: str = "M"):
+        self.freq = freq
+        self.recomputed = []  # seasons recomputed by the last update
+        self._fingerprints = {}
+        self._profiles = {}
+
+    def update(self, df: Union[pd.DataFrame, pd.Series]) -> pd.DataFrame:
+        """Bring the cached profiles up to date with df and return all of them."""
+        df = df.to_frame() if isinstance(df, pd.Series) else df
+        df = df.sort_index()
+        season, _, _ = season_codes(df.index, self.freq)
+
+        # per-season fingerprint: the wrapping sum of row hashes, the row count and the columns
+        hashes = pd.util.hash_pandas_object(df, index=True).values
+        seasons, starts, counts = np.unique(
+            season, return_index=True, return_counts=True
+        )
+        sums = np.add.reduceat(hashes, starts)
+        columns = tuple(df.columns)
+        fingerprints = {
+            s: (h, c, columns) for s, h, c in zip(seasons.tolist(), sums, counts)
+        }
+
+        changed = [s for s, f in fingerprints.items() if self._fingerprints.get(s) != f]
+        if changed:
+            profiles = season_profiles(df.loc[np.isin(season, changed)], self.freq)
+            for s in changed:
+                self._profiles[s] = profiles.loc[[s]]
+
+        self._fingerprints = fingerprints
+        self._profiles = {s: self._profiles[s] for s in fingerprints}
+        self.recomputed = changed
+
+        return self.profiles()
+
+    def profiles(self) -> pd.DataFrame:
+        """Return the cached profiles of every season."""
+        return pd.concat([self._profiles[s] for s in sorted(self._profiles)])
@@ -0,0 +1,294 @@
+"""
+seir.py
+
+An ensemble SEIR model of fatal infections, to test NPI counterfactuals against the fatal infection curve.
+
+Each parameter set is a susceptible-exposed-infectious-recovered model of one population whose transmission is
+piecewise constant: R0 until the first event, then R0 times the event's relative transmission until the next event.
+Modelled fatal infections are the day's new infections (S to E) times the infection fatality ratio, so they compare
+directly with the "infections" column of `prepare_fatal_infection_data`.
+
+A whole ensemble is integrated at once: the state is a (parameter set x compartment) array advanced by a fixed-step
+fourth-order Runge-Kutta scheme, STEPS_PER_DAY steps a day, with the transmission of every set looked up for the day.
+
+`fit_seir` fits the parameters by the cross-entropy method. Each round draws an ensemble (from the uniform priors in the
+first round, then from a normal around the previous round's best ELITE share, clipped to the priors), evaluates the
+log-likelihood of the observed fatal infections for every set, a batch of BATCH sets at a time across a process pool,
+and keeps the best. Observed log10 fatal infections are taken to be normal about the model's, with sd LOG_SD. The
+draws are made in the calling process, so fits are reproducible for a given seed whatever the number of processes.
+
+    events = [EventItem("2020-03-23", "Lockdown #1"), EventItem("2020-05-10", "Restrictions relaxed")]
+    fit = fit_seir(df["infections"].loc[:"30 Jun 2020"], events, seed=2020)
+
+    # the fitted transmission, had lockdown started a week earlier
+    earlier = [EventItem("2020-03-16", "Lockdown #1"), EventItem("2020-05-10", "Restrictions relaxed")]
+    counterfactual = seir_fatal_infections(fit.parameters, earlier, fit.infections.index)
+"""
+
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pycovid.events import EventItem
+from pycovid.prefetch import create_executor
+
+ENGLAND_POPULATION = 56_550_138  # ONS mid-2020 estimate
+STEPS_PER_DAY = 4
+BATCH = 512  # parameter sets integrated together
+ELITE = 0.1  # share of each round's ensemble kept
+LOG_SD = 0.1  # sd of observed log10 fatal infections about the model
+# followed by the relative transmission after each event
+PARAMETERS = ["r0", "log10 exposed", "ifr"]
+COMPARTMENTS = ["S", "E", "I", "R"]
+
+
+@dataclass
+class SEIRPriors:
+    """Class for holding the priors of a SEIR fit: uniform between (low, high), and the fixed parameters."""
+
+    r0: Tuple[float, float] = (1.5, 5.0)
+    log10_exposed: Tuple[float, float] = (0.0, 4.0)  # exposed on the first day
+    ifr: Tuple[float, float] = (0.001, 0.02)
+    transmission: Tuple[float, float] = (0.05, 1.5)  # relative to R0, after each event
+    latent_days: float = 4.0
+    infectious_days: float = 5.0
+    population: float = ENGLAND_POPULATION
+
+    def bounds(self, n_events: int) -> np.ndarray:
+        """The (low, high) of each parameter, shape (2, parameter)."""
+        return np.array(
+            [self.r0, self.log10_exposed, self.ifr] + [self.transmission] * n_events
+        ).T
+
+
+@dataclass
+class SEIRFit:
+    """Class for returning a SEIR fit."""
+
+    # the elite parameter sets of the last round, best first, with their "log likelihood"
+    parameters: pd.DataFrame
+    infections: pd.DataFrame  # "observed" and "fitted" (best set) fatal infections
+    rounds: int
+
+    @property
+    def best(self) -> pd.Series:
+        return self.parameters.iloc[0]
+
+
+def parameter_names(events: List[EventItem]) -> List[str]:
+    labels = [event.label for event in events]
+    if len(set(labels)) < len(labels):
+        raise AttributeError(f"event labels not distinct: got {labels}")
+    return PARAMETERS + labels
+
+
+def transmission_schedule(
+    values: np.ndarray, events: List[EventItem], index: pd.DatetimeIndex
+) -> np.ndarray:
+    """
+    Compute the reproduction number of every parameter set on every day.
+
+    :param values: Parameter sets, shape (set, parameter), columns as `parameter_names`
+    :param events: The events at which transmission changes, in the order of the parameter columns
+    :param index: The days
+    :return: an array of shape (day, set)
+    """
+    dates = pd.to_datetime([event.date for event in events])
+    order = np.argsort(dates, kind="stable")
+    # the segment of each day: 0 before the first event, else 1 + the event in force
+    segment = np.searchsorted(dates[order].to_numpy(), index.to_numpy(), side="right")
+    relative = np.hstack(
+        [np.ones((len(values), 1)), values[:, len(PARAMETERS) :][:, order]]
+    )
+    return (values[:, 0, None] * relative[:, segment]).T
+
+
+def derivatives(
+    state: np.ndarray,
+    beta: np.ndarray,
+    sigma: float,
+    gamma: float,
+    population: float,
+) -> np.ndarray:
+    s, e, i = state[:, 0], state[:, 1], state[:, 2]
+    infection = beta * s * i / population
+    return np.stack(
+        [-infection, infection - sigma * e, sigma * e - gamma * i, gamma * i], axis=1
+    )
+
+
+def integrate(
+    reproduction: np.ndarray,
+    exposed: np.ndarray,
+    priors: SEIRPriors = SEIRPriors(),
+    steps_per_day: int = STEPS_PER_DAY,
+) -> np.ndarray:
+    """
+    Integrate an ensemble of SEIR models.
+
+    :param reproduction: The reproduction number of every set on every day, shape (day, set)
+    :param exposed: The exposed of each set on the first day (everyone else is susceptible)
+    :param priors: The latent and infectious periods and the population
+    :param steps_per_day: Runge-Kutta steps a day
+    :return: new infections (S to E) of every set on every day, shape (day, set)
+    """
+    sigma, gamma = 1 / priors.latent_days, 1 / priors.infectious_days
+    dt = 1 / steps_per_day
+    state = np.zeros((reproduction.shape[1], len(COMPARTMENTS)))
+    state[:, 0] = priors.population - exposed
+    state[:, 1] = exposed
+
+    incidence = np.empty_like(reproduction)
+    for day, r in enumerate(reproduction):
+        args = (r * gamma, sigma, gamma, priors.population)
+        susceptible = state[:, 0].copy()
+        for _ in range(steps_per_day):
+            k1 = derivatives(state, *args)
+            k2 = derivatives(state + 0.5 * dt * k1, *args)
+            k3 = derivatives(state + 0.5 * dt * k2, *args)
+            k4 = derivatives(state + dt * k3, *args)
+            state = state + dt / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+        incidence[day] = susceptible - state[:, 0]
+
+    return incidence
+
+
+def simulate(
+    values: np.ndarray,
+    events: List[EventItem],
+    index: pd.DatetimeIndex,
+    priors: SEIRPriors = SEIRPriors(),
+) -> np.ndarray:
+    """Model the fatal infections of parameter sets (shape (set, parameter)): an array of shape (day, set)."""
+    reproduction = transmission_schedule(values, events, index)
+    incidence = integrate(reproduction, 10 ** values[:, 1], priors)
+    return incidence * values[:, 2]
+
+
+def log_likelihood(observed: np.ndarray, modelled: np.ndarray) -> np.ndarray:
+    """
+    The log-likelihood of observed fatal infections under each modelled curve.
+
+    :param observed: Fatal infections by day; days without a positive value are not counted
+    :param modelled: Fatal infections, shape (day, set)
+    :return: the log-likelihood of each set
+    """
+    valid = np.isfinite(observed) & (observed > 0)
+    with np.errstate(divide="ignore"):
+        residuals = np.log10(observed[valid, None]) - np.log10(modelled[valid])
+    # no modelled infections where some were observed
+    residuals[~np.isfinite(residuals)] = np.inf
+    normalisation = valid.sum() * np.log(LOG_SD * np.sqrt(2 * np.pi))
+    return -0.5 * (residuals**2).sum(axis=0) / LOG_SD**2 - normalisation
+
+
+def evaluate_batches(
+    observed: np.ndarray,
+    batches: List[np.ndarray],
+    events: List[EventItem],
+    index: pd.DatetimeIndex,
+    priors: SEIRPriors,
+) -> List[np.ndarray]:
+    """Evaluate the log-likelihood of batches of parameter sets: one array per batch."""
+    return [
+        log_likelihood(observed, simulate(values, events, index, priors))
+        for values in batches
+    ]
+
+
+def evaluate(
+    observed: np.ndarray,
+    values: np.ndarray,
+    events: List[EventItem],
+    index: pd.DatetimeIndex,
+    priors: SEIRPriors,
+    partitions: int,
+) -> np.ndarray:
+    """Evaluate the log-likelihood of every parameter set, in batches shared across processes."""
+    batches = [values[i : i + BATCH] for i in range(0, len(values), BATCH)]
+    partitions = max(min(partitions, len(batches)), 1)
+    args = (events, index, priors)
+
+    if partitions == 1:
+        return np.concatenate(evaluate_batches(observed, batches, *args))
+
+    with create_executor(partitions) as executor:
+        futures = [
+            executor.submit(evaluate_batches, observed, batches[i::partitions], *args)
+            for i in range(partitions)
+        ]
+        results = [future.result() for future in futures]
+    ordered = [results[i % partitions][i // partitions] for i in range(len(batches))]
+    return np.concatenate(ordered)
+
+
+def seir_fatal_infections(
+    parameters: pd.DataFrame,
+    events: List[EventItem],
+    index: pd.DatetimeIndex,
+    priors: SEIRPriors = SEIRPriors(),
+) -> pd.DataFrame:
+    """
+    Model the fatal infections of parameter sets, e.g. those of a fit under other event dates (a counterfactual).
+
+    :param parameters: Parameter sets, one row each, with a column for each of `PARAMETERS` and each event label
+    :param events: The events at which transmission changes
+    :param index: The days, the first being the day the exposed are seeded
+    :return: a dataframe of fatal infections, by date, one column per parameter set
+    """
+    values = parameters[parameter_names(events)].to_numpy(dtype=float)
+    return pd.DataFrame(
+        simulate(values, events, index, priors), index=index, columns=parameters.index
+    )
+
+
+def fit_seir(
+    infections: pd.Series,
+    events: List[EventItem],
+    priors: SEIRPriors = SEIRPriors(),
+    n_sets: int = 4096,
+    rounds: int = 8,
+    seed: Optional[int] = None,
+    partitions: Optional[int] = None,
+) -> SEIRFit:
+    """
+    Fit a SEIR model with piecewise transmission to fatal infections.
+
+    :param infections: Fatal infections, indexed by date; the model starts at the first value
+    :param events: The events at which transmission changes (distinct labels)
+    :param priors: The priors
+    :param n_sets: Parameter sets drawn each round
+    :param rounds: Cross-entropy rounds
+    :param seed: Seed for reproducible draws
+    :param partitions: Number of processes to share the evaluations (default: one per CPU)
+    :return: the fit
+    """
+    names = parameter_names(events)
+    infections = infections.loc[
+        infections.first_valid_index() : infections.last_valid_index()
+    ].asfreq("D")
+    index = infections.index
+    observed = infections.to_numpy(dtype=float)
+    low, high = priors.bounds(len(events))
+    n_elite = max(int(ELITE * n_sets), 2)
+    if partitions is None:
+        partitions = os.cpu_count()
+
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(low, high, (n_sets, len(names)))
+    for i in range(rounds):
+        if i > 0:
+            values = np.clip(rng.normal(mean, sd, (n_sets, len(names))), low, high)
+        scores = evaluate(observed, values, events, index, priors, partitions)
+        elite = np.argsort(-scores, kind="stable")[:n_elite]
+        mean = values[elite].mean(axis=0)
+        sd = np.maximum(values[elite].std(axis=0), 1e-3 * (high - low))
+
+    parameters = pd.DataFrame(values[elite], columns=names)
+    parameters["log likelihood"] = scores[elite]
+    fitted = simulate(values[elite[:1]], events, index, priors)[:, 0]
+    df = pd.DataFrame({"observed": observed, "fitted": fitted}, index=index)
+
+    return SEIRFit(parameters, df, rounds)
@@ -0,0 +1,211 @@
+"""
+server.py
+
+A long-running local data server that keeps parsed datasets in memory between script runs.
+
+The server owns a catalog, loads the configured sources once at startup, and answers requests over localhost HTTP:
+
+- GET /sources: the registered sources (JSON)
+- GET /stats: the catalog cache statistics (JSON)
+- POST /data: a date slice of a source (Arrow IPC stream)
+- POST /fit: a `polyfit` of one column of a source (Arrow IPC stream)
+- POST /render: a chart of a source (PNG)
+
+POST bodies are JSON: {"name": ..., "version": ..., "params": {...}, "start": ..., "end": ..., "columns": [...]}, plus
+"column" for fits and "chart", "title", "regions" and "events" for renders. A series source is sent as a single
+column table marked as a series in the Arrow schema metadata, and the client returns it as a series.
+
+Use `pycovid.client.connect` to talk to a running server, or start one with `python -m pycovid serve`.
+"""
+
+import io
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple, Union
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pycovid.catalog import Catalog, catalog as default_catalog
+from pycovid.chart_utils import (
+    create_figure,
+    create_small_multiples,
+    EventItem,
+    RegionItem,
+)
+from pycovid.client import DEFAULT_PORT, HOST, KIND
+from pycovid.data_utils import polyfit
+
+CHARTS = ["figure", "small-multiples"]
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def to_arrow(data: Union[pd.DataFrame, pd.Series]) -> bytes:
+    """Serialise a dataframe or series (with its index) as an Arrow IPC stream."""
+    if isinstance(data, pd.Series):
+        table = pa.Table.from_pandas(data.to_frame(), preserve_index=True)
+        table = table.replace_schema_metadata(
+            {**table.schema.metadata, KIND: b"series"}
+        )
+    else:
+        table = pa.Table.from_pandas(data, preserve_index=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class DataServer(ThreadingHTTPServer):
+    """An HTTP server answering data, fit and render requests from an in-memory catalog."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = HOST,
+        port: int = DEFAULT_PORT,
+        catalog: Optional[Catalog] = None,
+    ):
+        super().__init__((host, port), DataRequestHandler)
+        self.catalog = catalog if catalog is not None else default_catalog
+        # pyplot keeps global state: render one chart at a time
+        self.render_lock = threading.Lock()
+
+    def preload(self, sources: Optional[List[Tuple[str, Optional[str]]]] = None):
+        """
+        Load sources into the catalog, reporting (not raising) sources that fail to load.
+
+        :param sources: (name, version) pairs (default: the latest version of every source)
+        """
+        if sources is None:
+            names = dict.fromkeys(source.name for source in self.catalog.sources())
+            sources = [(name, None) for name in names]
+
+        futures = self.catalog.prefetch(
+            {
+                f"{name}@{version}": (name, {"version": version})
+                for name, version in sources
+            }
+        )
+        for label, future in futures.items():
+            try:
+                future.result()
+                print(f"loaded {label}", file=sys.stderr)
+            except Exception as error:  # a missing data file must not stop the server
+                print(f"could not load {label}: {error!r}", file=sys.stderr)
+
+    # requests #####################################################################
+
+    def data(self, request: dict) -> Union[pd.DataFrame, pd.Series]:
+        """Get the requested slice of a source: a series if the source is a series and no columns are requested."""
+        data = self.catalog.get(
+            request["name"], request.get("version"), **request.get("params", {})
+        )
+        if "start" in request or "end" in request:
+            data = data.loc[request.get("start") : request.get("end")]
+        if "columns" in request:
+            data = data.to_frame() if isinstance(data, pd.Series) else data
+            data = data[request["columns"]]
+        return data
+
+    def frame(self, request: dict) -> pd.DataFrame:
+        """Get the requested slice of a source as a dataframe."""
+        data = self.data(request)
+        return data.to_frame() if isinstance(data, pd.Series) else data
+
+    def fit(self, request: dict) -> pd.DataFrame:
+        """Fit log10 of one column of a source between start and end."""
+        series = self.frame({**request, "start": None, "end": None})[request["column"]]
+        with np.errstate(divide="ignore"):
+            log_series = np.log10(series)
+        log_fit, fit = polyfit(log_series, request["start"], request["end"])
+        return pd.concat([log_fit[0].rename("log fit"), fit[0].rename("fit")], axis=1)
+
+    def render(self, request: dict) -> bytes:
+        """Render a chart of a source as PNG."""
+        chart = request.get("chart", "figure")
+        if chart not in CHARTS:
+            raise AttributeError(f"chart not in {CHARTS}: got {chart}")
+        df = self.frame(request)
+        regions = [RegionItem(*region) for region in request.get("regions", [])]
+        events = [EventItem(*event) for event in request.get("events", [])]
+
+        with self.render_lock:
+            if chart == "figure":
+                fig, _ = create_figure(
+                    request.get("title", ""), df, regions=regions, events=events
+                )
+            else:
+                fig, _ = create_small_multiples(
+                    request.get("title", ""), df, regions=regions, events=events
+                )
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png")
+            plt.close(fig)
+
+        return buffer.getvalue()
+
+
+class DataRequestHandler(BaseHTTPRequestHandler):
+    server: DataServer
+
+    def do_GET(self):
+        if self.path == "/sources":
+            sources = [[s.name, s.version] for s in self.server.catalog.sources()]
+            self._reply(200, "application/json", json.dumps(sources).encode())
+        elif self.path == "/stats":
+            stats = self.server.catalog.stats().__dict__
+            self._reply(200, "application/json", json.dumps(stats).encode())
+        else:
+            self._reply(404, "text/plain", f"not found: {self.path}".encode())
+
+    def do_POST(self):
+        routes = {
+            "/data": lambda request: (
+                ARROW_STREAM,
+                to_arrow(self.server.data(request)),
+            ),
+            "/fit": lambda request: (ARROW_STREAM, to_arrow(self.server.fit(request))),
+            "/render": lambda request: ("image/png", self.server.render(request)),
+        }
+        if self.path not in routes:
+            self._reply(404, "text/plain", f"not found: {self.path}".encode())
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            content_type, body = routes[self.path](request)
+        except (AttributeError, KeyError, ValueError) as error:
+            self._reply(400, "text/plain", repr(error).encode())
+            return
+        except Exception as error:
+            self._reply(500, "text/plain", repr(error).encode())
+            return
+        self._reply(200, content_type, body)
+
+    def _reply(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(
+    host: str = HOST,
+    port: int = DEFAULT_PORT,
+    sources: Optional[List[Tuple[str, Optional[str]]]] = None,
+):
+    """Preload sources and serve requests until interrupted."""
+    server = DataServer(host, port)
+    server.preload(sources)
+    print(f"serving on http://{host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
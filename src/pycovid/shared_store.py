@@ -0,0 +1,229 @@
+"""
+shared_store.py
+
+Derived series stored as raw arrays that any number of processes can read with no copy and no deserialisation.
+
+A series or dataframe is split into its values, one homogeneous 2D array, and a small JSON sidecar describing its
+index, columns and dtype. The values live either
+
+- on disk, as a .npy file opened with `np.memmap` (`SharedStore`): the OS page cache shares the pages between every
+  process reading them, across sessions; or
+- in memory, in a `multiprocessing.shared_memory` block (`share`): for handing data to a process pool without pickling
+  it. Only the small `SharedFrameHandle` is sent to the workers, which `attach` to the block.
+
+Either way the values are wrapped back into a pandas object that views the shared array. Shared values are read only.
+
+    store = SharedStore()
+    store.put("fatal-infections-england", prepare_fatal_infection_data(meta))
+
+    # in any process
+    df = store.get("fatal-infections-england")
+"""
+
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+from pycovid import CACHE_DIR
+
+STORE_DIR = CACHE_DIR / "store"
+
+Frame = Union[pd.DataFrame, pd.Series]
+
+
+# index and metadata sidecar ####
+
+
+def encode_index(index: pd.Index) -> dict:
+    """Describe an index as JSON: daily calendars by their start and length, other indexes by their values."""
+    if isinstance(index, pd.MultiIndex):
+        levels = [index.get_level_values(i) for i in range(index.nlevels)]
+        return {"kind": "multi", "levels": [encode_index(level) for level in levels]}
+    if isinstance(index, pd.DatetimeIndex):
+        if len(index) > 1 and index.freqstr == "D":
+            return {
+                "kind": "days",
+                "start": index[0].isoformat(),
+                "periods": len(index),
+                "name": index.name,
+            }
+        return {
+            "kind": "dates",
+            "values": [date.isoformat() for date in index],
+            "name": index.name,
+        }
+    return {"kind": "values", "values": index.tolist(), "name": index.name}
+
+
+def decode_index(meta: dict) -> pd.Index:
+    """Rebuild an index described by `encode_index`."""
+    if meta["kind"] == "multi":
+        return pd.MultiIndex.from_arrays(
+            [decode_index(level) for level in meta["levels"]]
+        )
+    if meta["kind"] == "days":
+        return pd.date_range(
+            meta["start"], periods=meta["periods"], freq="D", name=meta["name"]
+        )
+    if meta["kind"] == "dates":
+        return pd.DatetimeIndex(meta["values"], name=meta["name"])
+    return pd.Index(meta["values"], name=meta["name"])
+
+
+def split(data: Frame):
+    """
+    Split a series or dataframe into its values and metadata.
+
+    :return: a tuple (values, meta): a C-contiguous array (1D for a series, date x column for a dataframe) and the
+        JSON-serialisable metadata needed to `wrap` it
+    """
+    meta = {"index": encode_index(data.index)}
+    if isinstance(data, pd.Series):
+        meta.update(kind="series", name=data.name)
+    else:
+        if data.dtypes.nunique() > 1:
+            raise AttributeError(
+                f"columns must share one dtype: got {sorted(set(map(str, data.dtypes)))}"
+            )
+        meta.update(kind="frame", columns=encode_index(data.columns))
+
+    values = np.ascontiguousarray(data.to_numpy())
+    if values.dtype == object:
+        raise AttributeError("object columns cannot be shared: convert them first")
+    meta.update(dtype=values.dtype.str, shape=list(values.shape))
+
+    return values, meta
+
+
+def wrap(values: np.ndarray, meta: dict) -> Frame:
+    """Wrap shared values in the series or dataframe described by meta, without copying them."""
+    index = decode_index(meta["index"])
+    if meta["kind"] == "series":
+        return pd.Series(values, index=index, name=meta["name"], copy=False)
+    return pd.DataFrame(
+        values, index=index, columns=decode_index(meta["columns"]), copy=False
+    )
+
+
+# on-disk store ####
+
+
+class SharedStore:
+    """A directory of series stored as .npy arrays with JSON sidecars, read by memory mapping."""
+
+    def __init__(self, store_dir: Path = STORE_DIR):
+        self.store_dir = Path(store_dir)
+
+    def _paths(self, name: str):
+        return self.store_dir / f"{name}.npy", self.store_dir / f"{name}.json"
+
+    def put(self, name: str, data: Frame):
+        """Store a series or dataframe under a name, replacing any previous version."""
+        values, meta = split(data)
+        values_path, meta_path = self._paths(name)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+        # write then rename, so readers never open a partial file; the sidecar last, as it marks the entry complete
+        for path, write in [
+            (values_path, lambda f: np.save(f, values)),
+            (meta_path, lambda f: f.write(json.dumps(meta).encode())),
+        ]:
+            fd, tmp = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+
+    def get(self, name: str) -> Frame:
+        """Open a stored series or dataframe: its values are memory mapped and read only."""
+        values_path, meta_path = self._paths(name)
+        if not meta_path.exists():
+            raise KeyError(f"not in store: {name}")
+        meta = json.loads(meta_path.read_text())
+
+        return wrap(np.load(values_path, mmap_mode="r"), meta)
+
+    def names(self) -> List[str]:
+        return sorted(path.stem for path in self.store_dir.glob("*.json"))
+
+    def __contains__(self, name: str) -> bool:
+        return self._paths(name)[1].exists()
+
+    def delete(self, name: str):
+        for path in reversed(self._paths(name)):
+            path.unlink(missing_ok=True)
+
+
+# shared memory ####
+
+
+@dataclass
+class SharedFrameHandle:
+    """Class for passing a shared memory frame to another process."""
+
+    block: str
+    meta: dict
+
+
+class SharedFrame:
+    """
+    A series or dataframe copied once into a shared memory block, owned by this process.
+
+    Pass `handle` to child processes (e.g. `create_executor` pools) and `attach` to it there. Close the shared frame
+    (or use it as a context manager) once the children have finished, to free the block.
+    """
+
+    def __init__(self, data: Frame):
+        values, self.meta = split(data)
+        self._block = shared_memory.SharedMemory(
+            create=True, size=max(values.nbytes, 1)
+        )
+        shared = np.ndarray(values.shape, values.dtype, buffer=self._block.buf)
+        shared[...] = values
+        del shared
+        self.handle = SharedFrameHandle(self._block.name, self.meta)
+
+    def frame(self) -> Frame:
+        """The shared data, viewed (not copied) in this process."""
+        return attach(self.handle)
+
+    def close(self):
+        """Release the block: frames attached to it must no longer be used."""
+        _attached.pop(self._block.name, None)
+        try:
+            self._block.close()
+        except BufferError:
+            pass  # views are still alive in this process; the memory is freed when they are
+        self._block.unlink()
+
+    def __enter__(self) -> "SharedFrame":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def share(data: Frame) -> SharedFrame:
+    """Copy a series or dataframe into shared memory for child processes to `attach` to."""
+    return SharedFrame(data)
+
+
+# blocks attached by this process, kept open while their frames may be in use
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def attach(handle: SharedFrameHandle) -> Frame:
+    """Wrap a shared memory frame without copying it: the values are read only."""
+    block = _attached.get(handle.block)
+    if block is None:
+        block = _attached[handle.block] = shared_memory.SharedMemory(handle.block)
+    meta = handle.meta
+    values = np.ndarray(tuple(meta["shape"]), np.dtype(meta["dtype"]), block.buf)
+    values.flags.writeable = False
+
+    return wrap(values, meta)
@@ -0,0 +1,119 @@
+"""
+smoothing.py
+
+Smooth many daily series at once.
+
+Every smoother works on a 2D (date x series) array in one call: moving averages by cumulative sums (cost independent
+of the window) and triangular, Gaussian and exponential kernels by FFT convolution. Missing values are excluded by
+convolving a validity mask alongside the data, so edges are handled explicitly:
+
+- "shrink": the kernel is renormalised over the points available, so there are no NaNs at the edges of the data
+- "nan": NaN wherever the kernel does not fit entirely inside the data, as `rolling(window, center=True).mean()`
+
+Totals can be preserved by rescaling each smoothed series to the sum of the raw series.
+"""
+
+from typing import Union
+
+import numpy as np
+import pandas as pd
+from scipy.signal import fftconvolve
+
+KERNELS = ["moving-average", "triangular", "gaussian", "exponential"]
+EDGES = ["shrink", "nan"]
+
+Data = Union[np.ndarray, pd.Series, pd.DataFrame]
+
+
+def kernel_weights(kernel: str, window: int) -> np.ndarray:
+    """
+    Return the (unnormalised) weights of a centred kernel spanning `window` days.
+
+    The Gaussian has standard deviation window / 4; the exponential decays by a factor of e every window / 4 days.
+    """
+    if kernel not in KERNELS:
+        raise AttributeError(f"kernel not in {KERNELS}: got {kernel}")
+    if window < 1 or window % 2 == 0:
+        raise AttributeError(
+            f"window must be a positive odd number of days: got {window}"
+        )
+
+    half = window // 2
+    k = np.arange(-half, half + 1, dtype=float)
+    if kernel == "moving-average":
+        return np.ones(window)
+    if kernel == "triangular":
+        return half + 1 - np.abs(k)
+    if kernel == "gaussian":
+        return np.exp(-0.5 * (k / (window / 4)) ** 2)
+    return np.exp(-np.abs(k) / (window / 4))
+
+
+def smooth(
+    data: Data,
+    window: int = 7,
+    kernel: str = "moving-average",
+    edge: str = "shrink",
+    preserve_total: bool = True,
+) -> Data:
+    """
+    Smooth every series (column) of data with a centred kernel.
+
+    :param data: A 2D (date x series) array, a dataframe or a series
+    :param window: The kernel width in days (odd)
+    :param kernel: One of KERNELS
+    :param edge: One of EDGES: how to treat windows that extend past the data (or over missing values)
+    :param preserve_total: Rescale each smoothed series so that its sum equals the sum of the raw series
+    :return: smoothed data of the same type and shape. Missing input values stay missing.
+    """
+    if edge not in EDGES:
+        raise AttributeError(f"edge not in {EDGES}: got {edge}")
+    weights = kernel_weights(kernel, window)
+
+    values = np.asarray(data, dtype=float)
+    is_1d = values.ndim == 1
+    values = values.reshape(len(values), -1)
+
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+
+    if kernel == "moving-average":
+        numerator = window_sum(filled, window // 2)
+        denominator = window_sum(valid.astype(float), window // 2)
+    else:
+        numerator = convolve(filled, weights)
+        denominator = convolve(valid.astype(float), weights)
+
+    total = weights.sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        smoothed = numerator / denominator
+    if edge == "nan":
+        inside = denominator >= total * (1 - 1e-9)
+    else:
+        inside = denominator > total * 1e-9
+    smoothed[~(inside & valid)] = np.nan
+
+    if preserve_total:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            smoothed *= np.nansum(values, axis=0) / np.nansum(smoothed, axis=0)
+
+    if is_1d:
+        smoothed = smoothed[:, 0]
+    if isinstance(data, pd.Series):
+        return pd.Series(smoothed, index=data.index, name=data.name)
+    if isinstance(data, pd.DataFrame):
+        return pd.DataFrame(smoothed, index=data.index, columns=data.columns)
+    return smoothed
+
+
+def window_sum(values: np.ndarray, half: int) -> np.ndarray:
+    """Sum each centred window of 2 * half + 1 rows by differencing cumulative sums (zero beyond the edges)."""
+    cumulative = np.cumsum(np.pad(values, ((half + 1, half), (0, 0))), axis=0)
+    return cumulative[2 * half + 1 :] - cumulative[: -2 * half - 1]
+
+
+def convolve(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Convolve every column with a centred kernel by FFT (zero beyond the edges)."""
+    half = len(weights) // 2
+    full = fftconvolve(values, weights[:, None], mode="full", axes=0)
+    return full[half : half + len(values)]
@@ -0,0 +1,174 @@
+"""
+waves.py
+
+Detect epidemic waves in smoothed fatal infection series and compare their post-peak declines.
+
+Peaks and troughs are found for every region at once from sliding-window maxima and minima of the log series. Every
+post-peak decline is aligned to day 0 at its peak in a single (wave x day) array and all declines are fitted with one
+batched regression.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from pycovid.data_utils import batched_linregress
+
+# a turning point is the extreme value within WINDOW_DAYS either side, and at least MIN_DROP (log10) beyond the
+# extreme values on each side: 0.3 is a factor of 2
+WINDOW_DAYS = 42
+MIN_DROP = 0.3
+
+
+def find_turning_points(
+    df: pd.DataFrame, window: int = WINDOW_DAYS, min_drop: float = MIN_DROP
+) -> pd.DataFrame:
+    """
+    Find the peaks and troughs of every column of a smoothed daily series.
+
+    A peak is the largest value within `window` days either side that is at least `min_drop` (log10) above the
+    smallest value within the window on each side. Troughs are the converse. A turning point within `window` days of
+    the end of the data is not confirmed, so is not reported.
+
+    :param df: Smoothed daily data, one column per region
+    :param window: Days either side a turning point must dominate
+    :param min_drop: Minimum log10 change on each side of a turning point
+    :return: a dataframe with columns "region", "date", "kind" ("peak" or "trough") and "value", ordered by region
+        and date
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        y = np.log10(df.to_numpy(dtype=float))
+    y[~np.isfinite(y)] = np.nan
+    n = len(y)
+
+    frames = []
+    for kind, sign in (("peak", 1), ("trough", -1)):
+        v = sign * y
+        padded = np.pad(v, ((window, window), (0, 0)), constant_values=np.nan)
+        windows = sliding_window_view(padded, window, axis=0)
+        with np.errstate(invalid="ignore"):
+            highest = np.fmax.reduce(windows, axis=-1)
+            lowest = np.fmin.reduce(windows, axis=-1)
+        left_high, right_high = highest[:n], highest[window + 1 : window + 1 + n]
+        left_low, right_low = lowest[:n], lowest[window + 1 : window + 1 + n]
+
+        # the window after a confirmed turning point must be complete
+        complete = np.arange(n)[:, None] + window < n - np.isnan(v[::-1]).argmin(axis=0)
+
+        with np.errstate(invalid="ignore"):
+            found = (
+                (v > np.nan_to_num(left_high, nan=-np.inf))
+                & (v >= np.nan_to_num(right_high, nan=-np.inf))
+                & (v - left_low >= min_drop)
+                & (v - right_low >= min_drop)
+                & complete
+            )
+
+        rows, cols = np.nonzero(found)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "region": df.columns[cols],
+                    "date": df.index[rows],
+                    "kind": kind,
+                    "value": df.to_numpy()[rows, cols],
+                }
+            )
+        )
+
+    points = pd.concat(frames).sort_values(["region", "date"], kind="stable")
+
+    return points.reset_index(drop=True)
+
+
+def find_waves(
+    df: pd.DataFrame, window: int = WINDOW_DAYS, min_drop: float = MIN_DROP
+) -> pd.DataFrame:
+    """
+    Find every wave of every region: its peak and the end of its decline.
+
+    A decline ends at the first trough after the peak or, failing that, at the end of the region's data.
+
+    :return: a dataframe with columns "region", "peak", "peak value" and "end", one row per wave
+    """
+    points = find_turning_points(df, window, min_drop).sort_values("date")
+    peaks = points[points["kind"] == "peak"]
+    troughs = points[points["kind"] == "trough"]
+
+    last_dates = df.apply(pd.Series.last_valid_index)
+    ends = pd.merge_asof(
+        peaks[["date", "region"]].rename(columns={"date": "peak"}),
+        troughs[["date", "region"]].rename(columns={"date": "end"}),
+        left_on="peak",
+        right_on="end",
+        by="region",
+        direction="forward",
+        allow_exact_matches=False,
+    )["end"].values
+    ends = np.where(
+        pd.isna(ends), last_dates.reindex(peaks["region"]).values, ends
+    ).astype("datetime64[ns]")
+
+    waves = pd.DataFrame(
+        {
+            "region": peaks["region"].values,
+            "peak": peaks["date"].values,
+            "peak value": peaks["value"].values,
+            "end": ends,
+        }
+    )
+
+    return waves.sort_values(["region", "peak"]).reset_index(drop=True)
+
+
+def align_declines(
+    df: pd.DataFrame, waves: pd.DataFrame, max_days: Optional[int] = None
+) -> np.ndarray:
+    """
+    Align every post-peak decline to day 0 at its peak, normalised to the peak value.
+
+    :param df: The data the waves were found in
+    :param waves: Waves from `find_waves`
+    :param max_days: Length of the aligned declines (default: the longest decline)
+    :return: an array of shape (wave, day), NaN after the end of each decline
+    """
+    peak_rows = df.index.get_indexer(waves["peak"])
+    end_rows = df.index.get_indexer(waves["end"])
+    cols = df.columns.get_indexer(waves["region"])
+    if max_days is None:
+        max_days = int((end_rows - peak_rows).max(initial=0)) + 1
+
+    rows = peak_rows[:, None] + np.arange(max_days)[None, :]
+    inside = rows <= end_rows[:, None]
+
+    values = df.to_numpy(dtype=float)
+    declines = np.full((len(waves), max_days), np.nan)
+    declines[inside] = values[
+        rows[inside], np.broadcast_to(cols[:, None], rows.shape)[inside]
+    ]
+    declines /= declines[:, :1]
+
+    return declines
+
+
+def fit_declines(declines: np.ndarray, days: Optional[int] = None) -> pd.DataFrame:
+    """
+    Fit log10(declines) against days from peak for every wave with one batched regression.
+
+    :param declines: Aligned declines from `align_declines`
+    :param days: Fit only the first `days` days of each decline (default: all)
+    :return: a dataframe with columns "slope" (log10 per day), "intercept" and "halving days", one row per wave
+    """
+    with np.errstate(divide="ignore"):
+        log_declines = np.log10(declines[:, :days])
+    log_declines[~np.isfinite(log_declines)] = np.nan
+
+    slope, intercept = batched_linregress(log_declines)
+
+    with np.errstate(divide="ignore"):
+        halving = -np.log10(2) / slope
+
+    return pd.DataFrame(
+        {"slope": slope, "intercept": intercept, "halving days": halving}
+    )
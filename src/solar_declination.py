@@ -1,12 +1,16 @@
 import math
+from typing import Optional
 
 import matplotlib.pyplot as plt
 import pandas as pd
 from pycovid import OUTPUT_DIR
-from pycovid.data_utils.owid import prepare_owid_data
+from pycovid.catalog import catalog
+from pycovid.downsample import downsample
+from pycovid.panel import Panel
 
 DATASOURCE = "owid-covid-data-uk-india-280721.csv"
 COUNTRY = None
+TARGET_POINTS = 500  # per series
 
 
 def declination_angle(date: pd.Timestamp) -> float:
@@ -27,7 +31,10 @@ def compute_declination(start_date: str, end_date: str) -> pd.DataFrame:
     return df
 
 
-def plot_data(df: pd.DataFrame):
+def plot_data(df: Panel, target_points: Optional[int] = None):
+    if target_points is not None:
+        df = downsample(df, target_points)
+
     fig, ax1 = plt.subplots(1, 1)
     ax2 = ax1.twinx()
 
@@ -80,8 +87,13 @@ def plot_data(df: pd.DataFrame):
 
 if __name__ == "__main__":
 
-    df_deaths = prepare_owid_data(DATASOURCE, COUNTRY)
+    data = catalog.prefetch(
+        {"deaths": ("owid-deaths", dict(csvfile=DATASOURCE, country=COUNTRY))}
+    )
     df_solar = compute_declination("1 Feb 2020", "27 Jul 2021")
-    df = pd.concat([df_deaths, df_solar], axis=1)
+    df_deaths = data["deaths"].result()
+    df = Panel.from_frame(df_solar)
+    for column in ["UK"] if COUNTRY is None else ["UK", COUNTRY]:
+        df[column] = df_deaths[column]
 
-    plot_data(df)
+    plot_data(df, TARGET_POINTS)
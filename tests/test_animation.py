@@ -0,0 +1,105 @@
+import shutil
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from pycovid.animation import FFmpegWriter, animate_figure, frame_writer
+from pycovid.chart_utils import EventItem, RegionItem, create_figure
+
+
+class FrameList:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(frame.copy())
+
+
+def make_figure():
+    idx = pd.date_range("1 Mar 2020", periods=120)
+    t = np.arange(len(idx))
+    infections = 1000 * np.exp(-(((t - 40) / 15) ** 2))
+    df = pd.DataFrame(
+        {"infections": infections, "deaths (raw)": np.roll(infections, 28)}, index=idx
+    )
+    return create_figure(
+        "Fatal infections",
+        df,
+        regions=[RegionItem("1 May 2020", "31 May 2020", "tab:orange", "May")],
+        events=[EventItem("2020-03-23", "Lockdown"), EventItem("2020-05-10", "Easing")],
+        show_deaths=True,
+    )
+
+
+def test_create_figure_tags_animated_artists():
+    fig, (ax1, ax2, ax3) = make_figure()
+    gids = {artist.get_gid() for artist in fig.findobj() if artist.get_gid()}
+    assert gids == {
+        "infections",
+        "deaths (raw)",
+        "infections (log)",
+        "event 1",
+        "event 1 (label)",
+        "event 2",
+        "event 2 (label)",
+    }
+    assert ax3 is None
+    plt.close(fig)
+
+
+def test_frames_reveal_the_curves():
+    fig, (ax1, _, _) = make_figure()
+    full = ax1.get_lines()[1].get_xydata().copy()
+    writer = FrameList()
+    n = animate_figure(fig, writer, step=7)
+
+    assert n == len(writer.frames) == 18
+    first, middle, last = writer.frames[0], writer.frames[9], writer.frames[-1]
+    assert first.shape == (500, 1600, 4)
+    # more curve drawn as the days pass, and the figure is left as it was
+    assert (middle != first).any(axis=2).sum() < (last != first).any(axis=2).sum()
+    assert np.array_equal(ax1.get_lines()[1].get_xydata(), full, equal_nan=True)
+
+    # the last frame is the finished figure
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    finished = np.asarray(canvas.buffer_rgba())
+    assert (finished != last).any(axis=2).mean() < 0.01
+    plt.close(fig)
+
+
+def test_frames_are_blitted_over_one_full_render(tmp_path, monkeypatch):
+    fig, _ = make_figure()
+    renders, drawn = [], []
+    full_draw, draw_artist = FigureCanvasAgg.draw, Figure.draw_artist
+    monkeypatch.setattr(
+        FigureCanvasAgg, "draw", lambda canvas: renders.append(full_draw(canvas))
+    )
+    monkeypatch.setattr(
+        Figure, "draw_artist", lambda fig, a: drawn.append(draw_artist(fig, a))
+    )
+
+    n = animate_figure(fig, FrameList())
+    # the static parts are drawn once; each frame only redraws the 3 animated lines
+    assert len(renders) == 1
+    assert len(drawn) == 3 * n + 4  # and each event's line and label appear once
+    plt.close(fig)
+    monkeypatch.undo()
+
+    with frame_writer(tmp_path / "frames") as writer:
+        animate_figure(make_figure()[0], writer, step=30)
+    assert (
+        sorted(p.name for p in (tmp_path / "frames").iterdir())[-1] == "frame_00004.png"
+    )
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ffmpeg_writer(tmp_path):
+    fig, _ = make_figure()
+    with FFmpegWriter(tmp_path / "curve.mp4", fps=10) as writer:
+        animate_figure(fig, writer, step=10)
+    assert (tmp_path / "curve.mp4").stat().st_size > 0
+    plt.close(fig)
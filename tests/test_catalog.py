@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.catalog import Catalog, catalog
+
+
+def make_loader(calls):
+    def loader(rows: int, region: str = "UK") -> pd.DataFrame:
+        calls.append((rows, region))
+        return pd.DataFrame({region: np.arange(rows, dtype=float)})
+
+    return loader
+
+
+def test_lazy_load_and_cache():
+    calls = []
+    cat = Catalog()
+    cat.register("test", "v1", make_loader(calls), rows=10)
+    assert calls == []
+
+    df = cat.get("test")
+    df = cat.get("test")
+    cat.get("test", region="England")
+
+    assert calls == [(10, "UK"), (10, "England")]
+    assert df["UK"].sum() == 45
+    assert cat.stats().hits == 1
+    assert cat.stats().misses == 2
+
+
+def test_read_only_views():
+    cat = Catalog()
+    cat.register("test", "v1", make_loader([]), rows=10)
+    df = cat.get("test")
+
+    with pytest.raises(ValueError):
+        df.iloc[0, 0] = 99
+    df["extra"] = 1.0
+
+    assert list(cat.get("test").columns) == ["UK"]
+    assert cat.get("test")["UK"].iloc[0] == 0
+
+
+def test_read_only_extension_blocks():
+    cat = Catalog()
+    cat.register(
+        "test",
+        "v1",
+        lambda: pd.DataFrame(
+            {
+                "kind": pd.Categorical(["a", "b"]),
+                "count": pd.array([1, None], dtype="Int64"),
+                "date": pd.date_range("1 Jan 2021", periods=2, tz="UTC"),
+            }
+        ),
+    )
+    df = cat.get("test")
+
+    for column, value in [("kind", "b"), ("count", 5), ("date", df["date"][1])]:
+        with pytest.raises(ValueError):
+            df[column].values[0] = value
+
+
+def test_eviction_by_memory_usage():
+    calls = []
+    cat = Catalog(memory_budget=2500)
+    cat.register("test", "v1", make_loader(calls), rows=100)  # ~928 bytes each
+
+    cat.get("test", region="A")
+    cat.get("test", region="B")
+    cat.get("test", region="A")
+    cat.get("test", region="C")  # evicts B, the least recently used
+
+    assert cat.is_cached("test", region="A")
+    assert not cat.is_cached("test", region="B")
+    assert cat.stats().memory_usage <= 2500
+    assert cat.stats().evictions == 1
+
+
+def test_versions():
+    cat = Catalog()
+    cat.register("test", "v1", make_loader([]), rows=1)
+    cat.register("test", "v2", make_loader([]), rows=2)
+
+    assert len(cat.get("test")) == 2
+    assert len(cat.get("test", version="v1")) == 1
+    with pytest.raises(AttributeError):
+        cat.get("test", version="v3")
+
+
+def test_default_sources():
+    names = {source.name for source in catalog.sources()}
+    assert {
+        "ons-fatal-infections",
+        "cmi-smr",
+        "nhs-vaccinations",
+        "owid-deaths",
+    } <= names
+    assert {"oxcgrt", "phe-odds-ratio"} <= names
+    assert catalog.source("oxcgrt").defaults == {"measures": ["stringency_index"]}
+
+
+def test_catalog_does_not_import_plotting():
+    code = "import sys, pycovid.catalog; sys.exit('matplotlib' in sys.modules)"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    assert subprocess.run([sys.executable, "-c", code], env=env).returncode == 0
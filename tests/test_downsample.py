@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.downsample import downsample, export_csv, lttb_indices
+from pycovid.panel import Panel
+
+
+def make_series() -> pd.DataFrame:
+    idx = pd.date_range("1 Jan 2020", periods=1000)
+    t = np.arange(len(idx))
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "wave": 1000 * np.exp(-(((t - 300) / 60) ** 2)) + rng.normal(0, 5, len(t)),
+            "trend": t / 10.0,
+        },
+        index=idx,
+    )
+    df.iloc[600:650, 1] = np.nan
+    return df
+
+
+def test_lttb_matches_single_column_reference():
+    df = make_series()
+    x = np.arange(len(df), dtype=float)
+    y = df["wave"].to_numpy()
+    selected = lttb_indices(x, df.to_numpy(), 50)
+
+    # reference LTTB for one column
+    every = (len(y) - 2) / 48
+    a, expected = 0, [0]
+    for i in range(48):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(y))
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        expected.append(a)
+    expected.append(len(y) - 1)
+
+    assert selected[:, 0].tolist() == expected
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_keeps_peaks_gaps_and_events(method):
+    df = make_series()
+    events = ["2020-02-14", "2021-06-01"]
+    small = downsample(df, 100, method=method, keep=events)
+
+    assert len(small) < len(df) / 3
+    assert small["wave"].max() == df["wave"].max()
+    assert small["trend"].max() == df["trend"].max()
+    for date in events:
+        assert small.loc[date, "wave"] == df.loc[date, "wave"]
+    # the gap is bounded by kept NaN rows, so the line is not drawn across it
+    assert np.isnan(small.loc["2021-08-23", "trend"])
+    assert np.isnan(small.loc["2021-10-11", "trend"])
+    assert small.index[0] == df.index[0] and small.index[-1] == df.index[-1]
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_infinite_values_count_as_missing(method):
+    df = make_series()
+    with np.errstate(divide="ignore"):
+        df["log"] = np.log10(df["trend"])  # -inf on the first day
+
+    with np.errstate(all="raise"):
+        kept = downsample(df, 100, method=method)
+    assert kept.index[1] == df.index[1]  # the edge of the -inf value
+
+
+def test_short_series_and_panels_unchanged(tmp_path):
+    df = make_series()
+    pd.testing.assert_frame_equal(downsample(df.iloc[:50], 100), df.iloc[:50])
+
+    panel = Panel.from_frame(df)
+    export_csv(panel, tmp_path / "out.csv", 100, keep=["2020-02-14"])
+    exported = pd.read_csv(tmp_path / "out.csv", index_col=0, parse_dates=True)
+    assert len(exported) == len(downsample(df, 100, keep=["2020-02-14"]))
+
+    with pytest.raises(AttributeError):
+        downsample(df, 100, method="every-other")
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from pycovid.excess import (
+    Baseline,
+    baseline_smr,
+    cumulative_smr,
+    DAYS_PER_YEAR,
+    excess_smr,
+)
+from pytest import approx, raises
+
+
+def make_smr() -> pd.DataFrame:
+    """Weekly SMR shaped like read_CMI_SMR, falling by 0.0001 a year from 0.01 in 2008."""
+    idx = pd.MultiIndex.from_product(
+        [["Unisex", "Male"], ["20to100", "0to64"], range(2008, 2022)],
+        names=["Gender", "AgeBand", "Year"],
+    )
+    years = idx.get_level_values("Year").values
+    values = np.repeat((0.01 - 0.0001 * (years - 2008))[:, None], 53, axis=1)
+    df = pd.DataFrame(values, index=idx, columns=pd.RangeIndex(1, 54, name="ISOWeek"))
+    df.loc[~np.isin(years, [2009, 2015, 2020]), 53] = np.nan  # 52 ISO week years
+    df.loc[years == 2021, 14:] = np.nan  # data to the end of Q1
+    return df
+
+
+def test_baselines():
+    df = make_smr()
+
+    rolling = baseline_smr(df, Baseline("mean", years=10))
+    fixed = baseline_smr(df, Baseline("mean", years=10, end=2019))
+    single = baseline_smr(df, Baseline("year", end=2019))
+    trend = baseline_smr(df, Baseline("trend", years=5, end=2019))
+
+    assert rolling.loc[("Male", "0to64", 2021), 1] == approx(0.00925)
+    assert np.isnan(rolling.loc[("Male", "0to64", 2017), 1])
+    assert fixed.loc[("Unisex", "20to100", 2020), 1] == approx(0.00935)
+    assert single.loc[("Unisex", "20to100", 2021), 1] == approx(0.0089)
+    assert trend.loc[("Unisex", "20to100", 2021), 1] == approx(0.0087)
+
+    with raises(AttributeError):
+        Baseline("median")
+
+
+def test_excess_smr():
+    df = make_smr()
+    excess = excess_smr(df, Baseline("year", end=2019))
+    relative = excess_smr(df, Baseline("year", end=2019), relative=True)
+
+    assert excess.loc[("Unisex", "20to100", 2020), 1] == approx(-0.0001)
+    assert relative.loc[("Unisex", "20to100", 2020), 1] == approx(-0.0001 / 0.0089)
+    assert np.isnan(excess.loc[("Unisex", "20to100", 2021), 14])
+
+
+def test_cumulative_smr():
+    df = make_smr()
+    cumulative = cumulative_smr(df).loc[("Unisex", "20to100")].T
+
+    assert cumulative[2019].loc[1] == approx(0.0089 / DAYS_PER_YEAR)
+    assert cumulative[2019].loc[364] == approx(0.0089 * 364 / DAYS_PER_YEAR)
+    assert np.isnan(cumulative[2019].loc[365])  # 2019 has 52 ISO weeks
+    assert np.isnan(cumulative[2021].loc[13 * 7 + 1])
+
+    relative = cumulative_smr(df, Baseline("year", end=2019)).loc[("Male", "0to64")].T
+    assert relative[2019].loc[364] == approx(0)
+    assert relative[2020].loc[371] == approx(-0.0001 * 53 / (0.0089 * 53))
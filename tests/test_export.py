@@ -0,0 +1,89 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from pycovid.export import ExportItem, MANIFEST, content_hash, export_all
+
+
+def make_infections() -> pd.DataFrame:
+    idx = pd.date_range("1 Mar 2020", periods=100, name="Date")
+    return pd.DataFrame(
+        {"England": np.arange(100.0), "Wales": np.arange(100.0) / 10}, index=idx
+    )
+
+
+def make_events() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "country": pd.Categorical(["GBR", "FRA", "GBR"]),
+            "date": pd.to_datetime(["2020-03-23", "2020-03-17", "2020-05-10"]),
+            "level": np.array([3, 2, 2], dtype=np.int8),
+        }
+    )
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_chunked_export_round_trip(tmp_path, fmt):
+    infections, events = make_infections(), make_events()
+    results = export_all(
+        [ExportItem("infections", infections), ExportItem("events", lambda: events)],
+        tmp_path,
+        fmt=fmt,
+        chunk_rows=7,
+    )
+    assert [result.rows for result in results] == [100, 3]
+
+    if fmt == "csv":
+        written = pd.read_csv(tmp_path / "infections.csv", index_col=0)
+        assert written.to_numpy() == pytest.approx(infections.to_numpy())
+        assert len(written) == 100
+    elif fmt == "parquet":
+        assert pq.ParquetFile(tmp_path / "infections.parquet").num_row_groups == 15
+        pd.testing.assert_frame_equal(
+            pq.read_table(tmp_path / "events.parquet").to_pandas(), events
+        )
+    else:
+        reader = pa.ipc.open_file(tmp_path / "infections.arrow")
+        assert reader.num_record_batches == 15
+        pd.testing.assert_frame_equal(
+            reader.read_pandas(), infections, check_freq=False
+        )
+
+
+def test_unchanged_outputs_skipped(tmp_path):
+    infections = make_infections()
+    items = [
+        ExportItem("infections", infections),
+        ExportItem("events", make_events()),
+    ]
+    export_all(items, tmp_path)
+    manifest = json.loads((tmp_path / MANIFEST).read_text())
+    assert manifest["infections.csv"]["rows"] == 100
+    assert manifest["infections.csv"]["sha256"] == content_hash(infections)
+
+    items[0] = ExportItem("infections", infections * 2)
+    results = export_all(items, tmp_path)
+    assert [result.skipped for result in results] == [False, True]
+
+    (tmp_path / "events.csv").unlink()
+    assert not export_all(items, tmp_path)[1].skipped
+
+
+def test_failed_dataset_does_not_stop_the_others(tmp_path):
+    def missing():
+        raise FileNotFoundError("no such workbook")
+
+    with pytest.raises(FileNotFoundError):
+        export_all(
+            [ExportItem("missing", missing), ExportItem("events", make_events())],
+            tmp_path,
+        )
+    manifest = json.loads((tmp_path / MANIFEST).read_text())
+    assert list(manifest) == ["events.csv"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "events.csv",
+        MANIFEST,
+    ]
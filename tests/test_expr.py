@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.data_utils.ons import FatalInfectionPipeline
+from pycovid.catalog import Catalog
+from pycovid.expr import Context, collect, fatal_infections, from_series, source
+from pycovid.memory import set_memory_mode
+
+
+@pytest.fixture
+def deaths():
+    rng = np.random.default_rng(7)
+    index = pd.date_range("1 Mar 2020", periods=120, freq="D")
+    return pd.Series(rng.poisson(200, len(index)).astype(float), index=index)
+
+
+def test_fatal_infections_match_pipeline(deaths):
+    pipeline = FatalInfectionPipeline("England")
+    pipeline.append(deaths)
+
+    df = collect(fatal_infections(from_series(deaths)), context=Context()).to_frame()
+    pd.testing.assert_frame_equal(df, pipeline.to_frame(), check_freq=False)
+
+
+def test_elementwise_chain_is_fused(deaths):
+    context = Context()
+    x = from_series(deaths)
+    result = ((x * 2 + 1).log10() - 3).clip(upper=0.5).collect(context)
+
+    expected = (np.log10(deaths * 2 + 1) - 3).clip(upper=0.5)
+    pd.testing.assert_series_equal(result, expected, check_freq=False)
+    assert context.evaluated == 2  # the series and one fused chain
+    assert context.fused == 4
+
+
+def test_common_subexpressions_are_shared(deaths):
+    context = Context()
+    a = from_series(deaths).smooth(7).shift(-28)
+    b = from_series(deaths.copy()).smooth(7).shift(-28)
+    collect({"a": a.log10(), "b": b * 10}, context=context)
+    assert context.evaluated == 5  # series, smooth, shift, log10, * 10
+
+    # a later collect (e.g. another figure) reuses evaluated nodes
+    collect({"c": a.log10()}, context=context)
+    assert context.evaluated == 5
+    assert context.hits >= 1
+
+
+def test_unselected_columns_are_not_evaluated(deaths):
+    context = Context()
+    exprs = {
+        "deaths": from_series(deaths),
+        "smoothed": from_series(deaths).smooth(7),
+    }
+    panel = collect(exprs, columns=["deaths"], context=context)
+    assert list(panel.columns) == ["deaths"]
+    assert context.evaluated == 1
+
+
+def test_binary_aligns_dates(deaths):
+    x = from_series(deaths)
+    result = (x - x.shift(1)).between("2 Mar 2020", "5 Mar 2020").collect(Context())
+    expected = deaths.diff().loc["2 Mar 2020":"5 Mar 2020"]
+    pd.testing.assert_series_equal(result, expected, check_freq=False)
+
+
+def test_cached_values_are_read_only(deaths):
+    context = Context()
+    x = from_series(deaths)
+    collect({"log": x.log10(), "scaled": x.log10() * 2}, context=context)
+    assert not context.get(x.log10().key).values.flags.writeable
+
+
+def test_series_keys_depend_on_order():
+    index = pd.date_range("1 Mar 2020", periods=3, freq="D")
+    context = Context()
+    ascending = from_series(pd.Series([1.0, 2.0, 3.0], index=index))
+    descending = from_series(pd.Series([3.0, 2.0, 1.0], index=index))
+    assert ascending.key != descending.key
+
+    (ascending * 2).collect(context)
+    assert list((descending * 2).collect(context)) == [6.0, 4.0, 2.0]
+
+
+def test_sources_are_keyed_on_registration_and_memory_mode(deaths, monkeypatch):
+    cat = Catalog()
+    monkeypatch.setattr("pycovid.catalog.catalog", cat)
+    monkeypatch.setenv("PYCOVID_MEMORY_MODE", "default")
+    context = Context()
+    doubled = source("deaths", column="England") * 2
+
+    cat.register("deaths", "v1", lambda: deaths.to_frame("England"))
+    assert doubled.collect(context).iloc[0] == 2 * deaths.iloc[0]
+
+    # the same name and version, registered again
+    cat.register("deaths", "v1", lambda: (deaths + 1).to_frame("England"))
+    assert doubled.collect(context).iloc[0] == 2 * (deaths.iloc[0] + 1)
+
+    set_memory_mode("low")
+    doubled.collect(context)
+    assert context.evaluated == 6
+
+
+def test_context_is_bounded(deaths):
+    context = Context(max_size=3 * deaths.to_numpy().nbytes)
+    x = from_series(deaths)
+    for k in range(10):
+        (x + k).collect(context)
+
+    assert context.evictions > 0
+    assert len(context._values) <= 3
+
+
+def test_clip_without_bounds_is_a_no_op(deaths):
+    x = from_series(deaths)
+    assert x.clip() is x
+    pd.testing.assert_series_equal(x.clip().collect(Context()), deaths.clip())
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from pycovid.data_utils.ons import INFECTION_TO_DEATH_DAYS, FatalInfectionPipeline
+from pytest import approx
+
+SHIFT = pd.Timedelta(days=INFECTION_TO_DEATH_DAYS)
+
+
+def make_registrations(days: int) -> pd.Series:
+    idx = pd.date_range("2 Mar 2020", periods=days)
+    rng = np.random.default_rng(1)
+    return pd.Series(rng.poisson(200, size=days).astype(float), index=idx)
+
+
+def test_pipeline_matches_full_recompute():
+    deaths = make_registrations(200)
+    pipeline = FatalInfectionPipeline("England")
+    pipeline.append(deaths)
+    df = pipeline.to_frame()
+
+    assert len(df) == 200 + INFECTION_TO_DEATH_DAYS
+    assert df["infections"].sum() == approx(deaths.sum())
+    assert (
+        df["deaths (raw)"]
+        .iloc[INFECTION_TO_DEATH_DAYS:]
+        .equals(pd.Series(deaths.values, index=df.index[INFECTION_TO_DEATH_DAYS:]))
+    )
+    expected = deaths.rolling(window=7, center=True).mean()
+    expected *= deaths.sum() / expected.sum()
+    assert np.allclose(df["infections"].values[:200], expected.values, equal_nan=True)
+
+
+def test_append_updates_only_the_tail():
+    deaths = make_registrations(200)
+    full = FatalInfectionPipeline("England")
+    full.append(deaths)
+
+    pipeline = FatalInfectionPipeline("England")
+    before = pipeline.append(deaths.iloc[:193]).rows
+    update = pipeline.append(deaths.iloc[190:])
+
+    # the smoothing windows that reach the first new day, onwards
+    assert update.rows.index[0] == deaths.index[193 - 3] - SHIFT
+    assert len(update.rows) == 10 + INFECTION_TO_DEATH_DAYS
+    pd.testing.assert_frame_equal(pipeline.to_frame(), full.to_frame())
+    pd.testing.assert_frame_equal(update.apply(before), full.to_frame())
+
+
+def test_revision_recomputes_from_revised_day():
+    deaths = make_registrations(100)
+    pipeline = FatalInfectionPipeline("England")
+    pipeline.append(deaths)
+
+    revised = deaths.copy()
+    revised.iloc[60] += 50
+    update = pipeline.append(revised)
+
+    assert update.rows.index[0] == deaths.index[57] - SHIFT
+    assert pipeline.to_frame()["infections"].sum() == approx(revised.sum())
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.lag import cross_correlation, lag_significance, peak_lags
+from pytest import approx
+
+
+def make_series():
+    rng = np.random.default_rng(0)
+    n = 400
+    driver = pd.Series(np.convolve(rng.normal(size=n), np.ones(7), "same"))
+    drivers = pd.DataFrame({"driver": driver, "noise": rng.normal(size=n)})
+    responses = pd.DataFrame(
+        {
+            "lagged": driver.shift(12) + 0.3 * rng.normal(size=n),
+            "inverse": -driver.shift(5),
+        }
+    )
+    responses.iloc[:30, 0] = np.nan
+    return drivers, responses
+
+
+def test_cross_correlation_matches_pandas():
+    drivers, responses = make_series()
+    r, lags = cross_correlation(drivers, responses, max_lag=20)
+
+    assert r.shape == (2, 2, 41)
+    for lag in [-7, 0, 12]:
+        expected = drivers["driver"].corr(responses["lagged"].shift(-lag))
+        assert r[0, 0, lags == lag][0] == approx(expected)
+
+
+def test_cross_correlation_is_offset_invariant():
+    drivers, responses = make_series()
+    r, lags = cross_correlation(drivers, responses, max_lag=20)
+    offset, _ = cross_correlation(drivers + 3e7, responses * 1e3 - 3e7, max_lag=20)
+
+    assert np.allclose(offset, r, equal_nan=True, atol=1e-9)
+
+
+def test_peak_lags():
+    drivers, responses = make_series()
+    peaks = peak_lags(drivers, responses, max_lag=20, absolute=True)
+
+    assert list(peaks["lag"][peaks["driver"] == "driver"]) == [12, 5]
+    assert peaks["correlation"].iloc[1] == approx(-1)
+
+
+def test_lag_significance_is_reproducible():
+    drivers, responses = make_series()
+    kwargs = dict(max_lag=20, n_resamples=100, seed=1, test="block-bootstrap")
+    result = lag_significance(drivers, responses, partitions=1, **kwargs)
+
+    assert result["p value"].iloc[0] < 0.05
+    assert result["p value"].iloc[2] > 0.05
+    pd.testing.assert_frame_equal(
+        result, lag_significance(drivers, responses, partitions=2, **kwargs)
+    )
+
+    with pytest.raises(AttributeError):
+        lag_significance(drivers, responses, test="jackknife")
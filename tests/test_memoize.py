@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+
+import pandas as pd
+import pytest
+from pycovid.memoize import DiskCache, memoize
+
+
+@dataclass
+class Meta:
+    workbook: str
+    region: str
+
+
+def test_memoize_keys_on_arguments_and_input_files(tmp_path):
+    store = DiskCache(tmp_path / "cache")
+    calls = []
+
+    @memoize(inputs=lambda meta: [tmp_path / meta.workbook], store=store)
+    def load(meta: Meta) -> pd.DataFrame:
+        calls.append(meta)
+        return pd.read_csv(tmp_path / meta.workbook)[[meta.region]]
+
+    (tmp_path / "a.csv").write_text("England,Wales\n1,2\n")
+    (tmp_path / "b.csv").write_text("England,Wales\n3,4\n")
+
+    a = load(Meta("a.csv", "England"))
+    assert load(Meta("a.csv", "England")).equals(a)
+    load(Meta("a.csv", "Wales"))
+    load(Meta("b.csv", "England"))
+    assert len(calls) == 3
+
+    # changing a workbook invalidates only the results read from it
+    (tmp_path / "a.csv").write_text("England,Wales\n10,2\n")
+    assert load(Meta("a.csv", "England"))["England"].iloc[0] == 10
+    load(Meta("b.csv", "England"))
+    assert len(calls) == 4
+
+    stats = store.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (2, 4, 4)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    store = DiskCache(tmp_path, max_size=2500)
+
+    @memoize(store=store)
+    def payload(n: int) -> bytes:
+        return bytes(1000) + bytes([n])
+
+    payload(1)
+    payload(2)
+    payload(1)  # now the most recently used
+    payload(3)
+
+    assert store.stats().evictions == 1
+    assert store.get(payload.cache_key(1))[0]
+    assert not store.get(payload.cache_key(2))[0]
+
+    store.clear()
+    assert store.stats().entries == 0
+
+
+def test_keys_change_with_constants_and_version(tmp_path):
+    store = DiskCache(tmp_path)
+
+    def days():
+        return 28
+
+    def other_days():
+        return 21
+
+    # same bytecode, different constants
+    other_days.__qualname__ = days.__qualname__
+    assert (
+        memoize(days, store=store).cache_key()
+        != memoize(other_days, store=store).cache_key()
+    )
+    assert (
+        memoize(days, store=store).cache_key()
+        != memoize(days, store=store, version="2").cache_key()
+    )
+
+
+def test_arguments_without_stable_repr_are_rejected(tmp_path):
+    @memoize(store=DiskCache(tmp_path))
+    def identity(value):
+        return value
+
+    with pytest.raises(AttributeError):
+        identity(object())
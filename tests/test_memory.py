@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.catalog import Catalog
+from pycovid.memory import (
+    MEMORY_MODE_VARIABLE,
+    compact,
+    get_memory_mode,
+    low_memory,
+    memory_mode,
+    memory_report,
+    set_memory_mode,
+)
+
+
+def make_smr() -> pd.DataFrame:
+    n = 300
+    return pd.DataFrame(
+        {
+            "Gender": ["Unisex", "Male", "Female"] * (n // 3),
+            "AgeBand": ["20to100", "65to85"] * (n // 2),
+            "Year": np.repeat(np.arange(2000, 2030), n // 30),
+            "Deaths": np.arange(n, dtype=float) * 1000,
+            "Level": np.where(np.arange(n) % 7 == 0, np.nan, np.arange(n) % 4),
+            "SMR": np.linspace(0.8, 1.2, n),
+            "Note": [f"row {i}" for i in range(n)],
+        }
+    )
+
+
+@low_memory
+def load_smr() -> pd.DataFrame:
+    return make_smr()
+
+
+def test_compact_dtypes():
+    df = make_smr()
+    compacted = compact(df)
+
+    assert compacted["Gender"].dtype == "category"
+    assert compacted["AgeBand"].dtype == "category"
+    assert compacted["Year"].dtype == np.int16
+    assert compacted["Deaths"].dtype == np.int32
+    assert compacted["Level"].dtype == np.float32  # missing values
+    assert compacted["SMR"].dtype == np.float32
+    assert compacted["Note"].dtype == object  # every label distinct
+    pd.testing.assert_frame_equal(compacted.astype(df.dtypes.to_dict()), df)
+    assert compact(df["Year"]).dtype == np.int16
+
+
+def test_memory_mode_applies_to_loaders_and_catalog():
+    calls = []
+
+    def loader():
+        calls.append(get_memory_mode())
+        return load_smr()
+
+    cat = Catalog()
+    cat.register("smr", "v1", loader)
+
+    assert load_smr()["Gender"].dtype == object
+    default = cat.get("smr")
+    with memory_mode("low"):
+        assert os.environ[MEMORY_MODE_VARIABLE] == "low"
+        low = cat.get("smr")
+        assert cat.get("smr")["Gender"].dtype == "category"
+    assert get_memory_mode() == "default"
+    assert calls == ["default", "low"]
+
+    report = memory_report({"smr": default}, {"smr": low})
+    assert (
+        report.loc["smr", "saved"]
+        == report.loc["smr", "default"] - report.loc["smr", "low"]
+    )
+    assert report.loc["smr", "saved (%)"] > 50
+
+    with pytest.raises(AttributeError):
+        set_memory_mode("tiny")
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.data_utils.ons import FatalInfectionPipeline
+from pycovid.monte_carlo import (
+    FIXED_DELAY,
+    HistogramQuantiles,
+    Priors,
+    delay_distributions,
+    monte_carlo_fatal_infections,
+)
+
+
+def make_deaths() -> pd.Series:
+    idx = pd.date_range("1 Mar 2020", periods=200)
+    t = np.arange(len(idx))
+    deaths = 1000 * np.exp(-(((t - 60) / 20) ** 2)) + 200 * np.exp(
+        -(((t - 160) / 15) ** 2)
+    )
+    return pd.Series(np.round(deaths), index=idx, name="England")
+
+
+def test_fixed_delay_reproduces_fatal_infection_data():
+    deaths = make_deaths()
+    pipeline = FatalInfectionPipeline("England")
+    pipeline.append(deaths)
+    expected = pipeline.to_frame()["infections"]
+
+    fits = [("2020-04-20", "2020-05-20")]
+    bands = monte_carlo_fatal_infections(
+        deaths, FIXED_DELAY, fits=fits, n_draws=5, partitions=1
+    )
+    joined = bands.infections.join(expected, how="outer")
+    assert joined["infections"].notna().equals(joined["50%"].notna())
+    error = (joined["50%"] - joined["infections"]).abs() / (1 + joined["infections"])
+    assert error.max() < 0.005
+
+    log_expected = np.log10(expected.loc["2020-04-20":"2020-05-20"])
+    slope = np.polyfit(np.arange(len(log_expected)), log_expected, 1)[0]
+    assert bands.slopes.loc["2020-04-20 to 2020-05-20", "50%"] == pytest.approx(
+        slope, abs=1e-4
+    )
+
+
+def test_bands_are_reproducible_across_partitions():
+    deaths = make_deaths()
+    kwargs = dict(fits=[("2020-04-01", "2020-04-30")], n_draws=150, seed=7)
+    one = monte_carlo_fatal_infections(deaths, partitions=1, **kwargs)
+    two = monte_carlo_fatal_infections(deaths, partitions=2, **kwargs)
+
+    pd.testing.assert_frame_equal(one.infections, two.infections)
+    pd.testing.assert_frame_equal(one.slopes, two.slopes)
+    assert (one.infections["2.5%"] <= one.infections["97.5%"]).all()
+    assert (one.slopes["2.5%"] < one.slopes["97.5%"]).all()
+
+
+def test_histogram_quantiles_match_numpy():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(5000, 3)) * [1, 2, 3]
+    histogram = HistogramQuantiles(np.full(3, -15.0), np.full(3, 15.0))
+    for batch in np.array_split(values, 7):
+        histogram.update(batch)
+
+    expected = np.percentile(values, [5, 50, 95], axis=0)
+    assert histogram.quantiles([5, 50, 95]) == pytest.approx(expected, abs=0.02)
+
+
+def test_histogram_quantiles_count_overflow():
+    values = np.linspace(-1, 1, 1001)[:, None]
+    histogram = HistogramQuantiles(np.array([-0.5]), np.array([0.5]))
+    histogram.update(values[:500])
+    other = HistogramQuantiles(np.array([-0.5]), np.array([0.5]))
+    other.update(values[500:])
+    histogram.merge(other)
+
+    assert (histogram.below[0], histogram.above[0]) == (250, 250)
+    assert histogram.quantiles([50])[0, 0] == pytest.approx(0, abs=1e-3)
+    with pytest.warns(RuntimeWarning):
+        histogram.quantiles([2.5, 97.5])
+
+
+def test_delay_distributions():
+    pmf = delay_distributions(np.array([28.0, 20.0]), np.array([0.0, 6.0]))
+    days = np.arange(len(pmf))
+
+    assert pmf.sum(axis=0) == pytest.approx(1)
+    assert pmf[28, 0] == 1
+    assert (days * pmf[:, 1]).sum() == pytest.approx(20, abs=0.1)
+    assert Priors().delay_mean == 28
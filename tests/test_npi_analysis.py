@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from pycovid.government_response import policy_cube, policy_events
+from pycovid.npi_analysis import npi_growth_rates
+from pytest import approx
+
+INDICATORS = ["C1_School closing", "C6_Stay at home requirements"]
+
+
+def make_data():
+    """Two countries that lock down on 1 Apr 2020, after which deaths turn from growth to decline 28 days later."""
+    dates = pd.date_range("1 Mar 2020", "31 Jul 2020")
+    t = (dates - pd.Timestamp("29 Apr 2020")).days.to_numpy()
+    deaths = pd.DataFrame(
+        {
+            "GBR": 10 ** np.where(t < 0, 0.02 * t, -0.01 * t) * 100,
+            "FRA": 10 ** np.where(t < 0, 0.03 * t, -0.02 * t) * 100,
+        },
+        index=dates,
+    )
+    oxcgrt = pd.DataFrame(
+        {
+            "CountryCode": np.repeat(["GBR", "FRA", "ITA"], len(dates)),
+            "Date": np.tile(dates.strftime("%Y%m%d").astype(int), 3),
+            INDICATORS[0]: np.tile(np.where(dates >= "1 Apr 2020", 3, 0), 3),
+            INDICATORS[1]: 0,
+        }
+    )
+    return deaths, policy_events(policy_cube(oxcgrt, INDICATORS))
+
+
+def test_npi_growth_rates():
+    deaths, events = make_data()
+    result = npi_growth_rates(deaths, events, partitions=1)
+
+    # ITA has no deaths data
+    assert list(result["country"]) == ["FRA", "GBR"]
+    assert result["slope before"].values == approx([0.03, 0.02])
+    assert result["slope after"].values == approx([-0.02, -0.01])
+    assert result["slope change"].values == approx([-0.05, -0.03])
+
+
+def test_npi_growth_rates_partitioned():
+    deaths, events = make_data()
+    pd.testing.assert_frame_equal(
+        npi_growth_rates(deaths, events, partitions=2),
+        npi_growth_rates(deaths, events, partitions=1),
+    )
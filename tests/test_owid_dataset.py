@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from pycovid.data_utils.owid_dataset import build_owid_dataset, read_owid_dataset
+
+
+def write_owid_csv(path, days: int = 30, uk_deaths: float = 1.5):
+    frames = []
+    for iso_code, location in [("GBR", "United Kingdom"), ("CIV", "Cote d'Ivoire")]:
+        frames.append(
+            pd.DataFrame(
+                {
+                    "iso_code": iso_code,
+                    "continent": "Europe" if iso_code == "GBR" else "Africa",
+                    "location": location,
+                    "date": pd.date_range("1 Mar 2020", periods=days),
+                    "total_cases": np.arange(days) * 1e6 + 0.5,
+                    "new_deaths_smoothed_per_million": np.round(
+                        np.linspace(0, uk_deaths if iso_code == "GBR" else 9, days), 3
+                    ),
+                }
+            )
+        )
+    pd.concat(frames).to_csv(path, index=False)
+
+
+def test_build_and_read(tmp_path):
+    write_owid_csv(tmp_path / "owid.csv")
+    written = build_owid_dataset(tmp_path / "owid.csv", tmp_path / "owid", chunksize=7)
+    assert sorted(written) == ["Cote d'Ivoire", "United Kingdom"]
+
+    df = read_owid_dataset(
+        tmp_path / "owid",
+        columns=["new_deaths_smoothed_per_million"],
+        locations=["United Kingdom"],
+        start="10 Mar 2020",
+    )
+    assert list(df.columns) == ["new_deaths_smoothed_per_million"]
+    assert df.index.get_level_values("location").unique().tolist() == ["United Kingdom"]
+    assert df.index.get_level_values("date")[0] == pd.Timestamp("10 Mar 2020")
+    assert df["new_deaths_smoothed_per_million"].dtype == np.float32
+
+    df = read_owid_dataset(tmp_path / "owid")
+    assert df["total_cases"].dtype == np.float64  # not representable as float32
+    assert df["iso_code"].dtype == "category"
+    assert (
+        df.loc[("Cote d'Ivoire", pd.Timestamp("30 Mar 2020")), "total_cases"]
+        == 29e6 + 0.5
+    )
+
+
+def test_incremental_rebuild(tmp_path):
+    write_owid_csv(tmp_path / "owid.csv")
+    build_owid_dataset(tmp_path / "owid.csv", tmp_path / "owid")
+
+    assert build_owid_dataset(tmp_path / "owid.csv", tmp_path / "owid") == []
+
+    write_owid_csv(tmp_path / "owid.csv", uk_deaths=2.5)
+    assert build_owid_dataset(tmp_path / "owid.csv", tmp_path / "owid") == [
+        "United Kingdom"
+    ]
+
+
+def test_partition_names_round_trip(tmp_path):
+    locations = ["Curaçao", "Micronesia (country)", "Bonaire/Saba"]
+    pd.DataFrame(
+        {
+            "location": np.repeat(locations, 3),
+            "date": np.tile(pd.date_range("1 Mar 2020", periods=3), 3),
+            "total_cases": np.arange(9.0),
+        }
+    ).to_csv(tmp_path / "owid.csv", index=False)
+    build_owid_dataset(tmp_path / "owid.csv", tmp_path / "owid")
+
+    df = read_owid_dataset(tmp_path / "owid", locations=["Curaçao", "Bonaire/Saba"])
+    assert df.index.get_level_values("location").unique().tolist() == [
+        "Bonaire/Saba",
+        "Curaçao",
+    ]
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.data_utils import polyfit
+from pycovid.panel import Panel
+
+
+def make_series(start: str, periods: int, value: float = 1.0) -> pd.Series:
+    return pd.Series(
+        value * np.arange(periods, dtype=float),
+        index=pd.date_range(start, periods=periods),
+    )
+
+
+def test_insert_aligns_once():
+    panel = Panel("1 Jan 2021", "31 Jan 2021", capacity=1)
+    panel["a"] = make_series("25 Dec 2020", 10)
+    panel["b"] = make_series("30 Jan 2021", 5).to_frame()
+
+    assert list(panel.columns) == ["a", "b"]
+    assert panel.values.shape == (31, 2)
+    assert panel["a"]["1 Jan 2021"] == 7
+    assert np.isnan(panel["a"]["4 Jan 2021"])
+    assert panel["b"].dropna().tolist() == [0, 1]
+    assert panel.row("31 Jan 2021") == 30
+    with pytest.raises(KeyError):
+        panel.row("1 Feb 2021")
+
+
+def test_slices_are_views():
+    panel = Panel.from_frame(make_series("1 Jan 2021", 31).to_frame("a"))
+    view = panel.loc["10 Jan 2021":"12 Jan 2021"]
+
+    assert view.index[0] == pd.Timestamp("10 Jan 2021")
+    assert len(view) == 3
+    assert np.shares_memory(view.values, panel.values)
+    assert np.shares_memory(panel["a"].values, panel.values)
+    assert np.shares_memory(panel.to_frame().values, panel.values)
+    with pytest.raises(AttributeError):
+        view["b"] = make_series("1 Jan 2021", 3)
+
+
+@pytest.mark.parametrize(
+    "start, end",
+    [
+        (None, "25 Dec 2020"),
+        ("1 Mar 2021", None),
+        ("20 Dec 2020", "5 Jan 2021"),
+        ("25 Jan 2021", "10 Feb 2021"),
+        ("10 Jan 2021", "5 Jan 2021"),
+    ],
+)
+def test_slices_outside_panel_match_dataframe(start, end):
+    df = make_series("1 Jan 2021", 31).to_frame("a")
+    view = Panel.from_frame(df).loc[start:end]
+    pd.testing.assert_frame_equal(view.to_frame(), df.loc[start:end], check_freq=False)
+
+
+def test_loc_date_matches_dataframe():
+    df = make_series("1 Jan 2021", 31).to_frame("a").assign(b=2.0)
+    panel = Panel.from_frame(df)
+    pd.testing.assert_series_equal(panel.loc["5 Jan 2021"], df.loc["5 Jan 2021"])
+    assert np.shares_memory(panel.loc["5 Jan 2021"].values, panel.values)
+
+
+def test_fits_consume_panel():
+    panel = Panel.from_frame(make_series("1 Jan 2021", 31, -0.01).to_frame("log"))
+    log_fit, fit = polyfit(panel["log"], "5 Jan 2021", "20 Jan 2021")
+    assert log_fit.iloc[0, 0] == pytest.approx(-0.04)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from pycovid.events import EventItem
+from pycovid.government_response import (
+    MISSING,
+    event_items,
+    policy_cube,
+    policy_events,
+)
+
+INDICATORS = ["C1_School closing", "C6_Stay at home requirements"]
+
+
+def make_oxcgrt() -> pd.DataFrame:
+    """Two countries and one subnational region over five days, in the OxCGRT long format."""
+    rows = [
+        # country, region, date, C1, C6
+        ("GBR", None, 20200301, 0, 0),
+        ("GBR", None, 20200302, 3, 0),
+        ("GBR", None, 20200303, 3, 2),
+        ("GBR", None, 20200304, np.nan, 2),
+        ("GBR", None, 20200305, 1, 2),
+        ("GBR", "Scotland", 20200302, 0, 3),
+        ("FRA", None, 20200301, 2, 1),
+        ("FRA", None, 20200305, 2, 0),
+    ]
+    return pd.DataFrame(
+        rows, columns=["CountryCode", "RegionName", "Date"] + INDICATORS
+    )
+
+
+def test_policy_cube():
+    cube = policy_cube(make_oxcgrt(), INDICATORS)
+
+    assert cube.values.dtype == np.int8
+    assert cube.values.shape == (2, 5, 2)
+    assert list(cube.countries) == ["FRA", "GBR"]
+    assert cube.values[1, 1, 1] == 0  # Scotland is ignored
+    assert cube.values[1, 3, 0] == MISSING
+
+
+def test_policy_events():
+    events = policy_events(policy_cube(make_oxcgrt(), INDICATORS))
+
+    assert list(events["country"]) == ["FRA", "GBR", "GBR", "GBR"]
+    assert list(events["date"].dt.day) == [5, 2, 3, 5]
+    assert list(events["kind"]) == ["easing", "tightening", "tightening", "easing"]
+    # the reporting gap on 4 March compares 5 March with 3 March
+    assert (events["previous"].iloc[-1], events["level"].iloc[-1]) == (3, 1)
+
+
+def test_event_items():
+    events = policy_events(policy_cube(make_oxcgrt(), INDICATORS))
+
+    items = event_items(events, "GBR", start="2020-03-03")
+    assert items == [
+        EventItem("2020-03-03", "Stay at home requirements tightened to 2"),
+        EventItem("2020-03-05", "School closing eased to 1"),
+    ]
+    assert event_items(events, "GBR", kind="easing") == items[1:]
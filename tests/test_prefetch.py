@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pandas as pd
+from pycovid.catalog import Catalog
+from pycovid.data_utils.phe import read_PHE_odds_ratio
+from pycovid.prefetch import LoaderCall, prefetch
+
+
+def slow_loader(value: int) -> pd.DataFrame:
+    time.sleep(0.2)
+    return pd.DataFrame({"value": [value]})
+
+
+def test_prefetch_threads_run_concurrently():
+    # each call waits for the other two, so calls run one after another time out
+    barrier = threading.Barrier(3, timeout=5)
+
+    def waiting_loader(value: int) -> pd.DataFrame:
+        barrier.wait()
+        return pd.DataFrame({"value": [value]})
+
+    calls = {
+        name: LoaderCall(waiting_loader, dict(value=i)) for i, name in enumerate("abc")
+    }
+
+    futures = prefetch(calls, processes=False)
+    results = {name: future.result() for name, future in futures.items()}
+
+    assert results["c"]["value"].iloc[0] == 2
+
+
+def test_prefetch_processes():
+    futures = prefetch({"phe": LoaderCall(read_PHE_odds_ratio, dict(figure=1, dose=1))})
+    assert futures["phe"].result().iloc[0] == read_PHE_odds_ratio(1, 1).iloc[0]
+
+
+def test_catalog_prefetch_populates_cache():
+    cat = Catalog()
+    cat.register("test", "v1", slow_loader, value=1)
+
+    futures = cat.prefetch(
+        {"one": ("test", {}), "two": ("test", dict(value=2))}, processes=False
+    )
+
+    assert futures["two"].result()["value"].iloc[0] == 2
+    assert futures["one"].result()["value"].iloc[0] == 1
+    assert cat.is_cached("test") and cat.is_cached("test", value=2)
+    assert cat.prefetch({"one": ("test", {})})["one"].done()
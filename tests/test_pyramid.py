@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.catalog import Catalog
+from pycovid.pyramid import Pyramid, _pyramids, clear_pyramids, pyramid
+
+
+def make_daily() -> pd.DataFrame:
+    idx = pd.date_range("1 Jul 2019", "10 Jan 2021")
+    df = pd.DataFrame({"A": 1.0, "B": np.arange(len(idx), dtype=float)}, index=idx)
+    df.iloc[10, 0] = np.nan
+    return df
+
+
+def test_iso_week_keys_match_cmi_layout():
+    pyramid = Pyramid(make_daily())
+    weekly = pyramid.at("W")
+
+    assert weekly.index.names == ["Year", "ISOWeek"]
+    # 28 Dec 2020 - 3 Jan 2021 is ISO week 53 of 2020
+    assert weekly.loc[(2020, 53), "A"] == 7
+    assert weekly.loc[(2021, 1), "A"] == 7
+
+    # CMI weekly SMR: index "Year", columns "ISOWeek"
+    smr = pd.DataFrame(
+        [[1.5, 2.5]], index=pd.Index([2020], name="Year"), columns=[52, 53]
+    )
+    smr.columns.name = "ISOWeek"
+    joined = weekly.join(smr.stack().rename("SMR"), how="inner")
+    assert list(joined.index) == [(2020, 52), (2020, 53)]
+
+
+def test_levels_preserve_totals():
+    df = make_daily()
+    pyramid = Pyramid(df)
+    for resolution in ["W", "M", "S"]:
+        assert pyramid.at(resolution).sum().values == pytest.approx(df.sum().values)
+
+    seasons = pyramid.at("S")
+    assert list(seasons.index) == [2019, 2020]
+    assert seasons.loc[2019, "A"] == 366 - 1  # 2019/20 includes 29 Feb; one day missing
+
+
+def test_complete_periods_and_mean():
+    pyramid = Pyramid(make_daily(), how="mean")
+
+    monthly = pyramid.at("M", complete=True)
+    assert monthly.index[0] == (2019, 7)
+    assert monthly.index[-1] == (2020, 12)  # January 2021 is incomplete
+    assert monthly.loc[(2019, 7), "B"] == 15
+    assert list(pyramid.at("S", complete=True).index) == [2019]
+
+    with pytest.raises(AttributeError):
+        pyramid.at("Q")
+
+
+def test_pyramids_follow_registrations_and_are_bounded(monkeypatch):
+    cat = Catalog()
+    monkeypatch.setattr("pycovid.pyramid.catalog", cat)
+    monkeypatch.setattr("pycovid.pyramid.MAX_PYRAMIDS", 2)
+    clear_pyramids()
+    daily = make_daily()
+
+    cat.register("daily", "v1", lambda: daily)
+    first = pyramid("daily")
+    assert pyramid("daily") is first
+
+    # the same name and version, registered again
+    cat.register("daily", "v1", lambda: daily * 2)
+    assert pyramid("daily").at("W")["B"].sum() == 2 * first.at("W")["B"].sum()
+
+    pyramid("daily", how="mean")
+    assert len(_pyramids) == 2
+    clear_pyramids()
+    assert len(_pyramids) == 0
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from pycovid.seasonal import (
+    HOPE_SIMPSON,
+    profile_distance,
+    reference_profile,
+    season_profiles,
+    SeasonalProfiles,
+)
+from pytest import approx
+
+
+def make_deaths(end: str = "15 Apr 2021") -> pd.DataFrame:
+    idx = pd.date_range("1 Jul 2019", end)
+    return pd.DataFrame(
+        {"UK": np.ones(len(idx)), "London": idx.month.values}, index=idx
+    )
+
+
+def test_season_profiles():
+    df = season_profiles(make_deaths())
+
+    assert df.index.names == ["Season", "Month"]
+    assert list(df.loc[2019].index) == [7, 8, 9, 10, 11, 12, 1, 2, 3, 4, 5, 6]
+    assert df.loc[(2019, 7), "UK"] == approx(31 / 366 * 100)
+    assert df["UK"].groupby(level=0).sum().values == approx([100, 100])
+    assert df.loc[2020, "UK"].loc[[5, 6]].isna().all()
+
+
+def test_weekly_profiles():
+    df = season_profiles(make_deaths(), freq="W")
+
+    assert df.index.names == ["Season", "ISOWeek"]
+    assert df.loc[2019].index[0] == 27
+    assert df.loc[(2019, 2), "UK"] == approx(7 / 364 * 100)  # 52 ISO weeks
+
+
+def test_reference_profile():
+    assert reference_profile(freq="M").loc[1] == HOPE_SIMPSON[1]
+    assert reference_profile(freq="W").sum() == approx(100)
+
+
+def test_profile_distance():
+    df = season_profiles(make_deaths())
+    reference = reference_profile()
+    identical = pd.concat({2019: reference}, names=["Season", "Month"]).to_frame("HS")
+
+    assert profile_distance(identical, reference, "l1").loc[2019, "HS"] == approx(0)
+    assert profile_distance(identical, reference, "jensen-shannon").loc[
+        2019, "HS"
+    ] == approx(0)
+    assert profile_distance(df, reference, "rmse").shape == (2, 2)
+
+
+def test_incremental_update():
+    profiles = SeasonalProfiles()
+    profiles.update(make_deaths("8 Apr 2021"))
+    assert profiles.recomputed == [2019, 2020]
+
+    df = profiles.update(make_deaths())
+    assert profiles.recomputed == [2020]
+    pd.testing.assert_frame_equal(df, season_profiles(make_deaths()))
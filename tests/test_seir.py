@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.integrate import solve_ivp
+from pycovid.events import EventItem
+from pycovid.seir import (
+    SEIRPriors,
+    fit_seir,
+    integrate,
+    seir_fatal_infections,
+    transmission_schedule,
+)
+
+EVENTS = [EventItem("2020-03-23", "Lockdown"), EventItem("2020-05-10", "Easing")]
+TRUE = pd.DataFrame(
+    {
+        "r0": [3.0],
+        "log10 exposed": [2.0],
+        "ifr": [0.01],
+        "Lockdown": [0.3],
+        "Easing": [0.6],
+    }
+)
+
+
+def make_infections() -> pd.Series:
+    index = pd.date_range("1 Feb 2020", "30 Jun 2020")
+    return seir_fatal_infections(TRUE, EVENTS, index)[0]
+
+
+def test_integrate_matches_solve_ivp():
+    priors = SEIRPriors(population=1e6)
+    incidence = integrate(np.full((120, 1), 2.5), np.array([10.0]), priors)[:, 0]
+
+    sigma, gamma = 1 / priors.latent_days, 1 / priors.infectious_days
+
+    def seir(t, y):
+        s, e, i, r = y
+        infection = 2.5 * gamma * s * i / 1e6
+        return [-infection, infection - sigma * e, sigma * e - gamma * i, gamma * i]
+
+    days = np.arange(121)
+    solution = solve_ivp(
+        seir, (0, 120), [1e6 - 10, 10, 0, 0], t_eval=days, rtol=1e-10, atol=1e-6
+    )
+    expected = -np.diff(solution.y[0])
+    assert incidence == pytest.approx(expected, rel=1e-3, abs=1e-3)
+    assert incidence.sum() < 1e6
+
+
+def test_transmission_schedule_is_piecewise():
+    index = pd.date_range("20 Mar 2020", periods=60)
+    values = np.array([[3.0, 2.0, 0.01, 0.3, 0.6], [2.0, 2.0, 0.01, 0.5, 1.0]])
+    # events out of date order still apply in date order
+    r = transmission_schedule(values[:, [0, 1, 2, 4, 3]], EVENTS[::-1], index)
+
+    assert r.shape == (60, 2)
+    assert r[:3, 0] == pytest.approx(3.0)
+    assert r[3, 0] == pytest.approx(0.9)  # 23 Mar
+    assert r[-1] == pytest.approx([1.8, 2.0])
+
+
+def test_fit_recovers_parameters():
+    infections = make_infections()
+    fit = fit_seir(infections, EVENTS, n_sets=1024, rounds=10, seed=1, partitions=1)
+
+    best = fit.best
+    assert best["r0"] == pytest.approx(3.0, abs=0.15)
+    assert best["Lockdown"] == pytest.approx(0.3, abs=0.03)
+    assert best["Easing"] == pytest.approx(0.6, abs=0.05)
+    assert (fit.parameters["log likelihood"].diff().dropna() <= 0).all()
+    error = (fit.infections["fitted"] / fit.infections["observed"] - 1).abs()
+    assert error.loc["1 Mar 2020":].max() < 0.25
+
+
+def test_fit_is_reproducible_across_partitions():
+    infections = make_infections().loc[:"30 Apr 2020"]
+    kwargs = dict(n_sets=600, rounds=2, seed=3)
+    one = fit_seir(infections, EVENTS[:1], partitions=1, **kwargs)
+    two = fit_seir(infections, EVENTS[:1], partitions=2, **kwargs)
+    pd.testing.assert_frame_equal(one.parameters, two.parameters)
+
+    with pytest.raises(AttributeError):
+        fit_seir(infections, [EVENTS[0], EventItem("2020-04-01", "Lockdown")])
+
+
+def test_model_does_not_import_plotting():
+    code = "import sys, pycovid.seir; sys.exit('matplotlib' in sys.modules)"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    assert subprocess.run([sys.executable, "-c", code], env=env).returncode == 0
@@ -0,0 +1,86 @@
+import threading
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.catalog import Catalog
+from pycovid.client import RemoteCatalog, connect
+from pycovid.server import DataServer
+
+
+def load_deaths() -> pd.DataFrame:
+    idx = pd.date_range("1 Mar 2020", periods=60, name="Date")
+    deaths = 10 * 1.1 ** np.arange(len(idx))
+    return pd.DataFrame({"England": deaths, "Wales": deaths / 10}, index=idx)
+
+
+@pytest.fixture(scope="module")
+def remote():
+    cat = Catalog()
+    cat.register("deaths", "v1", load_deaths)
+    cat.register(
+        "infections",
+        "v1",
+        lambda: load_deaths()[["England"]].set_axis(["infections"], axis=1),
+    )
+    cat.register("england", "v1", lambda: load_deaths()["England"])
+    server = DataServer(port=0, catalog=cat)
+    server.preload()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield RemoteCatalog(port=server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_slice(remote):
+    assert remote.is_alive()
+    assert remote.sources() == [
+        ("deaths", "v1"),
+        ("infections", "v1"),
+        ("england", "v1"),
+    ]
+
+    df = remote.get("deaths", start="2020-03-10", end="2020-03-19", columns=["Wales"])
+    expected = load_deaths().loc["2020-03-10":"2020-03-19", ["Wales"]]
+    pd.testing.assert_frame_equal(df, expected, check_freq=False)
+    # preloaded: every request is a cache hit
+    assert remote.stats()["misses"] == 3
+
+
+def test_series_sources_are_series(remote):
+    series = remote.get("england", start="2020-03-10")
+    pd.testing.assert_series_equal(
+        series, load_deaths()["England"].loc["2020-03-10":], check_freq=False
+    )
+    assert isinstance(remote.get("england", columns=["England"]), pd.DataFrame)
+    assert isinstance(remote.get("infections"), pd.DataFrame)
+
+
+def test_fit_and_render(remote):
+    fit = remote.fit("deaths", "England", "2020-03-01", "2020-04-29")
+    assert list(fit.columns) == ["log fit", "fit"]
+    assert fit["fit"].to_numpy() == pytest.approx(load_deaths()["England"].to_numpy())
+
+    events = [("2020-03-23", "Lockdown")]
+    png = remote.render("infections", title="Infections", events=events)
+    assert png[:8] == b"\x89PNG\r\n\x1a\n"
+    png = remote.render("deaths", chart="small-multiples", events=events)
+    assert png[:8] == b"\x89PNG\r\n\x1a\n"
+
+
+def test_errors(remote):
+    with pytest.raises(AttributeError):
+        remote.get("unknown")
+    with pytest.raises(AttributeError):
+        remote.render("deaths", chart="pie")
+
+
+def test_connect_falls_back_to_local_catalog():
+    from pycovid.catalog import catalog
+
+    assert connect(port=1) is catalog
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.prefetch import create_executor
+from pycovid.shared_store import SharedStore, attach, share
+
+
+def make_frame() -> pd.DataFrame:
+    idx = pd.date_range("1 Mar 2020", periods=100, name="Date")
+    return pd.DataFrame(
+        {"England": np.arange(100.0), "Wales": np.arange(100.0) / 10}, index=idx
+    )
+
+
+def base_types(values: np.ndarray):
+    types = []
+    while values is not None:
+        types.append(type(values))
+        values = getattr(values, "base", None)
+    return types
+
+
+def column_total(store_dir, name: str, column: str) -> float:
+    return float(SharedStore(store_dir).get(name)[column].sum())
+
+
+def attached_total(handle, column: str) -> float:
+    return float(attach(handle)[column].sum())
+
+
+def test_store_round_trip_is_memory_mapped(tmp_path):
+    store = SharedStore(tmp_path)
+    df = make_frame()
+    smr = pd.DataFrame(
+        [[1.5, 2.5], [0.5, 1.0]],
+        index=pd.MultiIndex.from_tuples(
+            [("Unisex", 2020), ("Unisex", 2021)], names=["Gender", "Year"]
+        ),
+        columns=pd.Index([1, 2], name="ISOWeek"),
+    )
+    store.put("deaths", df)
+    store.put("smr", smr)
+    store.put("england", df["England"])
+
+    deaths = store.get("deaths")
+    pd.testing.assert_frame_equal(deaths, df)
+    assert deaths.index.freq == "D"
+    assert np.memmap in base_types(deaths.to_numpy())
+    pd.testing.assert_frame_equal(store.get("smr"), smr)
+    pd.testing.assert_series_equal(store.get("england"), df["England"])
+    assert store.names() == ["deaths", "england", "smr"]
+
+    with pytest.raises(ValueError):
+        deaths.iloc[0, 0] = 1.0  # read only
+
+    store.delete("smr")
+    assert "smr" not in store
+    with pytest.raises(KeyError):
+        store.get("smr")
+
+
+def test_workers_read_without_pickling_frames(tmp_path):
+    store = SharedStore(tmp_path)
+    df = make_frame()
+    store.put("deaths", df)
+
+    with share(df) as shared, create_executor(2) as executor:
+        from_store = executor.submit(column_total, tmp_path, "deaths", "Wales")
+        from_memory = executor.submit(attached_total, shared.handle, "England")
+        assert from_store.result() == pytest.approx(df["Wales"].sum())
+        assert from_memory.result() == pytest.approx(df["England"].sum())
+        pd.testing.assert_frame_equal(shared.frame(), df)
+
+
+def test_mixed_dtypes_rejected(tmp_path):
+    df = make_frame().assign(Region="UK")
+    with pytest.raises(AttributeError):
+        SharedStore(tmp_path).put("mixed", df)
@@ -0,0 +1,40 @@
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from pycovid.chart_utils import EventItem, RegionItem, create_small_multiples
+
+
+def make_regions(n: int) -> pd.DataFrame:
+    idx = pd.date_range("1 Mar 2020", "30 Jun 2021")
+    t = np.arange(len(idx))
+    return pd.DataFrame(
+        {f"Region {i}": 100 * (1 + np.sin(t / 60 + i)) + 1 for i in range(n)},
+        index=idx,
+    )
+
+
+def test_artists_per_subplot_do_not_grow_with_series():
+    regions = [RegionItem("2020-07-01", "2020-12-31", "tab:orange", "H2 2020")]
+    events = [EventItem("2020-03-26", "Lockdown #1"), EventItem("2021-01-06", "#3")]
+
+    counts, vertices = [], []
+    for n in [8, 16]:
+        fig, axes = create_small_multiples(
+            "test", make_regions(n), regions=regions, events=events
+        )
+        assert sum(ax.get_visible() for ax in axes.flat) == n
+        ax = axes.flat[-1] if n % 4 == 0 else axes.flat[0]
+        counts.append(len(ax.collections) + len(ax.lines) + len(ax.texts))
+        vertices.append(
+            sum(len(path.vertices) for c in ax.collections for path in c.get_paths())
+        )
+        # event numbers, on the top row only
+        assert len(axes.flat[0].collections) == len(ax.collections) + 1
+        plt.close(fig)
+
+    assert counts[0] == counts[1]
+    assert vertices[0] == vertices[1]
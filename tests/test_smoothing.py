@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pycovid.smoothing import KERNELS, kernel_weights, smooth
+from pytest import approx
+
+
+def make_series() -> pd.DataFrame:
+    idx = pd.date_range("1 Mar 2020", periods=120)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.poisson(100, size=(len(idx), 3)).astype(float), index=idx)
+    df.iloc[:5, 1] = np.nan
+    return df
+
+
+def test_moving_average_matches_rolling():
+    df = make_series()
+    expected = df.rolling(window=7, center=True).mean()
+    result = smooth(df, window=7, edge="nan", preserve_total=False)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.mark.parametrize("kernel", KERNELS)
+def test_kernels_preserve_totals_without_edge_nans(kernel):
+    df = make_series()
+    result = smooth(df, window=9, kernel=kernel)
+
+    assert result.sum().values == approx(df.sum().values)
+    assert result.isna().equals(df.isna())
+
+
+def test_constant_series_is_unchanged():
+    values = np.full((50, 2), 4.0)
+    for kernel in KERNELS:
+        assert smooth(values, window=7, kernel=kernel) == approx(values)
+
+
+def test_series_in_series_out():
+    s = make_series()[0]
+    result = smooth(s, kernel="gaussian")
+    assert isinstance(result, pd.Series)
+    assert result.index.equals(s.index)
+
+
+def test_kernel_weights():
+    assert kernel_weights("triangular", 5) == approx([1, 2, 3, 2, 1])
+    with pytest.raises(AttributeError):
+        kernel_weights("triangular", 6)
+    with pytest.raises(AttributeError):
+        kernel_weights("boxcar", 7)
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from pycovid.data_utils import batched_linregress
+from pycovid.waves import align_declines, find_turning_points, find_waves, fit_declines
+from pytest import approx
+
+
+def make_waves() -> pd.DataFrame:
+    """Two regions, each with two exponential waves."""
+    idx = pd.date_range("1 Feb 2020", "31 Jul 2021")
+    t = np.arange(len(idx))
+
+    def wave(peak_day, growth, decline):
+        return np.where(
+            t <= peak_day,
+            growth * (t - peak_day),
+            -decline * (t - peak_day),
+        )
+
+    a = 10 ** np.fmax(wave(50, 0.05, 0.02), wave(330, 0.02, 0.03) - 0.2) * 1000
+    b = 10 ** np.fmax(wave(60, 0.05, 0.01), wave(340, 0.02, 0.02)) * 100
+    return pd.DataFrame({"A": a, "B": b}, index=idx)
+
+
+def test_batched_linregress():
+    y = np.array([[1, 3, 5, np.nan], [2, 2, 2, 2], [np.nan, 1, np.nan, np.nan]])
+    slope, intercept = batched_linregress(y)
+    assert slope[:2] == approx([2, 0])
+    assert intercept[:2] == approx([1, 2])
+    assert np.isnan(slope[2])
+
+
+def test_find_turning_points():
+    points = find_turning_points(make_waves())
+    peaks = points[points["kind"] == "peak"]
+    assert list(peaks["region"]) == ["A", "A", "B", "B"]
+    assert list(peaks["date"].dt.strftime("%Y-%m-%d")) == [
+        "2020-03-22",
+        "2020-12-27",
+        "2020-04-01",
+        "2021-01-06",
+    ]
+
+
+def test_align_and_fit_declines():
+    df = make_waves()
+    waves = find_waves(df)
+    declines = align_declines(df, waves, max_days=100)
+
+    assert declines.shape == (4, 100)
+    assert declines[:, 0] == approx([1, 1, 1, 1])
+
+    fits = fit_declines(declines, days=60)
+    assert fits["slope"].values == approx([-0.02, -0.03, -0.01, -0.02])
+    assert fits["halving days"].iloc[0] == approx(np.log10(2) / 0.02)
@@ -0,0 +1,94 @@
+import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+from pycovid.data_utils.xlsx import Workbook, excel_dates, parse_usecols, read_xlsx
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Daily registrations"
+    ws.append(["Deaths registered by date"])
+    ws.append([])
+    ws.append(["Date", "England", "Wales", "Note", None, "Rate", "Code"])
+    for i in range(40):
+        date = datetime.datetime(2020, 3, 1) + datetime.timedelta(days=i)
+        ws.append(
+            [
+                (
+                    date if i % 10 else date.strftime("%d/%m/%Y")
+                ),  # ONS dates are partly text
+                i * 3,
+                None if i == 5 else i,
+                "NA" if i % 2 else f"note {i}",
+                None,
+                i / 7,
+                str(100 + i),  # numbers stored as text
+            ]
+        )
+    ws.append([])
+    ws.append(["Source: ONS"])
+    wb.create_sheet("Vaccinations").append(["ignored"])
+
+    path = tmp_path / "registrations.xlsx"
+    wb.save(path)
+    return path
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(),
+        dict(skiprows=2),
+        dict(skiprows=[0, 1, 3, 44], usecols="A:C, F:G"),
+        dict(skiprows=2, usecols="A,F", index_col=0),
+        dict(skiprows=2, usecols="B:C", nrows=10),
+        dict(skiprows=[0, 1, 2], header=None, usecols="B:D"),
+    ],
+)
+def test_matches_read_excel(workbook, kwargs):
+    expected = pd.read_excel(workbook, sheet_name="Daily registrations", **kwargs)
+    df = read_xlsx(workbook, "Daily registrations", **kwargs)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_workbook_reads_several_sheets(workbook):
+    with Workbook(workbook) as wb:
+        assert wb.sheet_names == ["Daily registrations", "Vaccinations"]
+        df = wb.read("Daily registrations", skiprows=2, usecols="A:C", nrows=40)
+        assert list(wb.read("Vaccinations").columns) == ["ignored"]
+        with pytest.raises(AttributeError):
+            wb.read("Weekly registrations")
+
+    assert df["England"].dtype == np.int64
+    assert df["Wales"].dtype == np.float64  # a missing value
+    assert df.loc[1, "Date"] == pd.Timestamp("2 Mar 2020")
+    assert df.loc[10, "Date"] == "11/03/2020"
+
+
+def test_excel_dates():
+    serials = np.array([1, 59, 61, 43891, 43891.75, np.nan])
+    expected = pd.to_datetime(
+        [
+            "1900-01-01",
+            "1900-02-28",
+            "1900-03-01",
+            "2020-03-01",
+            "2020-03-01 18:00",
+            None,
+        ]
+    )
+    assert np.array_equal(excel_dates(serials), expected.to_numpy(), equal_nan=True)
+    assert excel_dates(np.array([0.0]), date1904=True)[0] == np.datetime64("1904-01-01")
+
+
+def test_parse_usecols():
+    assert parse_usecols("A:C, F") == [0, 1, 2, 5]
+    assert parse_usecols("C:N, T:AC, AI:AR")[-1] == 43
+    assert parse_usecols("B,T") == [1, 19]
+    with pytest.raises(AttributeError):
+        parse_usecols("A-C")